@@ -7,6 +7,7 @@
 #include <Adafruit_SSD1306.h>
 #include <Fonts/FreeSans9pt7b.h>
 #include <time.h>
+#include <sys/time.h>
 
 // OLED 설정
 #define SCREEN_WIDTH 128
@@ -21,6 +22,7 @@ Adafruit_SSD1306 display(SCREEN_WIDTH, SCREEN_HEIGHT, &Wire, OLED_RESET);
 #define RELAY_PIN 32
 
 const int ledPins[8] = {2, 4, 5, 18, 19, 25, 26, 27};
+bool ledPwm[8] = {false};  // 한 번 PWM 으로 켠 핀은 계속 analogWrite
 DHT dht(DHTPIN, DHTTYPE);
 
 // MQTT 설정
@@ -29,6 +31,33 @@ WiFiClient espClient;
 PubSubClient client(espClient);
 StaticJsonDocument<256> doc_out;
 
+// 장치별 토픽: arduino/<device_id>/input, output, leds, led1..8 (device_registry.py)
+// device_id 는 setup() 에서 MAC 뒤 3바이트로 만든다 ("esp32-a1b2c3")
+char device_id[16];
+char topic_prefix[32];  // "arduino/esp32-a1b2c3/"
+// 1 이면 예전 전역 명령 토픽(arduino/output, arduino/leds, arduino/led1..8)도 구독
+#define LEGACY_TOPICS 1
+// 1 이면 센서 값을 arduino/input 에도 보낸다 (장치 id 를 모르는 예전 패널용).
+// ex1-8.py / gateway.py 는 두 토픽을 다 받으므로 켜면 같은 샘플이 두 번 저장된다.
+#define LEGACY_INPUT 0
+
+// 1 이면 JSON 대신 22바이트 바이너리로 전송 (payload.py 가 자동으로 구분)
+#define PAYLOAD_BINARY 0
+
+// payload.py BINARY_FORMAT "<2sBBIqhHH" 와 같은 순서/크기 (ESP32 는 little-endian)
+struct __attribute__((packed)) SensorPacket {
+  char magic[2];      // "SB"
+  uint8_t version;    // 1
+  uint8_t flags;      // bit0 = 릴레이
+  uint32_t seq;       // 전송 순번
+  int64_t device_ms;  // NTP 기준 epoch ms
+  int16_t temp;       // ℃ x10
+  uint16_t humi;      // % x10
+  uint16_t pot;       // 가변저항 ADC
+};
+static_assert(sizeof(SensorPacket) == 22, "SensorPacket 크기가 payload.py 와 다릅니다");
+uint32_t packet_seq = 0;
+
 unsigned long mqtt_t = 0;
 const unsigned long mqtt_interval = 2000;
 bool relayState = false;
@@ -44,13 +73,80 @@ void setup_wifi() {
   Serial.println("\n✅ WiFi 연결 완료: " + WiFi.localIP().toString());
 }
 
+// ===== LED 제어 =====
+void setLed(int i, bool on, int duty = 255) {
+  if (ledPwm[i] || duty < 255) {
+    analogWrite(ledPins[i], on ? duty : 0);
+    ledPwm[i] = true;
+  } else {
+    digitalWrite(ledPins[i], on ? HIGH : LOW);
+  }
+}
+
+// .../leds: [mask] 또는 [mask, pwm1..pwm8] 를 8개에 한 번에 적용 (led_mask.py)
+void applyLedMask(const byte* payload, unsigned int length) {
+  if (length != 1 && length != 9) {
+    Serial.printf("❗ leds 길이 오류: %u\n", length);
+    return;
+  }
+  byte mask = payload[0];
+  for (int i = 0; i < 8; i++) {
+    setLed(i, mask & (1 << i), length == 9 ? payload[1 + i] : 255);
+  }
+  Serial.printf("💡 LED mask → 0x%02X\n", mask);
+}
+
+// "led3" → 2, 아니면 -1
+int ledIndex(const char* leaf) {
+  if (strncmp(leaf, "led", 3) != 0) return -1;
+  char c = leaf[3];
+  if (c < '1' || c > '8' || leaf[4] != '\0') return -1;
+  return c - '1';
+}
+
+// "arduino/<내 id>/leds" → "leds", 예전 "arduino/leds" → "leds", 다른 장치 토픽이면 nullptr
+const char* topicLeaf(const char* topic) {
+  size_t n = strlen(topic_prefix);
+  if (strncmp(topic, topic_prefix, n) == 0) return topic + n;
+#if LEGACY_TOPICS
+  if (strncmp(topic, "arduino/", 8) == 0 && strchr(topic + 8, '/') == nullptr) return topic + 8;
+#endif
+  return nullptr;
+}
+
+// leaf 토픽 구독: 내 장치 토픽 (+ 예전 전역 토픽)
+void subscribeLeaf(const char* leaf) {
+  char topic[48];
+  snprintf(topic, sizeof(topic), "%s%s", topic_prefix, leaf);
+  client.subscribe(topic);
+#if LEGACY_TOPICS
+  snprintf(topic, sizeof(topic), "arduino/%s", leaf);
+  client.subscribe(topic);
+#endif
+}
+
+void publishInput(const uint8_t* payload, unsigned int length) {
+  char topic[48];
+  snprintf(topic, sizeof(topic), "%sinput", topic_prefix);
+  client.publish(topic, payload, length);
+#if LEGACY_INPUT
+  client.publish("arduino/input", payload, length);
+#endif
+}
+
 // ===== MQTT 콜백 =====
 void mqtt_callback(char* topic, byte* payload, unsigned int length) {
+  const char* leaf = topicLeaf(topic);
+  if (leaf == nullptr) return;
+  if (strcmp(leaf, "leds") == 0) {
+    applyLedMask(payload, length);  // 바이너리라 문자열로 바꾸지 않는다
+    return;
+  }
   payload[length] = '\0';
   String message = String((char*)payload);
   Serial.printf("📥 수신됨 (%s): %s\n", topic, message.c_str());
 
-  if (String(topic) == "arduino/output") {
+  if (strcmp(leaf, "output") == 0) {
     if (message.equalsIgnoreCase("post 3200 on")) {
       digitalWrite(RELAY_PIN, HIGH);
       relayState = true;
@@ -62,30 +158,42 @@ void mqtt_callback(char* topic, byte* payload, unsigned int length) {
     }
   }
 
-  for (int i = 0; i < 8; i++) {
-    String ledTopic = "arduino/led" + String(i + 1);
-    if (String(topic) == ledTopic) {
-      digitalWrite(ledPins[i], message == "1" ? HIGH : LOW);
-      Serial.printf("💡 LED %d → %s\n", i + 1, message == "1" ? "ON" : "OFF");
-    }
+  int i = ledIndex(leaf);
+  if (i >= 0) {
+    setLed(i, message == "1");
+    Serial.printf("💡 LED %d → %s\n", i + 1, message == "1" ? "ON" : "OFF");
   }
 }
 
 // ===== MQTT 재연결 =====
+// 막지 않는다: 재시도 시각이 안 됐으면 바로 돌아가서 센서/OLED 는 계속 돈다.
+// 실패할 때마다 대기 시간을 1초 → 최대 60초로 두 배씩 늘리고 절반은 무작위로 섞는다
+// (공유기가 재부팅될 때 여러 보드가 같은 순간에 브로커로 몰리지 않게).
+unsigned long mqtt_retry_at = 0;
+unsigned long mqtt_backoff = 1000;
+const unsigned long mqtt_backoff_max = 60000;
+
 void reconnect() {
-  while (!client.connected()) {
-    Serial.print("🔄 MQTT 연결 시도...");
-    String clientId = "ESP32Client-" + String(random(0xffff), HEX);
-    if (client.connect(clientId.c_str())) {
-      Serial.println("✅ MQTT 연결 성공");
-      client.subscribe("arduino/output");
-      for (int i = 1; i <= 8; i++) {
-        client.subscribe(("arduino/led" + String(i)).c_str());
-      }
-    } else {
-      Serial.printf("❌ 연결 실패(%d) → 5초 후 재시도\n", client.state());
-      delay(5000);
+  if (WiFi.status() != WL_CONNECTED) return;  // WiFi 는 ESP32 가 알아서 다시 붙는다
+  if ((long)(millis() - mqtt_retry_at) < 0) return;
+
+  Serial.print("🔄 MQTT 연결 시도...");
+  if (client.connect(device_id)) {  // 장치 id 를 client id 로 (브로커 로그에서 보드 구분)
+    Serial.println("✅ MQTT 연결 성공");
+    mqtt_backoff = 1000;
+    // 구독하면 브로커가 retained LED 상태(.../leds 등)를 보내 줘서 다시 맞춰진다
+    subscribeLeaf("output");
+    for (int i = 1; i <= 8; i++) {
+      char leaf[8];
+      snprintf(leaf, sizeof(leaf), "led%d", i);
+      subscribeLeaf(leaf);
     }
+    subscribeLeaf("leds");
+  } else {
+    unsigned long wait = mqtt_backoff / 2 + random(mqtt_backoff / 2 + 1);
+    Serial.printf("❌ 연결 실패(%d) → %lums 후 재시도\n", client.state(), wait);
+    mqtt_retry_at = millis() + wait;
+    mqtt_backoff = min(mqtt_backoff * 2, mqtt_backoff_max);
   }
 }
 
@@ -141,8 +249,15 @@ void setup() {
   }
 
   setup_wifi();
+  uint8_t mac[6];
+  WiFi.macAddress(mac);
+  snprintf(device_id, sizeof(device_id), "esp32-%02x%02x%02x", mac[3], mac[4], mac[5]);
+  snprintf(topic_prefix, sizeof(topic_prefix), "arduino/%s/", device_id);
+  Serial.printf("🆔 장치 id: %s (토픽 %s...)\n", device_id, topic_prefix);
+
   client.setServer(mqtt_server, 1883);
   client.setCallback(mqtt_callback);
+  client.setSocketTimeout(3);  // 브로커가 응답 없을 때 connect() 가 오래 막지 않게
 
   if (!display.begin(SSD1306_SWITCHCAPVCC, 0x3C)) {
     Serial.println("❌ OLED 초기화 실패!");
@@ -156,8 +271,11 @@ void setup() {
 
 // ===== 메인 루프 =====
 void loop() {
-  if (!client.connected()) reconnect();
-  client.loop();
+  if (!client.connected()) {
+    reconnect();
+  } else {
+    client.loop();
+  }
 
   if (millis() - mqtt_t > mqtt_interval) {
     mqtt_t = millis();
@@ -183,15 +301,31 @@ void loop() {
     }
 
     // MQTT 전송
+#if PAYLOAD_BINARY
+    struct timeval tv;
+    gettimeofday(&tv, nullptr);
+    SensorPacket pkt;
+    memcpy(pkt.magic, "SB", 2);
+    pkt.version = 1;
+    pkt.flags = relayState ? 0x01 : 0x00;
+    pkt.seq = packet_seq++;
+    pkt.device_ms = (int64_t)tv.tv_sec * 1000 + tv.tv_usec / 1000;
+    pkt.temp = (int16_t)lroundf(temp * 10);
+    pkt.humi = (uint16_t)lroundf(humi * 10);
+    pkt.pot = (uint16_t)pot;
+    publishInput((const uint8_t*)&pkt, sizeof(pkt));
+    Serial.printf("📤 MQTT 전송 (binary #%u): %.1f / %.1f / %d\n", pkt.seq, temp, humi, pot);
+#else
     doc_out["temp"] = temp;
     doc_out["humi"] = humi;
     doc_out["pot"] = pot;
     doc_out["relay"] = relayState;
 
-    String js;
-    serializeJson(doc_out, js);
-    client.publish("arduino/input", js.c_str());
-    Serial.printf("📤 MQTT 전송: %s\n", js.c_str());
+    char js[128];
+    serializeJson(doc_out, js, sizeof(js));
+    publishInput((const uint8_t*)js, strlen(js));
+    Serial.printf("📤 MQTT 전송: %s\n", js);
+#endif
 
     showDisplay(temp, humi, pot);
   }
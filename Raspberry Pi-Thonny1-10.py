@@ -1,68 +1,88 @@
 import tkinter as tk
 from datetime import datetime
-import paho.mqtt.client as mqtt
-import json
+from functools import partial
 import threading
-import requests
-from PIL import Image, ImageTk
-from io import BytesIO
+from PIL import ImageTk
 import time
 
+from mqtt_core import MqttCore
+from publisher import Publisher
+from payload import PayloadDecoder
+from led_mask import decode_mask, encode_mask
+from device_registry import device_pattern, device_topic
+from camera_stream import CameraStream
+from frame_decode import PilDecoder
+from ui_state import UiRefresher, UiState
+
 # 상태 변수
 relay_state = False
 led_states = [False] * 8
 current_values = {"temp": 0.0, "humi": 0.0, "pot": 0}
 stop_camera = False
 
+# 화면 상태: MQTT 스레드는 값만 바꾸고 Tk 가 20Hz 로 바뀐 위젯만 다시 그린다
+ui = UiState(relay=False, **{f"led{i}": False for i in range(8)})
+
 # MQTT 설정
 MQTT_BROKER = "broker.emqx.io"
 MQTT_PORT = 1883
-client = mqtt.Client()
+# 이 패널이 보는 보드 (시리얼 모니터에 찍히는 "esp32-xxxxxx", "" 이면 예전 전역 토픽 arduino/...)
+DEVICE_ID = ""
+# 예전 펌웨어용으로 .../led1..8 에도 같이 보낸다 (모든 보드를 업데이트하면 False)
+LED_LEGACY_TOPICS = True
+client = MqttCore(MQTT_BROKER, MQTT_PORT)
+publisher = Publisher(client, rate=20, burst=10)  # 명령은 이 큐로만 보낸다
+payload_decoder = PayloadDecoder()
+
+# MQTT 핸들러
+def on_sensor(topic, payload):
+    global relay_state
+    record = payload_decoder.decode(payload)
+    if record is None:
+        return  # 잘못된 메시지는 payload_decoder.malformed 에만 센다
+    current_values["temp"] = record.temp
+    current_values["humi"] = record.humi
+    current_values["pot"] = record.pot
+    relay_state = record.relay
+    ui.update(temp=current_values["temp"], humi=current_values["humi"],
+              pot=current_values["pot"], relay=relay_state)
+
+def on_output(topic, payload):
+    global relay_state
+    relay_state = ("on" in payload.decode().lower())
+    ui.set("relay", relay_state)
 
-# MQTT 콜백
-def on_connect(client, userdata, flags, rc):
-    if rc == 0:
-        client.subscribe("arduino/input")
-        client.subscribe("arduino/output")
-        for i in range(1, 9):
-            client.subscribe(f"arduino/led{i}")
+def on_led(index, topic, payload):
+    led_states[index] = (payload == b"1")
+    ui.set(f"led{index}", led_states[index])
 
-def on_message(client, userdata, msg):
-    global relay_state
-    try:
-        topic = msg.topic
-        payload = msg.payload.decode()
-        if topic == "arduino/input":
-            data = json.loads(payload)
-            current_values["temp"] = float(data.get("temp", 0.0))
-            current_values["humi"] = float(data.get("humi", 0.0))
-            current_values["pot"] = int(data.get("pot", 0))
-            relay_state = bool(data.get("relay", False))
-        elif topic == "arduino/output":
-            relay_state = ("on" in payload.lower())
-        elif topic.startswith("arduino/led"):
-            idx = int(topic[-1]) - 1
-            led_states[idx] = (payload == "1")
-        update_ui()
-    except Exception as e:
-        print("메시지 오류:", e)
+def on_leds(topic, payload):
+    # .../leds: 8개 상태가 한 메시지로 온다
+    states, _ = decode_mask(payload)
+    for i, on in enumerate(states):
+        led_states[i] = on
+        ui.set(f"led{i}", on)
 
 def connect_mqtt():
-    client.on_connect = on_connect
-    client.on_message = on_message
-    client.connect(MQTT_BROKER, MQTT_PORT, 60)
-    client.loop_start()
-
-def update_ui():
-    temp_label.config(text=f"온도\n{current_values['temp']:.1f} °C")
-    humi_label.config(text=f"습도\n{current_values['humi']:.1f} %")
-    pot_label.config(text=f"가변저항\n{current_values['pot']}")
+    client.on(device_topic(DEVICE_ID, "input"), on_sensor)
+    if not DEVICE_ID:
+        # 새 펌웨어는 arduino/<device_id>/input 에만 보낸다 (LEGACY_INPUT 0): 아무 보드의 센서값이나 받는다
+        client.on(device_pattern("input"), on_sensor)
+    client.on(device_topic(DEVICE_ID, "output"), on_output)
+    for i in range(8):
+        client.on(device_topic(DEVICE_ID, f"led{i+1}"), partial(on_led, i))
+    client.on(device_topic(DEVICE_ID, "leds"), on_leds)
+    client.start()
+    publisher.start()
+
+def render_relay(on):
     relay_label.config(
-        text=f"릴레이 상태\n{'ON' if relay_state else 'OFF'}",
-        fg="green" if relay_state else "red"
+        text=f"릴레이 상태\n{'ON' if on else 'OFF'}",
+        fg="green" if on else "red"
     )
-    for i in range(8):
-        led_buttons[i].config(bg="green" if led_states[i] else "light gray")
+
+def render_led(index, on):
+    led_buttons[index].config(bg="green" if on else "light gray")
 
 def update_datetime():
     now = datetime.now()
@@ -73,38 +93,47 @@ def update_datetime():
 
 def toggle_led(index):
     led_states[index] = not led_states[index]
-    client.publish(f"arduino/led{index+1}", "1" if led_states[index] else "0")
-    update_ui()
+    # retain: 재연결하거나 새로 켜진 패널/보드가 마지막 LED 상태를 바로 받는다
+    publisher.publish(device_topic(DEVICE_ID, "leds"), encode_mask(led_states), retain=True)
+    if LED_LEGACY_TOPICS:
+        publisher.publish(device_topic(DEVICE_ID, f"led{index+1}"),
+                          "1" if led_states[index] else "0", retain=True)
+    ui.set(f"led{index}", led_states[index])
 
 # 카메라 스트리밍
 CAMERA_URL = "http://172.30.1.60:81/stream"
 
+# 연결 하나를 리더 스레드가 계속 읽고 (끊기면 backoff 재연결) 여기서는 최신 프레임만 그린다
+camera = CameraStream(CAMERA_URL, stall=5.0)
+frame_decoder = PilDecoder((320, 240))  # draft 로 1/2, 1/4 로 줄여서 디코드
+camera_photo = None  # PhotoImage 하나를 만들어 두고 paste 로 계속 다시 쓴다 (Tk 스레드)
+frame_drawn = threading.Event()
+frame_drawn.set()
+
+def show_frame(img):
+    global camera_photo
+    if camera_photo is None:
+        camera_photo = ImageTk.PhotoImage(img)
+        camera_label.config(image=camera_photo)
+    else:
+        camera_photo.paste(img)
+    frame_drawn.set()
+
 def mjpeg_stream():
-    global stop_camera
     while not stop_camera:
-        try:
-            response = requests.get(CAMERA_URL, stream=True, timeout=5)
-            byte_data = b''
-            for chunk in response.iter_content(chunk_size=1024):
-                if stop_camera:
-                    break
-                byte_data += chunk
-                a = byte_data.find(b'\xff\xd8')
-                b = byte_data.find(b'\xff\xd9')
-                if a != -1 and b != -1:
-                    jpg = byte_data[a:b + 2]
-                    byte_data = byte_data[b + 2:]
-                    img = Image.open(BytesIO(jpg)).convert('RGB')
-                    img = img.resize((320, 240))
-                    imgtk = ImageTk.PhotoImage(img)
-                    def update_img():
-                        camera_label.config(image=imgtk)
-                        camera_label.image = imgtk
-                    window.after(0, update_img)
-                    time.sleep(0.03)
-        except Exception as e:
-            print("카메라 오류:", e)
-            time.sleep(1)
+        # Tk 가 앞 프레임을 아직 못 그렸으면 디코드하지 않는다 (그 사이 프레임은 리더가 버림)
+        if not frame_drawn.wait(timeout=1.0):
+            continue
+        jpg = camera.read(timeout=1.0)
+        if jpg is None:
+            continue
+        img = frame_decoder.decode(jpg)
+        if img is None:
+            print("카메라 오류: JPEG 디코드 실패")
+            continue
+        frame_drawn.clear()
+        window.after(0, show_frame, img)
+        time.sleep(0.03)
 
 # GUI 구성
 window = tk.Tk()
@@ -166,11 +195,23 @@ pot_label.pack(pady=6)
 relay_label = tk.Label(right_frame, text="릴레이 상태", font=info_font, bg="white", fg="red")
 relay_label.pack(pady=6)
 
+# 화면 갱신 tick
+refresher = UiRefresher(window, ui, fps=20)
+refresher.bind("temp", lambda v: temp_label.config(text=f"온도\n{v:.1f} °C"))
+refresher.bind("humi", lambda v: humi_label.config(text=f"습도\n{v:.1f} %"))
+refresher.bind("pot", lambda v: pot_label.config(text=f"가변저항\n{v}"))
+refresher.bind("relay", render_relay)
+for i in range(8):
+    refresher.bind(f"led{i}", partial(render_led, i))
+refresher.start()
+
 # 실행
 connect_mqtt()
 update_datetime()
+camera.start()
 threading.Thread(target=mjpeg_stream, daemon=True).start()
 
 window.mainloop()
 stop_camera = True
+camera.close()
 
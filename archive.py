@@ -0,0 +1,211 @@
+"""지난 날짜의 final_data 를 장치/날짜별 열(column) 파일로 보관하는 아카이브.
+
+    python archive.py archive --keep-days 1          # 어제까지 아카이브 안 된 (또는 행이 늘어난) 날짜 보관
+    python archive.py query --start 2025-01-01 --end 2025-12-31 --device esp32-a1b2c3
+
+파일 구성 (archive/<device>/<YYYY-MM-DD>/):
+    t.npy      int32  하루 시작부터의 ms 를 delta 인코딩 (첫 값은 0시 기준 offset)
+    temp.npy   int16  온도 x10
+    humi.npy   uint16 습도 x10
+    rotary.npy uint16 가변저항 원시값
+archive/index.json 에 장치별 날짜, 시간 범위, 행 수를 기록해 두고
+읽을 때는 필요한 날짜 파일만 mmap 으로 연다 (DB 를 거치지 않음).
+"""
+import argparse
+import json
+import os
+import shutil
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from sensor_db import TABLE, ConnectionPool, add_db_args, db_config_from_args
+
+# 컬럼 이름 → (저장 dtype, 배율)
+COLUMNS = {
+    "temp": (np.int16, 10),
+    "humi": (np.uint16, 10),
+    "rotary": (np.uint16, 1),
+}
+
+
+def _epoch_ms(d):
+    return int(datetime(d.year, d.month, d.day).timestamp() * 1000)
+
+
+def _to_datetime(value):
+    return value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+
+
+class Archive:
+    def __init__(self, root="archive"):
+        self.root = root
+        self.index_path = os.path.join(root, "index.json")
+        os.makedirs(root, exist_ok=True)
+        if os.path.exists(self.index_path):
+            with open(self.index_path, encoding="utf-8") as f:
+                self.index = json.load(f)
+        else:
+            self.index = []
+
+    def _save_index(self):
+        tmp = self.index_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.index, f, indent=1)
+        os.replace(tmp, self.index_path)
+
+    def archived_rows(self):
+        """날짜 → 아카이브한 행 수 (모든 장치 합)."""
+        rows = {}
+        for entry in self.index:
+            rows[entry["day"]] = rows.get(entry["day"], 0) + entry["rows"]
+        return rows
+
+    # --- 쓰기 ---
+    def write_day(self, device, day, times, values):
+        """하루치 (시간순) 샘플을 열 파일로 저장하고 인덱스에 추가한다."""
+        day_ms = _epoch_ms(day)
+        t = np.array([int(ts.timestamp() * 1000) - day_ms for ts in times], dtype=np.int64)
+        order = np.argsort(t, kind="stable")
+        t = t[order]
+        delta = np.diff(t, prepend=0).astype(np.int32)
+
+        path = os.path.join(device or "_", day.isoformat())
+        final = os.path.join(self.root, path)
+        tmp = final + ".tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        np.save(os.path.join(tmp, "t.npy"), delta)
+        stats = {}
+        for name, (dtype, scale) in COLUMNS.items():
+            column = np.asarray(values[name], dtype=np.float64)[order]
+            np.save(os.path.join(tmp, f"{name}.npy"), np.round(column * scale).astype(dtype))
+            stats[name] = [float(column.min()), float(column.max()), float(column.mean())]
+        shutil.rmtree(final, ignore_errors=True)
+        os.replace(tmp, final)
+
+        self.index = [e for e in self.index if not (e["device"] == device and e["day"] == day.isoformat())]
+        self.index.append({
+            "device": device,
+            "day": day.isoformat(),
+            "t_min": day_ms + int(t[0]),
+            "t_max": day_ms + int(t[-1]),
+            "rows": int(len(t)),
+            "path": path,
+            "stats": stats,  # 컬럼별 [min, max, mean]
+        })
+        self.index.sort(key=lambda e: (e["device"], e["day"]))
+        self._save_index()
+
+    # --- 읽기 ---
+    def read(self, start, end, device=""):
+        """[start, end) 구간을 NumPy 배열 dict 로 돌려준다 (t 는 datetime64[ms])."""
+        start_ms = int(start.timestamp() * 1000)
+        end_ms = int(end.timestamp() * 1000)
+        parts = {name: [] for name in ("t", *COLUMNS)}
+        for entry in self.index:
+            if entry["device"] != device or entry["t_max"] < start_ms or entry["t_min"] >= end_ms:
+                continue
+            folder = os.path.join(self.root, entry["path"])
+            day_ms = _epoch_ms(date.fromisoformat(entry["day"]))
+            t = np.cumsum(np.load(os.path.join(folder, "t.npy"), mmap_mode="r"), dtype=np.int64) + day_ms
+            lo, hi = np.searchsorted(t, [start_ms, end_ms])
+            if lo == hi:
+                continue
+            parts["t"].append(t[lo:hi])
+            for name, (_, scale) in COLUMNS.items():
+                column = np.load(os.path.join(folder, f"{name}.npy"), mmap_mode="r")[lo:hi]
+                parts[name].append(column.astype(np.float32) / scale if scale != 1 else np.array(column))
+        out = {}
+        for name, chunks in parts.items():
+            out[name] = np.concatenate(chunks) if chunks else np.empty(0)
+        out["t"] = out["t"].astype("datetime64[ms]")
+        return out
+
+    def daily_summary(self, start_day, end_day, device=""):
+        """[start_day, end_day) 의 날짜별 min/max/mean (인덱스만 읽음, 파일을 열지 않음)."""
+        return [(date.fromisoformat(e["day"]), e["rows"], e["stats"]) for e in self.index
+                if e["device"] == device and start_day.isoformat() <= e["day"] < end_day.isoformat()]
+
+
+# --- DB → 아카이브 ---
+def archive_days(pool, archive, keep_days=1):
+    """오늘에서 keep_days 일 전까지, 아직 아카이브 안 된 날짜를 보관한다.
+
+    아카이브한 뒤 DB 의 행 수가 늘어난 날짜 (늦게 온 행, spool 재전송) 는 그날을 다시 쓴다.
+    이미 원본을 지운 날짜 (행 수가 아카이브보다 적음) 는 그대로 둔다.
+    """
+    last_day = date.today() - timedelta(days=keep_days)
+    archived = archive.archived_rows()
+    with pool.connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                f"SELECT DATE(data) AS d, COUNT(*) FROM {TABLE} WHERE data < %s GROUP BY d ORDER BY d",
+                (last_day.isoformat(),))
+            counts = cursor.fetchall()
+        written = []
+        for day, rows in counts:
+            day = day if isinstance(day, date) else date.fromisoformat(str(day))
+            if rows > archived.get(day.isoformat(), 0):
+                written += _archive_one_day(conn, archive, day)
+    return written
+
+
+def _archive_one_day(conn, archive, day):
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"SELECT * FROM {TABLE} WHERE data >= %s AND data < %s ORDER BY data",
+            (day.isoformat(), (day + timedelta(days=1)).isoformat()))
+        names = [d[0] for d in cursor.description]
+        rows = cursor.fetchall()
+    conn.commit()
+    if not rows:
+        return []
+    col = {name: i for i, name in enumerate(names)}
+    by_device = {}
+    for row in rows:
+        device = row[col["device_id"]] if "device_id" in col else ""
+        by_device.setdefault(device, []).append(row)
+    for device, device_rows in by_device.items():
+        archive.write_day(
+            device, day,
+            [_to_datetime(r[col["data"]]) for r in device_rows],
+            {name: [r[col[name]] for r in device_rows] for name in COLUMNS})
+        print(f"✅ {device or '(기본)'} {day}: {len(device_rows)}행 보관")
+    return [(device, day) for device in by_device]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="final_data 날짜별 아카이브")
+    parser.add_argument("--root", default="archive")
+    sub = parser.add_subparsers(dest="command", required=True)
+    ar = sub.add_parser("archive")
+    ar.add_argument("--keep-days", type=int, default=1)
+    add_db_args(ar)
+    qr = sub.add_parser("query")
+    qr.add_argument("--start", type=datetime.fromisoformat, required=True)
+    qr.add_argument("--end", type=datetime.fromisoformat, required=True)
+    qr.add_argument("--device", default="")
+    args = parser.parse_args()
+
+    archive = Archive(args.root)
+    if args.command == "archive":
+        pool = ConnectionPool(db_config_from_args(args), size=1)
+        try:
+            archive_days(pool, archive, args.keep_days)
+        finally:
+            pool.close()
+        return
+
+    import time
+    started = time.perf_counter()
+    data = archive.read(args.start, args.end, args.device)
+    elapsed = (time.perf_counter() - started) * 1000
+    print(f"{len(data['t'])}행 ({elapsed:.1f}ms)")
+    if len(data["t"]):
+        print(f"온도 평균 {data['temp'].mean():.1f} / 습도 평균 {data['humi'].mean():.1f} "
+              f"/ 가변저항 평균 {data['rotary'].mean():.0f}")
+
+
+if __name__ == "__main__":
+    main()
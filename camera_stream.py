@@ -0,0 +1,189 @@
+"""ESP32-CAM MJPEG 스트림을 연결 하나로 계속 받는 리더.
+
+    camera = CameraStream("http://172.30.1.49:81/stream").start()
+    while True:
+        jpg = camera.read(timeout=1.0)   # 아직 안 가져간 가장 최신 프레임 (없으면 None)
+        if jpg is None:
+            continue                     # 재연결 중
+        frame = cv2.imdecode(np.frombuffer(jpg, np.uint8), cv2.IMREAD_COLOR)
+
+또는 스레드 없이 generator 로:
+    for jpg in CameraStream(url).frames():   # jpg 는 다음 프레임 전까지만 유효한 memoryview
+        ...
+
+- 연결은 한 번 열어 두고 mjpeg.MjpegDemuxer 로 프레임을 계속 자른다
+  (예전 cam() 은 프레임마다 urlopen 을 다시 해서 카메라 fps 의 일부밖에 못 받았다)
+- stall 초 동안 프레임이 하나도 안 오면 (소켓이 조용하거나 바이트만 찔끔 와도) 끊고 다시 연결
+- 연결 실패/끊김은 jitter 를 섞은 지수 backoff 로 최대 max_backoff 초까지 늘려 가며 재시도
+- start() 모드에서는 리더 스레드가 최신 프레임 하나만 (LatestSlot) 들고 있어서
+  소비자(YOLO 등)가 느리면 밀린 프레임은 버린다 (skipped 로 센다)
+  camera.slot.get() 은 (받은 시각 time.monotonic(), jpg) 를 돌려준다 (vision_pipeline.py)
+"""
+import http.client
+import random
+import threading
+import time
+import urllib.request
+
+from mjpeg import MjpegDemuxer, boundary_from_content_type
+
+
+class LatestSlot:
+    """값 하나만 담는 칸: put() 은 덮어쓰고 get() 은 아직 안 가져간 최신 값을 기다린다."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._item = None
+        self._fresh = False
+        self._closed = False
+        self._waiting = 0  # get() 에서 기다리는 소비자 수
+        self.puts = 0
+        self.dropped = 0  # 가져가기 전에 덮인 수
+
+    def put(self, item):
+        with self._cond:
+            if self._fresh:
+                self.dropped += 1
+            self._item = item
+            self._fresh = True
+            self.puts += 1
+            self._cond.notify_all()
+
+    def get(self, timeout=None):
+        """새 값 (timeout 안에 없거나 close() 되면 None)."""
+        with self._cond:
+            self._waiting += 1
+            self._cond.notify_all()  # wait_for_taker() 를 깨운다
+            try:
+                self._cond.wait_for(lambda: self._fresh or self._closed, timeout)
+            finally:
+                self._waiting -= 1
+            if not self._fresh:
+                return None
+            item, self._item, self._fresh = self._item, None, False
+            return item
+
+    def wait_for_taker(self, timeout=None):
+        """소비자가 빈 칸에서 새 값을 기다릴 때까지 기다린다 (만들어도 버려질 값은 만들지 않게)."""
+        with self._cond:
+            return self._cond.wait_for(lambda: (self._waiting and not self._fresh) or self._closed,
+                                       timeout) and not self._closed
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class _StallGuard:
+    """stream 을 감싸서 마지막 프레임 뒤로 stall 초가 지나면 읽기에서 TimeoutError 를 낸다."""
+
+    def __init__(self, stream, stall):
+        self.stream = stream
+        self.stall = stall
+        self.last_frame = time.monotonic()
+
+    def readinto1(self, view):
+        if time.monotonic() - self.last_frame > self.stall:
+            raise TimeoutError(f"{self.stall:.0f}초 동안 프레임 없음")
+        return self.stream.readinto1(view)
+
+
+class CameraStream:
+    def __init__(self, url, connect_timeout=10.0, stall=5.0, max_backoff=30.0):
+        self.url = url
+        self.connect_timeout = connect_timeout
+        self.stall = stall
+        self.max_backoff = max_backoff
+        self._closed = threading.Event()
+        self.slot = LatestSlot()  # start() 모드의 최신 프레임 (받은 시각, jpg)
+        self._thread = None
+        self.connected = False
+        self.stats = {
+            "frames": 0,
+            "connects": 0,
+            "reconnects": 0,
+            "stalls": 0,
+            "last_error": "",
+        }
+
+    # --- 연결 하나로 계속 읽기 ---
+    def _open(self):
+        stream = urllib.request.urlopen(self.url, timeout=self.connect_timeout)
+        # 연결 뒤로는 소켓 timeout 을 stall 로 (조용한 소켓은 여기서 걸린다)
+        sock = getattr(getattr(stream.fp, "raw", None), "_sock", None)
+        if sock is not None:
+            sock.settimeout(self.stall)
+        return stream
+
+    def frames(self):
+        """close() 할 때까지 프레임을 돌려주는 generator (끊기면 알아서 다시 연결한다)."""
+        attempt = 0
+        while not self._closed.is_set():
+            if attempt:
+                # mqtt_core.backoff_delay 와 같은 식 (카메라 스크립트는 paho 없이 돈다)
+                delay = min(self.max_backoff, 2 ** (attempt - 1))
+                delay = delay / 2 + random.uniform(0, delay / 2)
+                print(f"🔄 카메라 재연결 {delay:.1f}초 후 ({self.stats['last_error']})")
+                if self._closed.wait(delay):
+                    return
+                self.stats["reconnects"] += 1
+            attempt += 1
+            try:
+                stream = self._open()
+            except (OSError, http.client.HTTPException) as e:
+                self.stats["last_error"] = str(getattr(e, "reason", e))
+                continue
+            self.stats["connects"] += 1
+            self.connected = True
+            print(f"✅ 카메라 연결: {self.url}")
+            guard = _StallGuard(stream, self.stall)
+            demuxer = MjpegDemuxer(boundary_from_content_type(stream.headers.get("Content-Type", "")))
+            try:
+                for jpg in demuxer.read_from(guard):
+                    guard.last_frame = time.monotonic()
+                    attempt = 0  # 프레임을 받았으면 backoff 처음부터
+                    self.stats["frames"] += 1
+                    yield jpg
+                    if self._closed.is_set():
+                        return
+                self.stats["last_error"] = "카메라가 스트림을 닫음"
+            except TimeoutError as e:
+                self.stats["stalls"] += 1
+                self.stats["last_error"] = str(e) if str(e) else f"{self.stall:.0f}초 동안 응답 없음"
+            except (OSError, http.client.HTTPException) as e:
+                self.stats["last_error"] = str(e) or type(e).__name__
+            finally:
+                self.connected = False
+                stream.close()
+            attempt = max(attempt, 1)
+
+    # --- 백그라운드 리더 ---
+    def _run(self):
+        put = self.slot.put
+        for jpg in self.frames():
+            put((time.monotonic(), bytes(jpg)))
+
+    def read(self, timeout=None):
+        """아직 돌려주지 않은 가장 최신 프레임 (JPEG bytes). timeout 안에 없으면 None."""
+        item = self.slot.get(timeout)
+        return None if item is None else item[1]
+
+    def snapshot(self):
+        st = dict(self.stats)
+        st["skipped"] = self.slot.dropped  # 읽기 전에 더 새 프레임으로 덮인 수
+        st["connected"] = self.connected
+        return st
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="camera-reader", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self, timeout=2.0):
+        """리더를 멈춘다 (읽는 중이면 stall 초 안에 끝난다)."""
+        self._closed.set()
+        self.slot.close()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
@@ -0,0 +1,210 @@
+"""센서 샘플 압축: 값이 의미 있게 변한 샘플만 저장한다.
+
+필드별로 두 가지 필터를 고를 수 있다.
+  - ("deadband", band): 마지막 저장값에서 band 보다 크게 변하면 저장
+  - ("swinging_door", dev): 마지막 저장점에서 ±dev 폭의 문(door)이 닫히는 순간의
+    직전 샘플을 저장 (천천히 변하는 값에 유리, 선형 복원 오차는 최대 2*dev)
+어느 필터도 저장하지 않아도 max_silence 초마다 한 번은 저장한다 (heartbeat).
+
+읽을 때는 reconstruct() 로 원하는 간격의 계단(step)/선형(linear) 시계열을 만든다.
+"""
+from bisect import bisect_right
+from datetime import datetime
+
+from sensor_db import ROW_COLUMNS
+
+_DATA_INDEX = ROW_COLUMNS.index("data")
+_DEVICE_INDEX = ROW_COLUMNS.index("device_id")
+
+
+def _row_time(row):
+    return datetime.fromisoformat(row[_DATA_INDEX]).timestamp()
+
+
+# --- 필드별 필터 ---
+class Deadband:
+    def __init__(self, band):
+        self.band = band
+        self.last = None
+
+    def anchor(self, t, v):
+        self.last = v
+
+    def changed(self, t, v):
+        return abs(v - self.last) > self.band
+
+
+class SwingingDoor:
+    def __init__(self, dev):
+        self.dev = dev
+        self.t0 = self.v0 = None
+        self.slope_up = float("-inf")   # 위쪽 문 기울기 (최대값)
+        self.slope_low = float("inf")   # 아래쪽 문 기울기 (최소값)
+
+    def anchor(self, t, v):
+        self.t0, self.v0 = t, v
+        self.slope_up = float("-inf")
+        self.slope_low = float("inf")
+
+    def closes(self, t, v):
+        """(t, v) 를 넣었을 때 문이 닫히면 True (직전 샘플을 저장해야 함)."""
+        dt = t - self.t0
+        if dt <= 0:
+            return False
+        self.slope_up = max(self.slope_up, (v - self.v0 - self.dev) / dt)
+        self.slope_low = min(self.slope_low, (v - self.v0 + self.dev) / dt)
+        return self.slope_up > self.slope_low
+
+
+FILTERS = {"deadband": Deadband, "swinging_door": SwingingDoor}
+
+
+# --- 행 단위 압축기 ---
+class SampleCompressor:
+    """ROW_COLUMNS 순서의 행을 받아 실제로 저장할 행 목록을 돌려준다."""
+
+    def __init__(self, fields, max_silence=300.0):
+        self.max_silence = max_silence
+        self._filters = [(ROW_COLUMNS.index(name), FILTERS[kind](param))
+                         for name, (kind, param) in fields.items()]
+        self._doors = [(i, f) for i, f in self._filters if isinstance(f, SwingingDoor)]
+        self._bands = [(i, f) for i, f in self._filters if isinstance(f, Deadband)]
+        self._last_stored_t = None
+        self._held = None  # 아직 저장 안 한 직전 샘플 (t, row)
+        self.offered = 0
+        self.stored = 0
+
+    def _anchor(self, t, row):
+        for i, f in self._filters:
+            f.anchor(t, row[i])
+        self._last_stored_t = t
+
+    def offer(self, row):
+        self.offered += 1
+        t = _row_time(row)
+        out = []
+
+        if self._last_stored_t is None:
+            self._anchor(t, row)
+            self.stored += 1
+            return [row]
+
+        # swinging door 가 닫히면 직전 샘플을 저장하고 그 점을 새 기준으로 삼는다
+        # (모든 문에 현재 점을 반영해야 하므로 any() 로 끊지 않는다)
+        closed = [f.closes(t, row[i]) for i, f in self._doors]
+        if self._held is not None and any(closed):
+            held_t, held_row = self._held
+            out.append(held_row)
+            self._anchor(held_t, held_row)
+            for i, f in self._doors:
+                f.closes(t, row[i])
+        self._held = None
+
+        if (t - self._last_stored_t >= self.max_silence
+                or any(f.changed(t, row[i]) for i, f in self._bands)):
+            out.append(row)
+            self._anchor(t, row)
+        else:
+            self._held = (t, row)
+
+        self.stored += len(out)
+        return out
+
+    def flush(self):
+        """종료할 때 마지막 샘플을 저장해서 시계열 끝이 잘리지 않게 한다."""
+        if self._held is None:
+            return []
+        held_t, held_row = self._held
+        self._held = None
+        self._anchor(held_t, held_row)
+        self.stored += 1
+        return [held_row]
+
+    @property
+    def ratio(self):
+        return self.offered / self.stored if self.stored else 0.0
+
+
+class DeviceCompressors:
+    """장치마다 따로 SampleCompressor 를 두고 행의 device_id 로 나눠 보낸다.
+
+    여러 장치의 행이 섞여 들어와도 한 장치의 값이 다른 장치의 기준점을 흔들지 않는다.
+    """
+
+    def __init__(self, fields, max_silence=300.0):
+        self.fields = fields
+        self.max_silence = max_silence
+        self._by_device = {}
+
+    def offer(self, row):
+        comp = self._by_device.get(row[_DEVICE_INDEX])
+        if comp is None:
+            comp = self._by_device[row[_DEVICE_INDEX]] = SampleCompressor(self.fields, self.max_silence)
+        return comp.offer(row)
+
+    def flush(self):
+        return [row for comp in self._by_device.values() for row in comp.flush()]
+
+    @property
+    def offered(self):
+        return sum(c.offered for c in self._by_device.values())
+
+    @property
+    def stored(self):
+        return sum(c.stored for c in self._by_device.values())
+
+    @property
+    def ratio(self):
+        stored = self.stored
+        return self.offered / stored if stored else 0.0
+
+
+# --- 읽기: 저장된 점으로 시계열 복원 ---
+def reconstruct(points, start, end, step, mode="step"):
+    """시간순 (t, value) 점들로 [start, end) 구간을 step 초 간격으로 다시 만든다.
+
+    mode="step"   : 직전에 저장된 값 유지 (deadband 로 저장한 필드)
+    mode="linear" : 앞뒤 저장점 사이 선형 보간 (swinging door 로 저장한 필드)
+    첫 저장점 이전 구간은 None.
+    """
+    times = [p[0] for p in points]
+    out = []
+    t = start
+    while t < end:
+        k = bisect_right(times, t)
+        if k == 0:
+            value = None
+        elif mode == "linear" and k < len(points):
+            (t0, v0), (t1, v1) = points[k - 1], points[k]
+            value = v0 + (v1 - v0) * (t - t0) / (t1 - t0) if t1 > t0 else v1
+        else:
+            value = points[k - 1][1]
+        out.append((t, value))
+        t += step
+    return out
+
+
+if __name__ == "__main__":
+    # 압축률 확인: python compression.py
+    import math
+    import random
+    from datetime import timedelta
+
+    from sensor_db import make_row
+
+    random.seed(0)
+    comp = SampleCompressor({
+        "temp": ("deadband", 0.5),
+        "humi": ("deadband", 0.5),
+        "rotary": ("swinging_door", 20),
+    })
+    t0 = datetime(2025, 1, 1)
+    stored = []
+    for k in range(43200):  # 2초 간격 하루치
+        when = t0 + timedelta(seconds=2 * k)
+        temp = round(22 + 3 * math.sin(k / 5000))          # DHT11 은 1도 단위
+        humi = round(45 + 5 * math.sin(k / 7000 + 1))
+        rotary = int(2000 + 1500 * math.sin(k / 3000)) + random.randint(-5, 5)
+        stored += comp.offer(make_row(rotary, temp, humi, when))
+    stored += comp.flush()
+    print(f"samples {comp.offered} → stored {comp.stored} ({comp.ratio:.1f}x)")
@@ -0,0 +1,285 @@
+"""여러 ESP32 보드의 장치별 토픽과 상태 표.
+
+장치마다 토픽을 나눈다 (device_id 는 펌웨어가 MAC 으로 만든 "esp32-a1b2c3" 같은 값):
+    arduino/<device_id>/input     센서 JSON/바이너리
+    arduino/<device_id>/output    릴레이 명령
+    arduino/<device_id>/leds      LED 8개 마스크 (led_mask.py)
+    arduino/<device_id>/led1..8   LED 하나씩 (예전 방식)
+device_id "" 는 예전 전역 토픽 arduino/input ... 을 뜻한다 (업데이트 안 한 보드).
+
+    registry = DeviceRegistry(shards=4, on_record=store).start()
+    core.on("arduino/+/input", lambda t, p: registry.submit(parse_topic(t)[0], p))
+    registry.get("esp32-a1b2c3")   # DeviceState 또는 None
+    registry.devices()             # 지금까지 본 장치 id 목록
+
+장치 id 의 crc32 로 shard 를 고르고, shard 마다 큐 + 워커 스레드 하나가
+디코드와 상태 갱신을 맡는다. 같은 장치는 항상 같은 shard 라서 순서가 유지되고
+on_record(device_id, record, payload) 도 장치별로는 한 스레드에서만 불린다.
+상태는 shard 마다 array 컬럼 표 (id → slot dict) 라서 장치가 늘어도
+수신/조회는 dict 조회 한 번 + 배열 인덱스다.
+벤치마크: python device_registry.py
+"""
+import queue
+import threading
+import time
+import zlib
+from array import array
+from typing import NamedTuple
+
+from payload import PayloadDecoder
+
+TOPIC_ROOT = "arduino"
+MAX_ID_LEN = 32  # final_data.device_id VARCHAR(32)
+
+
+# --- 토픽 ---
+def device_topic(device_id, leaf):
+    """("esp32-a1b2c3", "input") → "arduino/esp32-a1b2c3/input", device_id "" 는 예전 토픽."""
+    return f"{TOPIC_ROOT}/{device_id}/{leaf}" if device_id else f"{TOPIC_ROOT}/{leaf}"
+
+
+def device_pattern(leaf):
+    """모든 장치의 leaf 토픽을 받는 구독 패턴 (arduino/+/leaf)."""
+    return f"{TOPIC_ROOT}/+/{leaf}"
+
+
+def parse_topic(topic):
+    """"arduino/<id>/<leaf>" → (id, leaf), 예전 "arduino/<leaf>" → ("", leaf)."""
+    parts = topic.split("/")
+    if len(parts) == 3:
+        return parts[1], parts[2]
+    return "", parts[-1]
+
+
+# --- 장치 상태 표 ---
+class DeviceState(NamedTuple):
+    device_id: str
+    temp: float
+    humi: float
+    pot: int
+    relay: bool
+    leds: int  # bit i = LED i+1
+    last_seen: float  # time.time(), 아직 센서 메시지가 없으면 0
+    count: int  # 받은 센서 메시지 수
+
+
+class DeviceTable:
+    """장치 하나 = slot 하나. 컬럼마다 array 하나 (장치가 많아도 객체를 만들지 않는다)."""
+
+    COLUMNS = (("temp", "d"), ("humi", "d"), ("pot", "l"), ("relay", "B"),
+               ("leds", "B"), ("last_seen", "d"), ("count", "Q"))
+
+    def __init__(self, capacity=64):
+        self._slots = {}  # device_id → slot
+        self.ids = []  # slot → device_id
+        self._capacity = capacity
+        self._cols = {name: array(code, [0]) * capacity for name, code in self.COLUMNS}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, device_id):
+        return device_id in self._slots
+
+    def _slot(self, device_id):
+        """device_id 의 slot (없으면 새로 만든다, 잠금을 잡은 상태로 부른다)."""
+        slot = self._slots.get(device_id)
+        if slot is None:
+            slot = len(self.ids)
+            if slot == self._capacity:
+                # 배열은 두 배씩 늘린다 (append 비용 분할 상환 O(1))
+                for name, code in self.COLUMNS:
+                    self._cols[name].extend(array(code, [0]) * self._capacity)
+                self._capacity *= 2
+            self._slots[device_id] = slot
+            self.ids.append(device_id)
+        return slot
+
+    def update(self, device_id, record, now=None):
+        c = self._cols
+        with self._lock:
+            slot = self._slot(device_id)
+            c["temp"][slot] = record.temp
+            c["humi"][slot] = record.humi
+            c["pot"][slot] = record.pot
+            c["relay"][slot] = record.relay
+            c["last_seen"][slot] = now or time.time()
+            c["count"][slot] += 1
+
+    def set_relay(self, device_id, on):
+        with self._lock:
+            self._cols["relay"][self._slot(device_id)] = on
+
+    def set_leds(self, device_id, mask):
+        with self._lock:
+            self._cols["leds"][self._slot(device_id)] = mask
+
+    def set_led(self, device_id, index, on):
+        with self._lock:
+            leds = self._cols["leds"]
+            slot = self._slot(device_id)
+            leds[slot] = leds[slot] | 1 << index if on else leds[slot] & ~(1 << index)
+
+    def get(self, device_id):
+        with self._lock:
+            slot = self._slots.get(device_id)
+            if slot is None:
+                return None
+            c = self._cols
+            return DeviceState(device_id, c["temp"][slot], c["humi"][slot], c["pot"][slot],
+                               bool(c["relay"][slot]), c["leds"][slot],
+                               c["last_seen"][slot], c["count"][slot])
+
+
+# --- shard 로 나눈 레지스트리 ---
+class _Shard:
+    def __init__(self, index, on_record, maxsize, backend):
+        self.index = index
+        self.on_record = on_record
+        self.queue = queue.Queue(maxsize)
+        self.table = DeviceTable()
+        self.decoder = PayloadDecoder(backend)
+        self.thread = None
+
+    def run(self):
+        decode = self.decoder.decode
+        while True:
+            items = [self.queue.get()]
+            # 쌓여 있는 만큼 한 번에 처리한다
+            while len(items) < 256:
+                try:
+                    items.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            now = time.time()
+            for item in items:
+                if item is None:
+                    return
+                device_id, payload = item
+                record = decode(payload)
+                if record is None:
+                    if self.decoder.malformed <= 10:
+                        print(f"❌ 센서 메시지 형식 오류 ({device_id or '기본'}): {self.decoder.last_error}")
+                    continue
+                self.table.update(device_id, record, now)
+                if self.on_record is not None:
+                    try:
+                        self.on_record(device_id, record, payload)
+                    except Exception as e:
+                        print(f"❌ 장치 메시지 처리 오류 ({device_id or '기본'}): {e}")
+
+
+class DeviceRegistry:
+    def __init__(self, shards=4, on_record=None, maxsize=10000, backend=None):
+        self._shards = [_Shard(i, on_record, maxsize, backend) for i in range(shards)]
+        self.dropped = 0  # shard 큐가 가득 차서 버린 메시지
+        self.rejected = 0  # device_id 가 너무 긴 메시지
+
+    def shard_of(self, device_id):
+        # hash() 는 프로세스마다 달라지므로 crc32 (나중에 프로세스로 나눠도 같은 shard)
+        return self._shards[zlib.crc32(device_id.encode()) % len(self._shards)]
+
+    def _shard(self, device_id):
+        """장치 slot 을 만들 수 있는 device_id 의 shard (너무 긴 id 는 세고 None)."""
+        if len(device_id) > MAX_ID_LEN:
+            self.rejected += 1
+            return None
+        return self.shard_of(device_id)
+
+    # --- 수신 (MQTT 스레드) ---
+    def submit(self, device_id, payload):
+        """센서 메시지를 장치의 shard 큐에 넣는다. 버리면 False."""
+        shard = self._shard(device_id)
+        if shard is None:
+            return False
+        try:
+            shard.queue.put_nowait((device_id, payload))
+        except queue.Full:
+            self.dropped += 1
+            return False
+        return True
+
+    # 출력 상태도 slot 을 만들므로 submit 과 같은 id 길이 제한 (버리면 False)
+    def set_relay(self, device_id, on):
+        shard = self._shard(device_id)
+        if shard is None:
+            return False
+        shard.table.set_relay(device_id, on)
+        return True
+
+    def set_leds(self, device_id, states):
+        shard = self._shard(device_id)
+        if shard is None:
+            return False
+        mask = 0
+        for i, on in enumerate(states):
+            if on:
+                mask |= 1 << i
+        shard.table.set_leds(device_id, mask)
+        return True
+
+    def set_led(self, device_id, index, on):
+        shard = self._shard(device_id)
+        if shard is None:
+            return False
+        shard.table.set_led(device_id, index, on)
+        return True
+
+    # --- 조회 (아무 스레드) ---
+    def get(self, device_id):
+        return self.shard_of(device_id).table.get(device_id)
+
+    def devices(self):
+        return sorted(d for shard in self._shards for d in list(shard.table.ids))
+
+    def __len__(self):
+        return sum(len(shard.table) for shard in self._shards)
+
+    def snapshot(self):
+        return {
+            "devices": len(self),
+            "shards": [len(shard.table) for shard in self._shards],
+            "depth": sum(shard.queue.qsize() for shard in self._shards),
+            "decoded": sum(shard.decoder.decoded for shard in self._shards),
+            "malformed": sum(shard.decoder.malformed for shard in self._shards),
+            "dropped": self.dropped,
+            "rejected": self.rejected,
+        }
+
+    def start(self):
+        for shard in self._shards:
+            shard.thread = threading.Thread(target=shard.run, name=f"device-shard-{shard.index}",
+                                            daemon=True)
+            shard.thread.start()
+        return self
+
+    def stop(self, timeout=2.0):
+        """큐에 남은 메시지를 처리하고 워커를 끝낸다."""
+        for shard in self._shards:
+            if shard.thread is not None:
+                shard.queue.put(None)
+        for shard in self._shards:
+            if shard.thread is not None:
+                shard.thread.join(timeout)
+                shard.thread = None
+
+
+if __name__ == "__main__":
+    # 장치 수가 늘어도 수신/조회 비용이 같은지: python device_registry.py
+    import json
+    import timeit
+
+    payload = json.dumps({"temp": 23.5, "humi": 41.0, "pot": 1834, "relay": False}).encode()
+    for n in (10, 1000, 100000):
+        ids = [f"esp32-{i:06x}" for i in range(n)]
+        registry = DeviceRegistry(shards=4, maxsize=0).start()
+        started = time.perf_counter()
+        for k in range(200000):
+            registry.submit(ids[k % n], payload)
+        registry.stop(timeout=60)
+        ingest = 200000 / (time.perf_counter() - started)
+        t = timeit.timeit(lambda: registry.get(ids[n // 2]), number=100000)
+        st = registry.snapshot()
+        print(f"장치 {n:>6}  수신 {ingest:>9,.0f} msgs/s  조회 {t / 100000 * 1e9:6.0f} ns  "
+              f"shard {st['shards']}")
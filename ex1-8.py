@@ -1,16 +1,29 @@
 import tkinter as tk
 from tkinter import ttk
-import paho.mqtt.client as mqtt
-import threading
 import json
-import pymysql
 from datetime import datetime
+from functools import partial
+
+from mqtt_core import MqttCore
+from publisher import Publisher
+from sensor_db import DBWriter, make_row
+from storage import open_storage
+from spool import Spool
+from rollup import RollupEngine
+from compression import DeviceCompressors
+from payload import is_binary
+from led_mask import decode_mask, encode_mask
+from device_registry import DeviceRegistry, device_pattern, device_topic, parse_topic
+from ui_state import UiRefresher, UiState
+from log_view import LogBuffer, LogView
 
 # --- MQTT & DB 설정 ---
 BROKER = "broker.emqx.io"
 PORT = 1883
-SUB_TOPIC_SENSOR = "arduino/input"
-PUB_TOPIC_OUTPUT = "arduino/output"
+# 장치별 토픽 arduino/<device_id>/input ... 과 예전 전역 토픽(device_id "")을 같이 받는다
+# 예전 펌웨어용으로 .../led1..8 에도 같이 보낸다 (모든 보드를 업데이트하면 False)
+LED_LEGACY_TOPICS = True
+DEVICE_SHARDS = 4
 
 DB_CONFIG = {
     "host": "localhost",
@@ -19,91 +32,125 @@ DB_CONFIG = {
     "database": "python1"
 }
 
+# 저장소 선택: MariaDB 서버 없이 로깅만 하는 노드는 "sqlite" 로 바꾸면 된다
+STORAGE = {"backend": "mariadb", **DB_CONFIG}
+# STORAGE = {"backend": "sqlite", "path": "final_data.db"}
+
+# 저장 전 압축: 의미 있게 변한 샘플만 DB 에 넣는다 (5분마다 heartbeat)
+COMPRESSION = {
+    "temp": ("deadband", 0.5),
+    "humi": ("deadband", 0.5),
+    "rotary": ("swinging_door", 20),
+}
+MAX_SILENCE = 300.0
+
 led_pins = [2, 4, 5, 18, 19, 25, 26, 27]
+# 화면에 보이는 장치 (콤보박스로 고른다)의 LED 상태
+selected_device = ""
 led_states = [False] * 8
-relay_state = False
-current_values = {"temp": 0.0, "humi": 0.0, "pot": 0}
-
-# --- DB 저장 함수 ---
-def insert_data(rotary, temp, humi):
-    conn = None
-    cursor = None
-    try:
-        conn = pymysql.connect(**DB_CONFIG)
-        cursor = conn.cursor()
-        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
-        sql = "INSERT INTO final_data (rotary, temp, humi, data) VALUES (%s, %s, %s, %s)"
-        cursor.execute(sql, (rotary, temp, humi, now))
-        conn.commit()
-        print("✅ DB 저장 완료")
-    except Exception as e:
-        print(f"❌ DB 저장 오류: {e}")
-    finally:
-        if cursor: cursor.close()
-        if conn: conn.close()
-
-# --- MQTT 콜백 ---
-def on_connect(client, userdata, flags, rc):
-    if rc == 0:
-        print("✅ MQTT 연결 성공")
-        client.subscribe(SUB_TOPIC_SENSOR)
-        client.subscribe(PUB_TOPIC_OUTPUT)
-        for i in range(8):
-            client.subscribe(f"arduino/led{i+1}")
-    else:
-        print(f"❌ MQTT 연결 실패: {rc}")
-
-def on_message(client, userdata, msg):
-    global relay_state, led_states
-
-    topic = msg.topic
-    payload = msg.payload.decode()
-
-    if topic == SUB_TOPIC_SENSOR:
-        try:
-            data = json.loads(payload)
-            rotary = int(data.get("rotary", 0))
-            temp = float(data.get("temp", 0)) / 10
-            humi = float(data.get("humi", 0)) / 10
-
-            current_values["temp"] = temp
-            current_values["humi"] = humi
-            current_values["pot"] = rotary
-
-            root.after(0, update_sensor_ui, payload, rotary, temp, humi)
-            threading.Thread(target=insert_data, args=(rotary, temp, humi), daemon=True).start()
-        except Exception as e:
-            print(f"❌ 센서 메시지 처리 오류: {e}")
-
-    elif topic == PUB_TOPIC_OUTPUT:
-        relay_state = (payload.lower() == "post 3200 on")
-        root.after(0, update_status_ui)
-
-    elif topic.startswith("arduino/led"):
-        try:
-            led_num = int(topic.replace("arduino/led", "")) - 1
-            led_states[led_num] = (payload == "1")
-            root.after(0, update_status_ui)
-        except Exception as e:
-            print(f"❌ LED 메시지 처리 오류: {e}")
-
-# --- UI 업데이트 함수 ---
-def update_sensor_ui(msg, rotary, temp, humi):
-    log_text.config(state=tk.NORMAL)
-    log_text.insert(tk.END, f"수신: {msg}\n")
-    log_text.see(tk.END)
-    log_text.config(state=tk.DISABLED)
-
-    pot_value_label.config(text=f"{rotary}")
-    temp_value_label.config(text=f"{temp:.1f} ℃")
-    humi_value_label.config(text=f"{humi:.1f} %")
-    update_datetime_ui()
 
-def update_status_ui():
-    relay_value_label.config(text="ON" if relay_state else "OFF",
-                              fg="green" if relay_state else "red")
+# --- 화면 상태 (MQTT 스레드는 여기에 값만 쓰고, Tk 가 20Hz 로 바뀐 것만 그린다) ---
+UI_FPS = 20
+ui = UiState(relay=False, **{f"led{i}": False for i in range(8)})
+# 메시지 로그: 최근 LOG_CAPACITY 줄만 메모리에, 밀려난 줄은 mqtt_log.txt(.1 .2 ...)
+LOG_CAPACITY = 5000
+log_buffer = LogBuffer(LOG_CAPACITY, spill_path="mqtt_log.txt")
+
+# --- DB 저장 (저장소 + writer 스레드 + 로컬 spool) ---
+db_storage = open_storage(STORAGE)
+try:
+    db_storage.ensure_schema()
+except Exception as e:
+    print(f"❌ DB 스키마 확인 실패 (spool 에 쌓아둡니다): {e}")
+db_spool = Spool("sensor_spool.db", max_rows=500000)
+db_writer = DBWriter(db_storage, workers=1, maxsize=1000, batch_size=200, flush_interval=0.5,
+                     spool=db_spool).start()
+# 분/시간 집계 테이블 (MariaDB 저장소일 때만)
+db_rollup = None
+if db_storage.name == "mariadb":
+    db_rollup = RollupEngine(db_storage.pool, flush_interval=30.0).start()
+# 압축 기준점은 장치마다 따로
+db_compressor = DeviceCompressors(COMPRESSION, max_silence=MAX_SILENCE)
+
+def insert_data(device_id, rotary, temp, humi):
+    # 수신 시각과 sample_key, 장치 id 를 붙여 큐에 넣기만 하고 바로 돌아간다
+    row = make_row(rotary, temp, humi, device_id=device_id)
+    if db_rollup:
+        db_rollup.add(row)  # 집계는 압축 전 원본 샘플로
+    for stored in db_compressor.offer(row):
+        if not db_writer.submit(stored):
+            print("❌ DB 큐가 가득 차서 샘플을 버렸습니다")
+
+# --- 장치 메시지 처리 (DeviceRegistry 의 shard 스레드에서 불린다) ---
+def on_record(device_id, record, payload):
+    # 펌웨어는 ℃/% 실제 값과 pot(가변저항)을 보낸다
+    if device_id == selected_device:
+        ui.update(temp=record.temp, humi=record.humi, pot=record.pot, relay=record.relay)
+    name = device_id or "기본"
+    if is_binary(payload):
+        log_buffer.append(f"수신[{name}](binary #{record.seq}): temp {record.temp:.1f} "
+                          f"humi {record.humi:.1f} pot {record.pot} relay {'ON' if record.relay else 'OFF'}")
+    else:
+        log_buffer.append(f"수신[{name}]: {payload.decode(errors='replace')}")
+    insert_data(device_id, record.pot, record.temp, record.humi)
+
+device_registry = DeviceRegistry(shards=DEVICE_SHARDS, on_record=on_record)
+
+# --- MQTT 핸들러 (mqtt_core 라우팅 표에 등록) ---
+def on_sensor(topic, payload):
+    # 디코드/저장은 장치별 shard 워커가 한다 (MQTT 스레드는 큐에 넣고 바로 돌아감)
+    if not device_registry.submit(parse_topic(topic)[0], payload) and device_registry.dropped <= 10:
+        print(f"❌ 장치 큐가 가득 차서 메시지를 버렸습니다 ({topic})")
+
+def on_output(topic, payload):
+    device_id = parse_topic(topic)[0]
+    on = (payload.decode().lower() == "post 3200 on")
+    device_registry.set_relay(device_id, on)
+    if device_id == selected_device:
+        ui.set("relay", on)
+
+def on_led(index, topic, payload):
+    device_id = parse_topic(topic)[0]
+    device_registry.set_led(device_id, index, payload == b"1")
+    if device_id == selected_device:
+        led_states[index] = (payload == b"1")
+        ui.set(f"led{index}", led_states[index])
+
+def on_leds(topic, payload):
+    # .../leds: 8개 상태가 한 메시지로 온다
+    device_id = parse_topic(topic)[0]
+    states, _ = decode_mask(payload)
+    device_registry.set_leds(device_id, states)
+    if device_id == selected_device:
+        for i, on in enumerate(states):
+            led_states[i] = on
+            ui.set(f"led{i}", on)
+
+# --- 장치 선택 ---
+def refresh_device_list():
+    # 새 장치가 보였을 때만 목록을 바꾼다 (tick 마다 불림)
+    if len(device_registry) != len(device_combo["values"]):
+        device_combo["values"] = [d or "(기본)" for d in device_registry.devices()]
+
+def select_device(event=None):
+    global selected_device
+    name = device_combo.get()
+    selected_device = "" if name == "(기본)" else name
+    state = device_registry.get(selected_device)
+    if state is None:
+        return
     for i in range(8):
-        led_buttons[i].config(bg="green" if led_states[i] else "gray")
+        led_states[i] = bool(state.leds >> i & 1)
+        ui.set(f"led{i}", led_states[i])
+    ui.update(temp=state.temp, humi=state.humi, pot=state.pot, relay=state.relay)
+
+# --- UI 그리기 함수 (UiRefresher 가 Tk 스레드에서 부른다) ---
+def render_relay(on):
+    relay_value_label.config(text="ON" if on else "OFF",
+                             foreground="green" if on else "red")
+
+def render_led(index, on):
+    led_buttons[index].config(bg="green" if on else "gray")
 
 def update_datetime_ui():
     now = datetime.now()
@@ -119,30 +166,51 @@ def update_datetime():
 
 def toggle_led(index):
     led_states[index] = not led_states[index]
-    led_buttons[index].config(bg="green" if led_states[index] else "gray")
-    payload = "1" if led_states[index] else "0"
-    threading.Thread(target=lambda: client.publish(f"arduino/led{index+1}", payload), daemon=True).start()
+    ui.set(f"led{index}", led_states[index])
+    render_led(index, led_states[index])
+    # 발행 큐에 최신 상태만 남긴다 (빠르게 눌러도 토픽마다 마지막 값만 전송)
+    # retain: 재연결하거나 새로 켜진 패널/보드가 마지막 LED 상태를 바로 받는다
+    device_registry.set_leds(selected_device, led_states)
+    publisher.publish(device_topic(selected_device, "leds"), encode_mask(led_states), retain=True)
+    if LED_LEGACY_TOPICS:
+        publisher.publish(device_topic(selected_device, f"led{index+1}"),
+                          "1" if led_states[index] else "0", retain=True)
 
 def publish_message():
     msg = {"name": "arduino", "age": 20, "gender": "male"}
-    client.publish(PUB_TOPIC_OUTPUT, json.dumps(msg))
-    log_text.config(state=tk.NORMAL)
-    log_text.insert(tk.END, "메시지 전송 완료!\n")
-    log_text.see(tk.END)
-    log_text.config(state=tk.DISABLED)
+    publisher.publish(device_topic(selected_device, "output"), json.dumps(msg))
+    log_buffer.append("메시지 전송 완료!")
 
 def on_close():
-    try:
-        client.loop_stop()
-        client.disconnect()
-    except:
-        pass
+    publisher.stop()  # 남은 명령을 보내고 나서 연결을 끊는다
+    client.stop()
+    device_registry.stop()  # shard 큐에 남은 메시지까지 저장 큐로
+    refresher.stop()
+    for stored in db_compressor.flush():
+        db_writer.submit(stored)
+    db_writer.stop()  # 남은 batch 를 마지막으로 flush
+    if db_rollup:
+        db_rollup.stop()
+    st = db_writer.snapshot()
+    print(f"✅ DB 저장 {st['rows']}행 / batch {st['batches']}회 "
+          f"(평균 {st['avg_batch_size']:.1f}행, flush 평균 {st['avg_flush_ms']:.1f}ms)")
+    ds = device_registry.snapshot()
+    print(f"📨 장치 {ds['devices']}대 / 센서 메시지 {ds['decoded']}개 / 형식 오류 {ds['malformed']}개 "
+          f"/ 버림 {ds['dropped']}개")
+    ps = publisher.snapshot()
+    print(f"📤 발행 {ps['sent']}개 (요청 {ps['enqueued']}, 합침 {ps['coalesced']}) "
+          f"/ ack 평균 {ps['avg_latency_ms']:.1f}ms, 최대 {ps['max_latency_ms']:.1f}ms")
+    print(f"🗜 압축 {db_compressor.offered} → {db_compressor.stored}행 ({db_compressor.ratio:.1f}x)")
+    print(f"📦 spool 대기 {st['spool']['pending']}행 / 재전송 {st['spool']['replayed']}행")
+    db_spool.close()
+    log_buffer.close()
+    db_storage.close()
     root.destroy()
 
 # --- GUI 생성 ---
 root = tk.Tk()
 root.title("Arduino MQTT 모니터링")
-root.geometry("700x700")
+root.geometry("700x730")
 root.resizable(False, False)
 root.protocol("WM_DELETE_WINDOW", on_close)
 
@@ -150,6 +218,11 @@ root.protocol("WM_DELETE_WINDOW", on_close)
 datetime_frame = ttk.Frame(root)
 datetime_frame.pack(pady=8, fill=tk.X)
 
+ttk.Label(datetime_frame, text="장치:", font=("Arial", 12)).grid(row=0, column=4, sticky=tk.W, padx=(20, 5))
+device_combo = ttk.Combobox(datetime_frame, values=[], state="readonly", width=16)
+device_combo.grid(row=0, column=5, sticky=tk.W)
+device_combo.bind("<<ComboboxSelected>>", select_device)
+
 ttk.Label(datetime_frame, text="날짜:", font=("Arial", 12)).grid(row=0, column=0, sticky=tk.W, padx=5)
 date_value_label = ttk.Label(datetime_frame, text="--", font=("Arial", 12))
 date_value_label.grid(row=0, column=1, sticky=tk.W)
@@ -182,8 +255,8 @@ relay_value_label.grid(row=0, column=7, sticky=tk.W, padx=5)
 log_label = ttk.Label(root, text="MQTT 메시지 로그", font=("Arial", 12))
 log_label.pack(pady=(15, 0))
 
-log_text = tk.Text(root, height=15, width=85, state=tk.DISABLED, font=("Arial", 11))
-log_text.pack(padx=10, pady=5)
+log_view = LogView(root, log_buffer, height=15, width=85, font=("Arial", 11))
+log_view.pack(padx=10, pady=5)
 
 # 메시지 전송 버튼
 send_btn = ttk.Button(root, text="메시지 전송", command=publish_message)
@@ -200,12 +273,28 @@ for i in range(8):
     btn.grid(row=i//4, column=i%4, padx=8, pady=8)
     led_buttons.append(btn)
 
+# --- 화면 갱신 tick ---
+refresher = UiRefresher(root, ui, fps=UI_FPS)
+refresher.bind("temp", lambda v: temp_value_label.config(text=f"{v:.1f} ℃"))
+refresher.bind("humi", lambda v: humi_value_label.config(text=f"{v:.1f} %"))
+refresher.bind("pot", lambda v: pot_value_label.config(text=f"{v}"))
+refresher.bind("relay", render_relay)
+for i in range(8):
+    refresher.bind(f"led{i}", partial(render_led, i))
+refresher.every_tick(log_view.refresh)  # 쌓인 로그는 tick 마다 한 번만 그린다
+refresher.every_tick(refresh_device_list)
+refresher.start()
+
 # --- MQTT 시작 ---
-client = mqtt.Client()
-client.on_connect = on_connect
-client.on_message = on_message
-client.connect(BROKER, PORT, 60)
-client.loop_start()
+device_registry.start()
+client = MqttCore(BROKER, PORT)
+handlers = [("input", on_sensor), ("output", on_output), ("leds", on_leds)]
+handlers += [(f"led{i+1}", partial(on_led, i)) for i in range(8)]
+for leaf, handler in handlers:
+    client.on(device_topic("", leaf), handler)  # 예전 전역 토픽 (arduino/input ...)
+    client.on(device_pattern(leaf), handler)    # 모든 장치 (arduino/+/input ...)
+client.start()
+publisher = Publisher(client, rate=20, burst=10).start()
 
 update_datetime()
 root.mainloop()
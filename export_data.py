@@ -0,0 +1,253 @@
+"""final_data 를 날짜별 CSV/Parquet 파일로 내보내고 다시 넣는 도구.
+
+    python export_data.py export --out backup --format csv
+    python export_data.py export --out backup --format parquet --start 2025-01-01
+    python export_data.py import backup/final_data_2025-01-01.csv --host 192.168.0.10
+
+export 는 서버 쪽 unbuffered 커서(SSCursor)로 chunk 행씩 받아서 바로 파일에
+쓰기 때문에 테이블 크기와 상관없이 메모리 사용량이 일정하다.
+Parquet 는 pyarrow 가 설치되어 있을 때만 쓸 수 있다.
+"""
+import argparse
+import csv
+import os
+import time
+from datetime import datetime
+
+import pymysql
+import pymysql.cursors
+
+from sensor_db import TABLE, add_db_args, db_config_from_args
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+
+def _day_of(value):
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d")
+    return str(value)[:10]
+
+
+# --- 날짜별 파일 쓰기 ---
+class CsvDaySink:
+    ext = "csv"
+
+    def __init__(self, path, columns):
+        self._file = open(path, "w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(columns)
+
+    def write(self, rows):
+        self._writer.writerows(rows)
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetDaySink:
+    ext = "parquet"
+
+    def __init__(self, path, columns):
+        if pq is None:
+            raise SystemExit("❌ Parquet 출력에는 pyarrow 가 필요합니다 (pip install pyarrow)")
+        self._path = path
+        self._columns = columns
+        self._schema = None
+        self._writer = None
+
+    def write(self, rows):
+        # chunk 하나가 row group 하나 (열 단위로 바꿔서 쓴다)
+        arrays = {name: list(col) for name, col in zip(self._columns, zip(*rows))}
+        if self._writer is None:
+            schema = pa.table(arrays).schema
+            # 첫 chunk 가 전부 NULL 인 컬럼(sample_key 등)은 문자열로 고정
+            self._schema = pa.schema([
+                pa.field(f.name, pa.string()) if pa.types.is_null(f.type) else f
+                for f in schema])
+            self._writer = pq.ParquetWriter(self._path, self._schema, compression="zstd")
+        self._writer.write_table(pa.table(arrays, schema=self._schema))
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+SINKS = {"csv": CsvDaySink, "parquet": ParquetDaySink}
+
+
+def export(db_config, out_dir, fmt="csv", start=None, end=None, chunk=10000):
+    os.makedirs(out_dir, exist_ok=True)
+    sink_cls = SINKS[fmt]
+    sql = f"SELECT * FROM {TABLE}"
+    where, args = [], []
+    if start is not None:
+        where.append("data >= %s")
+        args.append(start)
+    if end is not None:
+        where.append("data < %s")
+        args.append(end)
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY data"
+
+    conn = pymysql.connect(**db_config, cursorclass=pymysql.cursors.SSCursor)
+    total = 0
+    files = []
+    started = time.perf_counter()
+    sink = None
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(sql, args)
+            columns = [d[0] for d in cursor.description]
+            data_index = columns.index("data")
+            day = None
+            while True:
+                rows = cursor.fetchmany(chunk)
+                if not rows:
+                    break
+                # chunk 안에서 날짜가 바뀌는 지점마다 잘라서 각 날짜 파일에 쓴다
+                begin = 0
+                for k, row in enumerate(rows):
+                    row_day = _day_of(row[data_index])
+                    if row_day != day:
+                        if sink is not None and k > begin:
+                            sink.write(rows[begin:k])
+                        begin = k
+                        if sink is not None:
+                            sink.close()
+                        day = row_day
+                        path = os.path.join(out_dir, f"{TABLE}_{day}.{sink_cls.ext}")
+                        sink = sink_cls(path, columns)
+                        files.append(path)
+                sink.write(rows[begin:])
+                total += len(rows)
+        if sink is not None:
+            sink.close()
+    finally:
+        conn.close()
+    elapsed = time.perf_counter() - started
+    print(f"✅ {total}행 → 파일 {len(files)}개 ({total / elapsed if elapsed else 0:,.0f} rows/s)")
+    return files
+
+
+# --- 가져오기 ---
+NULLABLE = {"sample_key"}  # CSV 의 빈 칸을 NULL 로 되돌릴 컬럼
+
+
+def _import_columns(header):
+    # id 는 대상 서버에서 새로 매긴다
+    return [c for c in header if c != "id"]
+
+
+def import_csv_load_data(db_config, path):
+    """LOAD DATA LOCAL INFILE 로 CSV 한 파일을 서버에 통째로 넣는다."""
+    with open(path, newline="", encoding="utf-8") as f:
+        header = next(csv.reader(f))
+    targets = [f"@{c}" for c in header]
+    # id 는 건너뛰고 대상 서버에서 새로 매긴다
+    sets = [f"{c} = NULLIF(@{c}, '')" if c in NULLABLE else f"{c} = @{c}"
+            for c in _import_columns(header)]
+    conn = pymysql.connect(**db_config, local_infile=True)
+    try:
+        with conn.cursor() as cursor:
+            rows = cursor.execute(
+                f"LOAD DATA LOCAL INFILE %s IGNORE INTO TABLE {TABLE} "
+                f"FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' "
+                f"LINES TERMINATED BY '\\r\\n' IGNORE 1 LINES "
+                f"({', '.join(targets)}) SET {', '.join(sets)}",
+                (os.path.abspath(path),))
+        conn.commit()
+    finally:
+        conn.close()
+    return rows
+
+
+def _read_batches(path, batch):
+    if path.endswith(".parquet"):
+        if pq is None:
+            raise SystemExit("❌ Parquet 입력에는 pyarrow 가 필요합니다 (pip install pyarrow)")
+        pf = pq.ParquetFile(path)
+        header = pf.schema_arrow.names
+        yield header
+        for rb in pf.iter_batches(batch_size=batch):
+            yield list(zip(*(rb.column(i).to_pylist() for i in range(rb.num_columns))))
+        return
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        yield header
+        nullable = [i for i, c in enumerate(header) if c in NULLABLE]
+        rows = []
+        for row in reader:
+            # sample_key 가 없는 예전 행은 빈 칸으로 저장되어 있다
+            for i in nullable:
+                if row[i] == "":
+                    row[i] = None
+            rows.append(row)
+            if len(rows) >= batch:
+                yield rows
+                rows = []
+        if rows:
+            yield rows
+
+
+def import_batched(db_config, path, batch=5000):
+    """파일을 batch 행씩 여러 행 INSERT 로 넣는다 (sample_key 중복은 건너뜀)."""
+    batches = _read_batches(path, batch)
+    header = next(batches)
+    columns = _import_columns(header)
+    keep = [header.index(c) for c in columns]
+    sql = (f"INSERT INTO {TABLE} ({', '.join(columns)}) "
+           f"VALUES ({', '.join(['%s'] * len(columns))})")
+    if "sample_key" in columns:
+        sql += " ON DUPLICATE KEY UPDATE sample_key = sample_key"
+    conn = pymysql.connect(**db_config)
+    total = 0
+    try:
+        with conn.cursor() as cursor:
+            for rows in batches:
+                cursor.executemany(sql, [[row[i] for i in keep] for row in rows])
+                conn.commit()
+                total += len(rows)
+    finally:
+        conn.close()
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="final_data 내보내기/가져오기")
+    sub = parser.add_subparsers(dest="command", required=True)
+    ex = sub.add_parser("export")
+    ex.add_argument("--out", default="export")
+    ex.add_argument("--format", choices=sorted(SINKS), default="csv")
+    ex.add_argument("--start", type=datetime.fromisoformat)
+    ex.add_argument("--end", type=datetime.fromisoformat)
+    ex.add_argument("--chunk", type=int, default=10000)
+    im = sub.add_parser("import")
+    im.add_argument("files", nargs="+")
+    im.add_argument("--method", choices=["load", "insert"], default="load",
+                    help="load: LOAD DATA LOCAL INFILE (CSV 만), insert: 여러 행 INSERT")
+    im.add_argument("--batch", type=int, default=5000)
+    for p in sub.choices.values():
+        add_db_args(p)
+    args = parser.parse_args()
+    db_config = db_config_from_args(args)
+
+    if args.command == "export":
+        export(db_config, args.out, args.format, args.start, args.end, args.chunk)
+        return
+    for path in args.files:
+        started = time.perf_counter()
+        if args.method == "load" and path.endswith(".csv"):
+            rows = import_csv_load_data(db_config, path)
+        else:
+            rows = import_batched(db_config, path, args.batch)
+        print(f"✅ {path}: {rows}행 ({time.perf_counter() - started:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""카메라 JPEG 를 화면/YOLO 크기로 바로 디코드하는 단계.
+
+    decoder = FrameDecoder((640, 480))          # OpenCV (카메라 ex08.py)
+    frame = decoder.decode(jpg)                 # BGR ndarray 640x480 (깨진 JPEG 면 None)
+
+    pil = PilDecoder((320, 240))                # PIL (PyDroid3.py)
+    img = pil.decode(jpg)                       # RGB Image 320x240
+
+- 디코드하기 전에 SOF 헤더에서 원본 크기만 읽고 (jpeg_size), 목표 크기 이상이 되는
+  가장 큰 1/2, 1/4, 1/8 로 DCT 단계에서 줄여서 디코드한다
+  (OpenCV IMREAD_REDUCED_COLOR_2/4/8, PIL Image.draft). 1600x1200 → 640x480 은 1/2 로 디코드.
+- 크기가 딱 맞으면 그대로 쓰고, 아니면 미리 만들어 둔 출력 버퍼(ring)에 cv2.resize(dst=...)
+  그래서 돌려준 배열은 buffers 번 더 decode() 하면 덮어써진다. 더 오래 들고 있을 거면 .copy()
+- 버릴 프레임은 디코드하지 않는다: 파이프라인의 decode 단계는 infer 가 다음 프레임을
+  기다릴 때만 가장 최신 JPEG 를 꺼내 디코드한다 (vision_pipeline.py)
+벤치마크: python frame_decode.py [녹화.mjpg]
+"""
+import struct
+from io import BytesIO
+
+try:
+    import cv2
+    import numpy as np
+except ImportError:
+    cv2 = None
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# SOF0..SOF15 중 DHT(C4), JPG(C8), DAC(CC) 는 프레임 헤더가 아니다
+_SOF = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def jpeg_size(jpg):
+    """JPEG 의 (너비, 높이) 를 디코드 없이 SOF 헤더에서 읽는다 (못 찾으면 None)."""
+    i, n = 2, len(jpg)
+    while i + 9 < n:
+        if jpg[i] != 0xFF:
+            return None
+        marker = jpg[i + 1]
+        if marker == 0xFF:  # 채움 바이트
+            i += 1
+            continue
+        if marker in _SOF:
+            height, width = struct.unpack_from(">HH", jpg, i + 5)
+            return width, height
+        if marker == 0xDA:  # 스캔 시작: 그 뒤는 이미지 데이터
+            return None
+        i += 2 + struct.unpack_from(">H", jpg, i + 2)[0]
+    return None
+
+
+def reduction(size, target):
+    """size 를 target 이상으로 유지하는 가장 큰 축소 배율 (1, 2, 4, 8)."""
+    w, h = size
+    for factor in (8, 4, 2):
+        # libjpeg 는 올림으로 줄인다
+        if -(-w // factor) >= target[0] and -(-h // factor) >= target[1]:
+            return factor
+    return 1
+
+
+class FrameDecoder:
+    """OpenCV: JPEG → size 크기 BGR ndarray."""
+
+    FLAGS = {1: None, 2: "IMREAD_REDUCED_COLOR_2", 4: "IMREAD_REDUCED_COLOR_4", 8: "IMREAD_REDUCED_COLOR_8"}
+
+    def __init__(self, size=(640, 480), buffers=4):
+        """buffers: resize 출력 버퍼 수 (돌려준 프레임이 파이프라인에 동시에 살아 있는 수보다 커야 한다).
+
+        VisionPipeline 의 on-demand 디코드에서는 살아 있는 프레임이 많아야
+        (그리는 중 + inferred 칸 + 추론 중/새로 디코드) 3~4 개라서 기본값 4 로 충분하다.
+        decode_on_demand=False 처럼 디코드가 추론보다 앞서 계속 돌면 ring 이 추론/그리는 중인
+        프레임을 덮어쓴다: 그때는 decode 가 돌려준 배열을 .copy() 해서 넘겨야 한다."""
+        if cv2 is None:
+            raise RuntimeError("opencv-python 이 필요합니다")
+        self.size = size
+        self._flags = {f: cv2.IMREAD_COLOR if name is None else getattr(cv2, name)
+                       for f, name in self.FLAGS.items()}
+        self._ring = [np.empty((size[1], size[0], 3), np.uint8) for _ in range(buffers)]
+        self._next = 0
+        self.decoded = 0
+        self.failed = 0
+        self.resized = 0
+        self.factors = {1: 0, 2: 0, 4: 0, 8: 0}
+
+    def decode(self, jpg):
+        src = jpeg_size(jpg)
+        factor = reduction(src, self.size) if src else 1
+        image = cv2.imdecode(np.frombuffer(jpg, np.uint8), self._flags[factor])
+        if image is None:
+            self.failed += 1
+            return None
+        self.decoded += 1
+        self.factors[factor] += 1
+        if image.shape[1] == self.size[0] and image.shape[0] == self.size[1]:
+            return image
+        out = self._ring[self._next]
+        self._next = (self._next + 1) % len(self._ring)
+        cv2.resize(image, self.size, dst=out)
+        self.resized += 1
+        return out
+
+    def snapshot(self):
+        return {"decoded": self.decoded, "failed": self.failed, "resized": self.resized,
+                "factors": dict(self.factors)}
+
+
+class PilDecoder:
+    """PIL: JPEG → size 크기 RGB Image (draft 로 DCT 단계에서 줄여서 디코드)."""
+
+    def __init__(self, size=(320, 240)):
+        if Image is None:
+            raise RuntimeError("Pillow 가 필요합니다")
+        self.size = size
+        self.decoded = 0
+        self.failed = 0
+
+    def decode(self, jpg):
+        try:
+            img = Image.open(BytesIO(jpg))
+            img.draft("RGB", self.size)  # 목표 이상인 가장 작은 1/2, 1/4, 1/8 로
+            img = img.convert("RGB")
+        except OSError:
+            self.failed += 1
+            return None
+        self.decoded += 1
+        if img.size != self.size:
+            img = img.resize(self.size, Image.BILINEAR)
+        return img
+
+
+# --- 벤치마크 ---
+def main():
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="JPEG 전체 디코드 + resize vs 줄여서 디코드")
+    parser.add_argument("recording", nargs="?", help="녹화한 .mjpg (mjpeg.py --record)")
+    parser.add_argument("--source", default="1600x1200", help="녹화가 없을 때 합성 프레임 크기 (ESP32-CAM UXGA)")
+    parser.add_argument("--frames", type=int, default=100)
+    args = parser.parse_args()
+
+    if args.recording:
+        from mjpeg import MjpegDemuxer
+        with open(args.recording, "rb") as f:
+            frames = [bytes(jpg) for jpg in MjpegDemuxer().read_from(f)][:args.frames]
+    else:
+        if cv2 is None:
+            raise SystemExit("❌ 합성 프레임을 만들려면 opencv-python 이 필요합니다 (녹화 파일을 주세요)")
+        w, h = map(int, args.source.split("x"))
+        rng = np.random.default_rng(1)
+        frames = []
+        for _ in range(args.frames):
+            small = rng.integers(0, 255, (h // 40, w // 40, 3), np.uint8)
+            ok, jpg = cv2.imencode(".jpg", cv2.resize(small, (w, h)), [cv2.IMWRITE_JPEG_QUALITY, 80])
+            frames.append(jpg.tobytes())
+    print(f"{len(frames)}프레임 {jpeg_size(frames[0])} 평균 {sum(map(len, frames)) // len(frames) // 1024}KB")
+
+    def run(label, fn):
+        started = time.process_time()
+        for jpg in frames:
+            fn(jpg)
+        cpu = (time.process_time() - started) / len(frames) * 1000
+        print(f"  {label:34s} CPU {cpu:6.2f} ms/프레임")
+        return cpu
+
+    if cv2 is not None:
+        cv2.setNumThreads(1)  # 한 코어 CPU 시간으로 비교
+        base = run("cv2 전체 디코드 + resize 640x480",
+                   lambda jpg: cv2.resize(cv2.imdecode(np.frombuffer(jpg, np.uint8), cv2.IMREAD_COLOR),
+                                          (640, 480)))
+        decoder = FrameDecoder((640, 480))
+        cpu = run("FrameDecoder 640x480", decoder.decode)
+        print(f"  → {base / cpu:.1f}배, {decoder.snapshot()}")
+    if Image is not None:
+        base = run("PIL 전체 디코드 + resize 320x240",
+                   lambda jpg: Image.open(BytesIO(jpg)).convert("RGB").resize((320, 240)))
+        cpu = run("PilDecoder 320x240 (draft)", PilDecoder((320, 240)).decode)
+        print(f"  → {base / cpu:.1f}배")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+"""Tk 창 없이 센서 데이터를 final_data 에 쌓는 asyncio 게이트웨이.
+
+    python gateway.py --config gateway.ini
+
+ex1-8.py 와 같은 구독 → 파싱 → 저장 흐름을 이벤트 루프 하나에서 돌린다.
+paho 클라이언트의 소켓을 asyncio 에 직접 붙여서 (loop_start 스레드 없음)
+수신 메시지는 asyncio.Queue 로 넘기고, 파싱 task 가 한 번에 여러 개씩 꺼내
+압축/집계 후 DBWriter(백그라운드 writer 스레드 = executor) 에 넘긴다.
+SIGINT/SIGTERM 을 받으면 구독을 끊고 큐에 남은 메시지를 모두 저장한 뒤 끝낸다.
+여러 보드의 arduino/<device_id>/input 을 같이 받아서 행마다 device_id 를 붙이고,
+압축 기준점과 최신 상태(DeviceTable)는 장치별로 따로 둔다.
+Tk 패널들은 필요할 때만 띄우는 선택 사항이 된다.
+"""
+import argparse
+import asyncio
+import configparser
+import signal
+import time
+
+import paho.mqtt.client as mqtt
+
+from compression import DeviceCompressors
+from device_registry import DeviceTable, parse_topic
+from mqtt_core import MqttCore, backoff_delay
+from payload import PayloadDecoder
+from rollup import RollupEngine
+from sensor_db import DBWriter, make_row
+from spool import Spool
+from storage import open_storage
+
+
+# --- 설정 ---
+def load_config(path):
+    config = configparser.ConfigParser()
+    if not config.read(path, encoding="utf-8"):
+        raise SystemExit(f"❌ 설정 파일을 찾을 수 없습니다: {path}")
+    return config
+
+
+def storage_config(config):
+    options = dict(config["storage"])
+    if "port" in options:
+        options["port"] = int(options["port"])
+    return options
+
+
+def compression_fields(config):
+    if not config.has_section("compression"):
+        return None, 0.0
+    section = dict(config["compression"])
+    max_silence = float(section.pop("max_silence", 300))
+    fields = {}
+    for name, spec in section.items():
+        kind, param = spec.split()
+        fields[name] = (kind, float(param))
+    return fields, max_silence
+
+
+# --- paho 소켓을 asyncio 이벤트 루프에 연결 ---
+class AsyncioHelper:
+    """loop_start() 스레드 대신 소켓 읽기/쓰기를 이벤트 루프의 reader/writer 로 처리한다."""
+
+    def __init__(self, loop, client):
+        self.loop = loop
+        self.client = client
+        self._misc = None
+        self._deferred = None  # connect() 가 executor 에서 도는 동안 미뤄 둔 소켓 콜백
+        client.on_socket_open = self._on_socket_open
+        client.on_socket_close = self._on_socket_close
+        client.on_socket_register_write = self._on_register_write
+        client.on_socket_unregister_write = self._on_unregister_write
+
+    def _run(self, fn, *args):
+        if self._deferred is not None:
+            self._deferred.append((fn, args))
+        else:
+            fn(*args)
+
+    async def connect(self, host, port, keepalive):
+        """paho connect() 는 DNS + TCP 연결을 블로킹으로 하므로 executor 에서 돌리고,
+        그 사이 생긴 소켓 등록은 끝난 뒤 이벤트 루프에서 한다."""
+        self._deferred = []
+        try:
+            await self.loop.run_in_executor(None, self.client.connect, host, port, keepalive)
+        finally:
+            deferred, self._deferred = self._deferred, None
+            for fn, args in deferred:
+                fn(*args)
+
+    def _on_socket_open(self, client, userdata, sock):
+        self._run(self._open, client, sock)
+
+    def _open(self, client, sock):
+        self.loop.add_reader(sock, client.loop_read)
+        self._misc = self.loop.create_task(self._misc_loop())
+
+    def _on_socket_close(self, client, userdata, sock):
+        self._run(self._close, sock)
+
+    def _close(self, sock):
+        self.loop.remove_reader(sock)
+        if self._misc is not None:
+            self._misc.cancel()
+            self._misc = None
+
+    def _on_register_write(self, client, userdata, sock):
+        self._run(self.loop.add_writer, sock, client.loop_write)
+
+    def _on_unregister_write(self, client, userdata, sock):
+        self._run(self.loop.remove_writer, sock)
+
+    async def _misc_loop(self):
+        # keepalive PING 과 재전송 타이머
+        while self.client.loop_misc() == mqtt.MQTT_ERR_SUCCESS:
+            await asyncio.sleep(1)
+
+
+# --- 게이트웨이 ---
+class Gateway:
+    def __init__(self, config):
+        self.config = config
+        mq = config["mqtt"]
+        self.topics = [t.strip() for t in mq.get("topic", "arduino/input").split(",") if t.strip()]
+        self.qos = mq.getint("qos", 0)
+        self.core = MqttCore(mq.get("broker"), mq.getint("port", 1883),
+                             client_id=mq.get("client_id", ""))
+        gw = config["gateway"] if config.has_section("gateway") else {}
+        self.queue_size = int(gw.get("queue_size", 10000))
+        self.stats_interval = float(gw.get("stats_interval", 60))
+
+        self.received = 0
+        self.dropped = 0
+        self.failed = 0  # 저장 중 오류로 버린 메시지
+        self.decoder = PayloadDecoder()
+        self.devices = DeviceTable()  # 장치별 최신 값 (이벤트 루프에서만 갱신)
+        self.stored = 0  # writer 큐에 넣은 행
+        self.db_dropped = 0  # writer 큐가 가득 차서 버린 행
+        self.queue = None
+        self.loop = None
+        self._stopping = None
+        self._helper = None
+
+        self.storage = open_storage(storage_config(config))
+        self.spool = None
+        if config.has_section("spool") and config["spool"].get("path"):
+            self.spool = Spool(config["spool"]["path"], config["spool"].getint("max_rows", 500000))
+        w = config["writer"] if config.has_section("writer") else {}
+        self.writer = DBWriter(self.storage, workers=int(w.get("workers", 1)),
+                               maxsize=int(w.get("maxsize", 5000)),
+                               batch_size=int(w.get("batch_size", 200)),
+                               flush_interval=float(w.get("flush_interval", 0.5)),
+                               spool=self.spool)
+        self.rollup = None
+        if (config.has_section("rollup") and config["rollup"].getboolean("enabled", True)
+                and self.storage.name == "mariadb"):
+            self.rollup = RollupEngine(self.storage.pool, config["rollup"].getfloat("flush_interval", 30.0))
+        fields, max_silence = compression_fields(config)
+        self.compressor = DeviceCompressors(fields, max_silence) if fields else None
+
+    # --- 수신 (이벤트 루프 스레드) ---
+    def _on_message(self, topic, payload):
+        self.received += 1
+        try:
+            self.queue.put_nowait((topic, payload))
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    def _store(self, row):
+        if self.rollup:
+            self.rollup.add(row)
+        rows = self.compressor.offer(row) if self.compressor else [row]
+        self._submit(rows)
+
+    def _submit(self, rows):
+        for row in rows:
+            if self.writer.submit(row):
+                self.stored += 1
+            else:
+                self.db_dropped += 1
+
+    async def _consume(self):
+        while True:
+            items = [await self.queue.get()]
+            # 쌓여 있는 만큼 한 번에 꺼내서 await 횟수를 줄인다
+            while len(items) < 500 and not self.queue.empty():
+                items.append(self.queue.get_nowait())
+            decode = self.decoder.decode
+            now = time.time()
+            for topic, payload in items:
+                try:
+                    record = decode(payload)
+                    if record is not None:
+                        device_id = parse_topic(topic)[0]
+                        self.devices.update(device_id, record, now)
+                        self._store(make_row(record.pot, record.temp, record.humi, device_id=device_id))
+                    elif self.decoder.malformed <= 10:
+                        print(f"❌ 센서 메시지 형식 오류: {self.decoder.last_error}")
+                except Exception as e:
+                    # 메시지 하나 때문에 task 가 죽으면 shutdown 의 queue.join() 이 끝나지 않는다
+                    self.failed += 1
+                    if self.failed <= 10:
+                        print(f"❌ 센서 메시지 처리 오류 ({topic}): {e}")
+                finally:
+                    self.queue.task_done()
+
+    async def _connect(self):
+        """연결이 끊기면 jitter 를 섞은 지수 backoff (최대 60초) 로 다시 붙는다."""
+        attempt = 0
+        while not self._stopping.is_set():
+            if self.core.connected:
+                attempt = 0
+            elif self.core.client.socket() is None:
+                if attempt:
+                    delay = backoff_delay(attempt - 1)
+                    print(f"🔄 MQTT 재연결 {delay:.1f}초 후")
+                    await asyncio.sleep(delay)
+                attempt += 1
+                try:
+                    await self._helper.connect(self.core.broker, self.core.port, self.core.keepalive)
+                except OSError as e:
+                    print(f"❌ MQTT 연결 실패: {e}")
+                    continue
+            await asyncio.sleep(1.0)
+
+    async def _report(self):
+        last, last_t = 0, time.monotonic()
+        while True:
+            await asyncio.sleep(self.stats_interval)
+            now = time.monotonic()
+            rate = (self.received - last) / (now - last_t)
+            last, last_t = self.received, now
+            st = self.writer.snapshot()
+            print(f"📦 수신 {self.received} ({rate:.0f}/s) 장치 {len(self.devices)}대 큐 {self.queue.qsize()} "
+                  f"버림 {self.dropped} 형식 오류 {self.decoder.malformed} / DB {st['rows']}행 "
+                  f"큐 가득 차서 버림 {self.db_dropped} (평균 flush {st['avg_flush_ms']:.1f}ms)")
+
+    def stop(self):
+        self._stopping.set()
+
+    async def run(self):
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self._stopping = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                self.loop.add_signal_handler(sig, self.stop)
+            except (NotImplementedError, RuntimeError):
+                pass  # Windows: Ctrl+C 는 KeyboardInterrupt 로 온다
+
+        try:
+            self.storage.ensure_schema()
+        except Exception as e:
+            print(f"❌ DB 스키마 확인 실패 (spool 에 쌓아둡니다): {e}")
+        self.writer.start()
+        if self.rollup:
+            self.rollup.start()
+
+        self._helper = AsyncioHelper(self.loop, self.core.client)
+        for topic in self.topics:
+            self.core.on(topic, self._on_message, self.qos)
+        tasks = [self.loop.create_task(self._consume()),
+                 self.loop.create_task(self._connect()),
+                 self.loop.create_task(self._report())]
+        print(f"✅ 게이트웨이 시작: {self.core.broker}:{self.core.port} {', '.join(self.topics)} "
+              f"→ {self.storage.name}")
+        try:
+            await self._stopping.wait()
+        finally:
+            await self.shutdown(tasks)
+
+    async def shutdown(self, tasks):
+        """수신을 멈추고 큐에 남은 메시지를 모두 저장한 뒤 자원을 닫는다."""
+        print("⏹ 종료 중: 남은 메시지 저장")
+        tasks[1].cancel()
+        self.core.client.disconnect()
+        await self.queue.join()
+        for task in tasks:
+            task.cancel()
+        if self.compressor:
+            self._submit(self.compressor.flush())
+        # writer/rollup 의 flush 는 블로킹이라 executor 에서 기다린다
+        await self.loop.run_in_executor(None, self.writer.stop)
+        if self.rollup:
+            await self.loop.run_in_executor(None, self.rollup.stop)
+        st = self.writer.snapshot()
+        print(f"✅ 수신 {self.received} / 버림 {self.dropped} / 형식 오류 {self.decoder.malformed} / "
+              f"DB 저장 {st['rows']}행 (batch {st['batches']}회) / DB 큐 가득 차서 버림 {self.db_dropped}행")
+        if self.spool is not None:
+            print(f"📦 spool 대기 {st['spool']['pending']}행")
+            self.spool.close()
+        self.storage.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MQTT → final_data 헤드리스 게이트웨이")
+    parser.add_argument("--config", default="gateway.ini")
+    args = parser.parse_args()
+    gateway = Gateway(load_config(args.config))
+    try:
+        asyncio.run(gateway.run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""LED 8개를 메시지 하나로 설정하는 arduino/leds 토픽 형식.
+
+payload 는 1바이트 또는 9바이트:
+    [mask]              bit i = LED i+1 켜짐 (펌웨어는 digitalWrite)
+    [mask, pwm1..pwm8]  켜진 LED 는 해당 밝기(0~255)로 analogWrite
+펌웨어(1-6dht9.ino, LED8 스케치)는 받은 즉시 8개를 한 번에 적용한다.
+장치별 토픽은 arduino/<device_id>/leds (device_registry.device_topic),
+예전 arduino/leds, arduino/led1..8 토픽도 그대로 동작한다.
+
+    client.publish(LED_TOPIC, encode_mask([True, False] * 4))
+    states, pwm = decode_mask(payload)
+"""
+
+LED_TOPIC = "arduino/leds"
+LED_COUNT = 8
+
+
+def encode_mask(states, pwm=None):
+    mask = 0
+    for i, on in enumerate(states[:LED_COUNT]):
+        if on:
+            mask |= 1 << i
+    if pwm is None:
+        return bytes([mask])
+    if len(pwm) != LED_COUNT:
+        raise ValueError(f"PWM 값은 {LED_COUNT}개여야 합니다")
+    return bytes([mask, *pwm])
+
+
+def decode_mask(payload):
+    """payload → ([bool] * 8, [0~255] * 8 또는 None)."""
+    if len(payload) not in (1, 1 + LED_COUNT):
+        raise ValueError(f"arduino/leds payload 길이 {len(payload)} (1 또는 9)")
+    mask = payload[0]
+    states = [bool(mask >> i & 1) for i in range(LED_COUNT)]
+    pwm = list(payload[1:]) if len(payload) > 1 else None
+    return states, pwm
@@ -0,0 +1,491 @@
+"""ESP32(1-6dht9.ino) 여러 대를 흉내 내는 부하 생성기와 종단 간 지연 측정.
+
+    python loadgen.py --devices 50,200,500 --interval 2 --duration 30
+    python loadgen.py --devices 100 --broker 127.0.0.1:1883   # 로컬 mosquitto
+    python loadgen.py --devices 100 --binary --out report.json
+
+장치마다 TCP 연결 하나로 펌웨어와 같은 JSON ({"temp","humi","pot","relay"})을
+interval 초마다 arduino/<device_id>/input 에 보낸다 (--legacy 면 arduino/input).
+메시지에는 seq (장치 번호 << 20 | 순번) 를 찍고 보낸 시각을 기록해 둔다.
+
+받는 쪽은 별도 프로세스에서 ex1-8.py 와 같은 수신 경로를 그대로 만든다:
+    MqttCore → DeviceRegistry(shard 디코드) → 압축(DeviceCompressors) → DBWriter → 저장소 (기본 임시 SQLite)
+그리고 shard 콜백 시각과 DB commit 시각을 seq 별로 기록한다.
+압축이 버린 샘플은 버림이 아니라 compressed 로 따로 센다. swinging door 가 잡아 두었다가
+다음 샘플에서 저장하는 샘플은 그만큼 (interval 초) 늦게 commit 된다. --no-compress 면 모두 저장.
+끝나면 publish→콜백, 콜백→commit, publish→commit 지연 백분위, 버려진 메시지 수,
+받는 프로세스의 CPU 사용률과 최대 RSS 를 표와 JSON 으로 낸다.
+
+--broker 를 주지 않으면 이 프로세스 안의 간단한 MQTT 3.1.1 브로커(QoS 0/1, retain 없음)를 쓴다.
+같은 --seed 면 장치별 값/전송 시각 배치가 같고, 보고서의 stream_sha256 으로 확인할 수 있다.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from device_registry import device_topic
+from mqtt_core import TopicRouter
+from payload import SensorRecord, encode_binary
+
+SEQ_BITS = 20  # 장치 하나당 최대 100만 메시지
+# ex1-8.py 의 COMPRESSION/MAX_SILENCE 와 같은 값
+COMPRESSION = {
+    "temp": ("deadband", 0.5),
+    "humi": ("deadband", 0.5),
+    "rotary": ("swinging_door", 20),
+}
+MAX_SILENCE = 300.0
+SEQ_MASK = (1 << SEQ_BITS) - 1
+
+
+# --- MQTT 패킷 (브로커 stand-in / 장치 흉내용 최소 구현) ---
+def _varint(n):
+    out = bytearray()
+    while True:
+        byte, n = n & 0x7F, n >> 7
+        out.append(byte | 0x80 if n else byte)
+        if not n:
+            return bytes(out)
+
+
+def _string(s):
+    data = s.encode()
+    return len(data).to_bytes(2, "big") + data
+
+
+def _packet(header, body):
+    return bytes([header]) + _varint(len(body)) + body
+
+
+def connect_packet(client_id, keepalive=0):
+    # 프로토콜 "MQTT" 레벨 4 (3.1.1), clean session
+    return _packet(0x10, _string("MQTT") + bytes([4, 0x02]) + keepalive.to_bytes(2, "big")
+                   + _string(client_id))
+
+
+def publish_packet(topic, payload):
+    return _packet(0x30, _string(topic) + payload)
+
+
+async def read_packet(reader):
+    """(헤더 바이트, 본문) 하나를 읽는다. 연결이 끊기면 IncompleteReadError."""
+    header = (await reader.readexactly(1))[0]
+    length, shift = 0, 0
+    while True:
+        byte = (await reader.readexactly(1))[0]
+        length |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            break
+        shift += 7
+    return header, await reader.readexactly(length)
+
+
+# --- 프로세스 안 브로커 stand-in ---
+class MiniBroker:
+    """부하 측정용 최소 MQTT 브로커: CONNECT/PUBLISH(QoS 0, 1)/SUBSCRIBE/PING 만.
+
+    구독자에게는 QoS 0 으로 보내고, 구독자 송신 버퍼가 max_buffer 를 넘으면
+    (mosquitto 의 max_queued 처럼) 그 메시지를 버리고 dropped 에 센다.
+    """
+
+    def __init__(self, max_buffer=8 * 1024 * 1024):
+        self.max_buffer = max_buffer
+        self.router = TopicRouter()
+        self.received = 0
+        self.delivered = 0
+        self.dropped = 0
+        self._server = None
+
+    async def start(self, host="127.0.0.1", port=0):
+        self._server = await asyncio.start_server(self._session, host, port)
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _session(self, reader, writer):
+        patterns = []
+        try:
+            while True:
+                header, body = await read_packet(reader)
+                kind = header >> 4
+                if kind == 3:  # PUBLISH
+                    self._publish(header, body, writer)
+                elif kind == 1:  # CONNECT
+                    writer.write(b"\x20\x02\x00\x00")
+                elif kind == 8:  # SUBSCRIBE
+                    granted, i = bytearray(), 2
+                    while i < len(body):
+                        n = int.from_bytes(body[i:i + 2], "big")
+                        pattern = body[i + 2:i + 2 + n].decode()
+                        i += 3 + n
+                        self.router.add(pattern, writer)
+                        patterns.append(pattern)
+                        granted.append(0)
+                    writer.write(_packet(0x90, body[:2] + bytes(granted)))
+                elif kind == 10:  # UNSUBSCRIBE
+                    writer.write(_packet(0xB0, body[:2]))
+                elif kind == 12:  # PINGREQ
+                    writer.write(b"\xd0\x00")
+                elif kind == 14:  # DISCONNECT
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            for pattern in patterns:
+                self.router.remove(pattern, writer)
+            writer.close()
+
+    def _publish(self, header, body, sender):
+        self.received += 1
+        n = int.from_bytes(body[:2], "big")
+        topic = body[2:2 + n].decode()
+        start = 2 + n
+        if header >> 1 & 3:
+            # QoS 1: PUBACK 하고 구독자에게는 QoS 0 으로
+            sender.write(_packet(0x40, body[start:start + 2]))
+            start += 2
+        packet = publish_packet(topic, body[start:])
+        for writer in dict.fromkeys(self.router.match(topic)):
+            if writer.transport.get_write_buffer_size() > self.max_buffer:
+                self.dropped += 1
+                continue
+            writer.write(packet)
+            self.delivered += 1
+
+
+# --- 장치 흉내 ---
+class SimDevice:
+    """장치 하나의 값 흐름 (seed 로 정해짐) 과 보낸 시각 기록."""
+
+    def __init__(self, index, seed, binary=False, legacy=False):
+        self.index = index
+        self.device_id = f"sim-{index:05d}"
+        self.topic = device_topic("" if legacy else self.device_id, "input")
+        self.binary = binary
+        self.rng = random.Random(f"{seed}:{index}")
+        self.temp = self.rng.uniform(18, 30)
+        self.humi = self.rng.uniform(30, 70)
+        self.pot = self.rng.randrange(4096)
+        self.sent_ns = []
+        self.digest = hashlib.sha256()
+
+    def next_payload(self):
+        # 펌웨어처럼 천천히 변하는 값 (DHT 는 0.1 단위, pot >= 3200 이면 릴레이 ON)
+        self.temp = min(40.0, max(0.0, self.temp + self.rng.choice((-0.1, 0.0, 0.0, 0.1))))
+        self.humi = min(95.0, max(5.0, self.humi + self.rng.choice((-0.1, 0.0, 0.0, 0.1))))
+        self.pot = min(4095, max(0, self.pot + self.rng.randint(-40, 40)))
+        seq = self.index << SEQ_BITS | len(self.sent_ns)
+        record = SensorRecord(round(self.temp, 1), round(self.humi, 1), self.pot, self.pot >= 3200)
+        if self.binary:
+            payload = encode_binary(record, seq=seq)
+        else:
+            payload = json.dumps({"temp": record.temp, "humi": record.humi, "pot": record.pot,
+                                  "relay": record.relay, "seq": seq},
+                                 separators=(",", ":")).encode()
+        self.digest.update(payload)
+        return payload
+
+    async def run(self, host, port, start, interval, count, ready):
+        """연결 → ready() → start (모든 장치가 연결된 뒤 정해지는 시작 시각) 부터 count 번 전송."""
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(connect_packet(self.device_id))
+        await read_packet(reader)  # CONNACK
+        ready()
+        loop = asyncio.get_running_loop()
+        # 첫 전송 시각은 장치마다 interval 안에서 seed 로 흩어 놓는다 (보드 전원이 제각각 켜지듯)
+        first = await start + self.rng.uniform(0, interval)
+        for k in range(count):
+            delay = first + k * interval - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            payload = self.next_payload()
+            self.sent_ns.append(time.time_ns())
+            writer.write(publish_packet(self.topic, payload))
+            await writer.drain()
+        writer.write(b"\xe0\x00")  # DISCONNECT
+        await writer.drain()
+        writer.close()
+
+
+# --- 받는 쪽 (자식 프로세스, ex1-8.py 의 수신 경로) ---
+def consume(config):
+    from compression import DeviceCompressors
+    from device_registry import DeviceRegistry, device_pattern, parse_topic
+    from mqtt_core import MqttCore
+    from rollup import RollupEngine
+    from sensor_db import DBWriter, make_row
+    from storage import open_storage
+
+    try:
+        import resource
+    except ImportError:  # Windows
+        resource = None
+
+    pending = {}  # sample_key → (seq, 콜백 시각)
+    committed = []  # (seq, 콜백 시각, commit 시각)
+    received = [0]
+
+    storage = open_storage(config["storage"])
+    storage.ensure_schema()
+    inner_write = storage.write_batch
+
+    def write_batch(rows):
+        inner_write(rows)
+        now = time.time_ns()
+        for row in rows:
+            stamp = pending.pop(row[4], None)
+            if stamp is not None:
+                committed.append((stamp[0], stamp[1], now))
+
+    storage.write_batch = write_batch
+    writer = DBWriter(storage, workers=1, maxsize=config["writer_maxsize"], batch_size=200,
+                      flush_interval=0.5).start()
+    rollup = None
+    if storage.name == "mariadb":
+        rollup = RollupEngine(storage.pool, flush_interval=30.0).start()
+    compressor = DeviceCompressors(COMPRESSION, max_silence=MAX_SILENCE) if config["compress"] else None
+
+    def store(row):
+        if not writer.submit(row):
+            pending.pop(row[4], None)
+
+    def on_record(device_id, record, payload):
+        row = make_row(record.pot, record.temp, record.humi, device_id=device_id)
+        pending[row[4]] = (record.seq, time.time_ns())
+        if rollup:
+            rollup.add(row)  # 집계는 압축 전 원본 샘플로
+        for stored in compressor.offer(row) if compressor else [row]:
+            store(stored)
+
+    registry = DeviceRegistry(shards=config["shards"], on_record=on_record).start()
+
+    def on_sensor(topic, payload):
+        received[0] += 1
+        registry.submit(parse_topic(topic)[0], payload)
+
+    connected = threading.Event()
+    client = MqttCore(config["host"], config["port"], client_id="loadgen-consumer")
+    client.on_connected = connected.set
+    client.on(device_topic("", "input"), on_sensor)
+    client.on(device_pattern("input"), on_sensor)
+    client.start()
+    if not connected.wait(10):
+        raise SystemExit("❌ 브로커에 연결하지 못했습니다")
+    time.sleep(0.5)  # SUBACK 까지 기다림
+
+    cpu0, wall0 = time.process_time(), time.perf_counter()
+    print("READY", flush=True)
+    expected, drain = sys.stdin.readline().split()
+    expected, deadline = int(expected), time.monotonic() + float(drain)
+    # 오는 중인 메시지를 기다린 다음 shard 큐와 writer 큐를 모두 비운다
+    while received[0] < expected and time.monotonic() < deadline:
+        time.sleep(0.05)
+    client.stop()
+    registry.stop(timeout=float(drain))
+    if compressor:
+        for stored in compressor.flush():
+            store(stored)
+    writer.stop(timeout=float(drain))
+    if rollup:
+        rollup.stop()
+    cpu, wall = time.process_time() - cpu0, time.perf_counter() - wall0
+    storage.close()
+
+    with open(config["result"], "w") as f:
+        json.dump({
+            "received": received[0],
+            "committed": committed,
+            "cpu_s": cpu,
+            "wall_s": wall,
+            "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else 0,
+            "registry": registry.snapshot(),
+            "writer_dropped": writer.snapshot()["dropped"],
+            "writer_errors": writer.snapshot()["errors"],
+            "compressed": compressor.offered - compressor.stored if compressor else 0,
+        }, f)
+    print("DONE", flush=True)
+
+
+# --- 한 단계 실행 (장치 N 대) ---
+def percentiles(values):
+    if not values:
+        return {}
+    values = sorted(values)
+    n = len(values)
+    out = {f"p{q}": values[min(n - 1, int(n * q / 100))] for q in (50, 90, 99, 99.9)}
+    out["max"] = values[-1]
+    out["mean"] = sum(values) / n
+    return {k: round(v, 3) for k, v in out.items()}
+
+
+async def _wait_line(proc, expected):
+    loop = asyncio.get_running_loop()
+    while True:
+        line = await loop.run_in_executor(None, proc.stdout.readline)
+        if not line:
+            raise SystemExit(f"❌ 받는 프로세스가 {expected} 전에 끝났습니다")
+        if line.strip() == expected:
+            return
+
+
+async def run_step(args, devices):
+    broker = None
+    if args.broker:
+        host, port = args.broker.rsplit(":", 1)
+        port = int(port)
+    else:
+        broker = MiniBroker()
+        host, port = await broker.start()
+
+    workdir = tempfile.mkdtemp(prefix="loadgen-")
+    if args.mariadb:
+        from sensor_db import DB_CONFIG
+        storage = {"backend": "mariadb", **DB_CONFIG}
+    else:
+        storage = {"backend": "sqlite", "path": os.path.join(workdir, "final_data.db")}
+    config = {"host": host, "port": port, "storage": storage, "shards": args.shards,
+              "writer_maxsize": args.writer_maxsize, "compress": not args.no_compress,
+              "result": os.path.join(workdir, "result.json")}
+    proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--consume", json.dumps(config)],
+                            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    try:
+        await _wait_line(proc, "READY")
+
+        count = int(args.duration / args.interval)
+        sims = [SimDevice(i, args.seed, args.binary, args.legacy) for i in range(devices)]
+        loop = asyncio.get_running_loop()
+        connected = [0]
+        all_ready = asyncio.Event()
+
+        def ready():
+            connected[0] += 1
+            if connected[0] == devices:
+                all_ready.set()
+
+        start = loop.create_future()
+        tasks = [loop.create_task(sim.run(host, port, start, args.interval, count, ready))
+                 for sim in sims]
+        await all_ready.wait()
+        start.set_result(loop.time() + 0.2)
+        await asyncio.gather(*tasks)
+        send_time = loop.time() - start.result()
+
+        sent = sum(len(sim.sent_ns) for sim in sims)
+        proc.stdin.write(f"{sent} {args.drain}\n")
+        proc.stdin.flush()
+        await _wait_line(proc, "DONE")
+    finally:
+        if proc.poll() is None:
+            proc.stdin.close()
+            proc.wait(30)
+        if broker is not None:
+            await broker.stop()
+
+    with open(config["result"]) as f:
+        result = json.load(f)
+    pub_cb, cb_commit, pub_commit = [], [], []
+    for seq, cb, commit in result["committed"]:
+        sent_ns = sims[seq >> SEQ_BITS].sent_ns[seq & SEQ_MASK]
+        pub_cb.append((cb - sent_ns) / 1e6)
+        cb_commit.append((commit - cb) / 1e6)
+        pub_commit.append((commit - sent_ns) / 1e6)
+    stream = hashlib.sha256(b"".join(sim.digest.digest() for sim in sims)).hexdigest()
+    reg = result["registry"]
+    return {
+        "devices": devices,
+        "messages_per_device": count,
+        "offered_rate": devices / args.interval,
+        "sent": sent,
+        "send_time_s": round(send_time, 3),
+        # offered 보다 많이 낮으면 이 프로세스(장치 흉내)가 일정을 못 따라간 것
+        "achieved_rate": round(sent / send_time, 1) if send_time > 0 else 0.0,
+        "received": result["received"],
+        "committed": len(result["committed"]),
+        "compressed": result["compressed"],
+        "dropped": sent - len(result["committed"]) - result["compressed"],
+        "drops": {
+            "broker": broker.dropped if broker else None,
+            "not_received": sent - result["received"],
+            "registry_queue": reg["dropped"],
+            "malformed": reg["malformed"],
+            "writer_queue": result["writer_dropped"],
+            "db_errors": result["writer_errors"],
+        },
+        "latency_ms": {
+            "publish_to_callback": percentiles(pub_cb),
+            "callback_to_commit": percentiles(cb_commit),
+            "publish_to_commit": percentiles(pub_commit),
+        },
+        "consumer": {
+            "cpu_percent": round(100 * result["cpu_s"] / result["wall_s"], 1),
+            "max_rss_mb": round(result["max_rss_kb"] / 1024, 1),
+        },
+        "stream_sha256": stream,
+    }
+
+
+def _git_rev():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ESP32 여러 대 부하 생성 + 종단 간 지연 측정")
+    parser.add_argument("--devices", default="50", help="장치 수 (쉼표로 여러 단계: 50,200,500)")
+    parser.add_argument("--interval", type=float, default=2.0, help="장치당 전송 간격 (펌웨어 mqtt_interval)")
+    parser.add_argument("--duration", type=float, default=30.0, help="단계마다 보내는 시간 (초)")
+    parser.add_argument("--drain", type=float, default=10.0, help="끝난 뒤 남은 메시지를 기다리는 최대 시간")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--binary", action="store_true", help="22바이트 바이너리 payload")
+    parser.add_argument("--legacy", action="store_true", help="모든 장치가 arduino/input 으로 전송")
+    parser.add_argument("--broker", help="host:port (없으면 프로세스 안 브로커)")
+    parser.add_argument("--mariadb", action="store_true", help="임시 SQLite 대신 로컬 MariaDB (실제 테이블에 씀)")
+    parser.add_argument("--shards", type=int, default=4)
+    parser.add_argument("--writer-maxsize", type=int, default=1000)
+    parser.add_argument("--no-compress", action="store_true", help="압축 단계 없이 모든 샘플을 저장")
+    parser.add_argument("--out", help="보고서 JSON 파일")
+    parser.add_argument("--consume", help=argparse.SUPPRESS)  # 자식 프로세스용 JSON 설정
+    args = parser.parse_args()
+
+    if args.consume:
+        consume(json.loads(args.consume))
+        return
+
+    report = {
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "consume")},
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "cpus": os.cpu_count(), "git": _git_rev()},
+        "steps": [],
+    }
+    print(f"{'장치':>6} {'msgs/s':>8} {'보냄':>8} {'저장':>8} {'버림':>6} "
+          f"{'p50 ms':>8} {'p99 ms':>8} {'max ms':>9} {'CPU %':>6} {'RSS MB':>7}")
+    for devices in (int(d) for d in args.devices.split(",")):
+        step = asyncio.run(run_step(args, devices))
+        report["steps"].append(step)
+        lat = step["latency_ms"]["publish_to_commit"]
+        print(f"{devices:>6} {step['offered_rate']:>8.0f} {step['sent']:>8} {step['committed']:>8} "
+              f"{step['dropped']:>6} {lat.get('p50', 0):>8.1f} {lat.get('p99', 0):>8.1f} "
+              f"{lat.get('max', 0):>9.1f} {step['consumer']['cpu_percent']:>6.1f} "
+              f"{step['consumer']['max_rss_mb']:>7.1f}")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"✅ 보고서 저장: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
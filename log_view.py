@@ -0,0 +1,214 @@
+"""크기가 고정된 MQTT 메시지 로그 (링 버퍼 + 보이는 줄만 그리는 Tk 뷰).
+
+    log_buffer = LogBuffer(capacity=5000, spill_path="mqtt_log.txt")
+    log_view = LogView(root, log_buffer, height=15, width=85)
+    log_buffer.append("수신: ...")      # 아무 스레드에서나
+    refresher.every_tick(log_view.refresh)  # Tk tick 마다 한 번 그리기
+
+tk.Text 에는 화면에 보이는 height 줄만 들어 있고, 스크롤하면 버퍼에서
+그 구간만 다시 꺼내 그린다. 메시지가 얼마나 쌓여도 메모리는 capacity 줄,
+한 tick 의 그리기 비용은 height 줄로 일정하다.
+용량을 넘어 밀려난 줄은 spill_path 를 주면 크기별로 돌려쓰는 파일에 남긴다.
+필터는 위젯이 아니라 버퍼에서 찾는다.
+"""
+import os
+import threading
+import tkinter as tk
+from tkinter import ttk
+
+
+# --- 링 버퍼 ---
+class LogBuffer:
+    def __init__(self, capacity=5000, spill_path=None, spill_max_bytes=1_000_000, spill_backups=3):
+        self.capacity = capacity
+        self.spill_path = spill_path
+        self.spill_max_bytes = spill_max_bytes
+        self.spill_backups = spill_backups
+        self.total = 0  # 지금까지 들어온 줄 수 (뷰가 바뀐 것을 알아내는 용도)
+        self._items = [None] * capacity
+        self._head = 0  # 가장 오래된 줄 위치
+        self._count = 0
+        self._spill = []  # 밀려났지만 아직 파일에 안 쓴 줄
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._count
+
+    def append(self, line):
+        with self._lock:
+            if self._count == self.capacity:
+                if self.spill_path:
+                    self._spill.append(self._items[self._head])
+                self._items[self._head] = line
+                self._head = (self._head + 1) % self.capacity
+            else:
+                self._items[(self._head + self._count) % self.capacity] = line
+                self._count += 1
+            self.total += 1
+
+    def window(self, start, n):
+        """오래된 순서로 start 번째부터 n 줄."""
+        with self._lock:
+            end = min(start + n, self._count)
+            return [self._items[(self._head + i) % self.capacity] for i in range(max(start, 0), end)]
+
+    def lines(self):
+        with self._lock:
+            return self._ordered()
+
+    def _ordered(self):
+        tail = self._items[self._head:self._head + self._count]
+        return tail + self._items[:self._count - len(tail)]
+
+    def search(self, text, limit=None):
+        """text 가 들어 있는 줄을 오래된 순서로 (대소문자 무시)."""
+        needle = text.lower()
+        found = [line for line in self.lines() if needle in line.lower()]
+        return found[-limit:] if limit else found
+
+    # --- 밀려난 줄 파일로 ---
+    def flush_spill(self):
+        with self._lock:
+            spill, self._spill = self._spill, []
+        if not spill:
+            return
+        if os.path.exists(self.spill_path) and os.path.getsize(self.spill_path) >= self.spill_max_bytes:
+            self._rotate()
+        with open(self.spill_path, "a", encoding="utf-8") as f:
+            f.write("\n".join(spill) + "\n")
+
+    def _rotate(self):
+        # mqtt_log.txt → .1 → .2 ... (가장 오래된 것은 버린다)
+        for i in range(self.spill_backups - 1, 0, -1):
+            src = f"{self.spill_path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.spill_path}.{i + 1}")
+        os.replace(self.spill_path, f"{self.spill_path}.1")
+
+    def close(self):
+        """남은 줄까지 모두 파일에 쓴다 (spill_path 가 있을 때)."""
+        if not self.spill_path:
+            return
+        with self._lock:
+            self._spill.extend(self._ordered())
+            self._count = 0
+        self.flush_spill()
+
+
+# --- Tk 뷰 ---
+class LogView(ttk.Frame):
+    def __init__(self, parent, buffer, height=15, width=85, font=("Arial", 11)):
+        super().__init__(parent)
+        self.buffer = buffer
+        self.height = height
+        self._offset = 0
+        self._follow = True  # 맨 아래에 있으면 새 줄을 따라간다
+        self._filter = ""
+        self._filtered = []
+        self._filtered_key = None
+        self._drawn_key = None
+        self._evicted = 0  # 지난 refresh 까지 버퍼에서 밀려난 줄 수
+
+        bar = ttk.Frame(self)
+        bar.pack(fill=tk.X)
+        ttk.Label(bar, text="필터:").pack(side=tk.LEFT)
+        self._filter_var = tk.StringVar()
+        self._filter_var.trace_add("write", lambda *_: self.set_filter(self._filter_var.get()))
+        ttk.Entry(bar, textvariable=self._filter_var, width=30).pack(side=tk.LEFT, padx=5)
+        self._count_label = ttk.Label(bar, text="")
+        self._count_label.pack(side=tk.RIGHT)
+
+        body = ttk.Frame(self)
+        body.pack(fill=tk.BOTH, expand=True)
+        self._text = tk.Text(body, height=height, width=width, wrap=tk.NONE,
+                             state=tk.DISABLED, font=font)
+        self._text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self._scroll = ttk.Scrollbar(body, command=self._on_scrollbar)
+        self._scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        self._text.bind("<MouseWheel>", lambda e: self._scroll_by(-1 if e.delta > 0 else 1, 3))
+        self._text.bind("<Button-4>", lambda e: self._scroll_by(-1, 3))
+        self._text.bind("<Button-5>", lambda e: self._scroll_by(1, 3))
+
+    def set_filter(self, text):
+        self._filter = text
+        self._filtered_key = None
+        self._follow = True
+        self.refresh()
+
+    def _source_size(self):
+        if not self._filter:
+            return len(self.buffer)
+        key = (self.buffer.total, self._filter)
+        if key != self._filtered_key:
+            self._filtered = self.buffer.search(self._filter)
+            self._filtered_key = key
+        return len(self._filtered)
+
+    def _visible(self):
+        if self._filter:
+            return self._filtered[self._offset:self._offset + self.height]
+        return self.buffer.window(self._offset, self.height)
+
+    def refresh(self):
+        """바뀐 것이 있을 때만 보이는 height 줄을 다시 그린다 (Tk 스레드)."""
+        if self.buffer.spill_path:
+            self.buffer.flush_spill()
+        evicted = self.buffer.total - len(self.buffer)
+        if not self._follow and not self._filter:
+            # 위로 스크롤해 둔 동안 밀려난 만큼 당겨서 같은 줄을 계속 보여준다
+            self._offset -= evicted - self._evicted
+        self._evicted = evicted
+        n = self._source_size()
+        last = max(0, n - self.height)
+        self._offset = last if self._follow else max(0, min(self._offset, last))
+        key = (self.buffer.total, self._filter, self._offset)
+        if key == self._drawn_key:
+            return
+        self._drawn_key = key
+        self._text.config(state=tk.NORMAL)
+        self._text.delete("1.0", tk.END)
+        self._text.insert("1.0", "\n".join(self._visible()))
+        self._text.config(state=tk.DISABLED)
+        if n:
+            self._scroll.set(self._offset / n, min(1.0, (self._offset + self.height) / n))
+        else:
+            self._scroll.set(0.0, 1.0)
+        shown = f"{n}/{len(self.buffer)}" if self._filter else f"{n}"
+        self._count_label.config(text=f"{shown}줄 (최근 {self.buffer.capacity}줄 보관)")
+
+    def _scroll_by(self, step, lines):
+        self._move(self._offset + step * lines)
+        return "break"
+
+    def _on_scrollbar(self, *args):
+        if args[0] == "moveto":
+            self._move(int(float(args[1]) * self._source_size()))
+        elif args[0] == "scroll":
+            lines = self.height if args[2] == "pages" else 1
+            self._move(self._offset + int(args[1]) * lines)
+
+    def _move(self, offset):
+        last = max(0, self._source_size() - self.height)
+        self._offset = max(0, min(offset, last))
+        self._follow = self._offset >= last
+        self.refresh()
+
+
+if __name__ == "__main__":
+    # 추가/검색 비용: python log_view.py
+    import time
+
+    buf = LogBuffer(capacity=5000)
+    n = 500000
+    started = time.perf_counter()
+    for i in range(n):
+        buf.append(f'수신: {{"temp": {i % 300}, "humi": {i % 900}, "rotary": {i % 4096}}}')
+    elapsed = time.perf_counter() - started
+    print(f"append  {elapsed / n * 1e9:7.0f} ns/줄 (보관 {len(buf)}줄)")
+    started = time.perf_counter()
+    for _ in range(100):
+        buf.window(len(buf) - 15, 15)
+    print(f"window  {(time.perf_counter() - started) / 100 * 1e6:7.1f} µs/tick (15줄)")
+    started = time.perf_counter()
+    hits = buf.search('"rotary": 4095')
+    print(f"search  {(time.perf_counter() - started) * 1e3:7.1f} ms ({len(hits)}줄 일치)")
@@ -0,0 +1,292 @@
+"""ESP32-CAM /stream 같은 MJPEG (multipart/x-mixed-replace) 스트림을 JPEG 프레임으로 나누는 파서.
+
+    demuxer = MjpegDemuxer(boundary_from_content_type(response.headers.get("Content-Type", "")))
+    for jpg in demuxer.read_from(stream):      # urlopen() 응답, requests 의 response.raw 등
+        image = cv2.imdecode(np.frombuffer(jpg, np.uint8), cv2.IMREAD_COLOR)
+
+jpg 는 내부 버퍼를 가리키는 memoryview 라서 복사가 없다. 다음 프레임으로 넘어가면
+해제되므로 프레임을 계속 들고 있어야 하면 bytes(jpg) 로 복사해 둔다.
+
+- 버퍼는 bytearray 하나, readinto1() 로 최대 chunk_size(64KB) 씩 바로 채운다
+  (readinto() 는 64KB 가 다 찰 때까지 기다리므로 작은 프레임이 늦게 나온다)
+- 파트 헤더에 Content-Length 가 있으면 (ESP32-CAM 은 보낸다) 끝 표시를 찾지 않고 그 길이로 자른다
+- 없으면 boundary (없으면 EOI ff d9) 를 마지막으로 찾아본 위치부터 이어서 찾는다
+- 다 쓴 앞부분은 버퍼 뒤가 모자랄 때만 한 번에 앞으로 당긴다
+그래서 프레임 크기에 대해 선형이다 (예전 코드는 1KB 마다 처음부터 다시 find).
+
+벤치마크 (녹화 파일이 없으면 합성 스트림):
+    python mjpeg.py --record http://172.30.1.60:81/stream --seconds 10 --out cam.mjpg
+    python mjpeg.py cam.mjpg
+"""
+SOI = b"\xff\xd8"
+EOI = b"\xff\xd9"
+
+
+def boundary_from_content_type(content_type):
+    """'multipart/x-mixed-replace;boundary=abc' → "abc" (없으면 None)."""
+    for param in content_type.split(";")[1:]:
+        key, _, value = param.strip().partition("=")
+        if key.lower() == "boundary" and value:
+            return value.strip('"')
+    return None
+
+
+class MjpegDemuxer:
+    HEADER_LIMIT = 4096  # SOI 앞 헤더가 이보다 길면 쓰레기로 보고 버린다
+
+    def __init__(self, boundary=None, chunk_size=65536, max_frame=2 * 1024 * 1024):
+        if boundary:
+            boundary = boundary.encode() if isinstance(boundary, str) else bytes(boundary)
+            # 카메라마다 "--" 를 붙여서 알려 주기도 한다
+            boundary = b"--" + boundary[2:] if boundary.startswith(b"--") else b"--" + boundary
+        self.boundary = boundary
+        self.chunk_size = chunk_size
+        self.max_frame = max_frame
+        self.buf = bytearray(chunk_size * 4)
+        self.start = 0  # 아직 처리하지 않은 첫 바이트
+        self.end = 0  # 받은 데이터의 끝
+        self.soi = -1  # 지금 프레임의 SOI 위치 (못 찾았으면 -1)
+        self.length = -1  # 지금 프레임의 Content-Length (모르면 -1)
+        self.scan = 0  # 여기부터 이어서 찾는다
+        self.frames = 0
+        self.bytes_in = 0
+        self.discarded = 0  # 프레임에 속하지 않아 버린 바이트 (헤더 제외)
+        self.oversize = 0  # max_frame 을 넘어서 버린 프레임
+
+    # --- 입력 ---
+    def _reserve(self, n):
+        """end 뒤에 n 바이트 자리를 만든다 (처리한 앞부분은 이때 한 번에 당긴다)."""
+        if len(self.buf) - self.end >= n:
+            return
+        shift = self.start
+        if shift:
+            live = self.end - shift
+            self.buf[:live] = self.buf[shift:self.end]
+            self.start = 0
+            self.end = live
+            self.scan -= shift
+            if self.soi >= 0:
+                self.soi -= shift
+        if len(self.buf) - self.end < n:
+            # 버퍼보다 큰 프레임: 두 배로 늘린다 (드묾)
+            self.buf.extend(bytes(max(len(self.buf), n)))
+
+    def feed(self, data):
+        """받은 조각을 넣고 완성된 프레임들을 돌려준다 (requests.iter_content 등 bytes 입력용)."""
+        n = len(data)
+        self._reserve(n)
+        self.buf[self.end:self.end + n] = data
+        self.end += n
+        self.bytes_in += n
+        return self._frames()
+
+    def read_from(self, stream):
+        """stream 이 끝날 때까지 프레임을 하나씩 돌려준다 (readinto 가 있으면 복사 없이 읽음)."""
+        # 지금 와 있는 만큼만 읽는 read1 계열을 먼저 쓴다 (urlopen 응답은 readinto1, urllib3 는 read1)
+        readinto = getattr(stream, "readinto1", None)
+        read = getattr(stream, "read1", None)
+        if readinto is None and read is None:
+            readinto = getattr(stream, "readinto", None)
+            read = stream.read
+        while True:
+            self._reserve(self.chunk_size)
+            if readinto is not None:
+                view = memoryview(self.buf)
+                try:
+                    n = readinto(view[self.end:self.end + self.chunk_size])
+                finally:
+                    view.release()
+            else:
+                data = read(self.chunk_size)
+                n = len(data)
+                self.buf[self.end:self.end + n] = data
+            if not n:
+                return
+            self.end += n
+            self.bytes_in += n
+            yield from self._frames()
+
+    # --- 프레임 자르기 ---
+    def _content_length(self, soi):
+        header = bytes(self.buf[max(self.start, soi - 1024):soi]).lower()
+        i = header.rfind(b"content-length:")
+        if i < 0:
+            return -1
+        try:
+            return int(header[i + 15:header.find(b"\r\n", i)])
+        except ValueError:
+            return -1
+
+    def _drop(self, upto):
+        self.discarded += upto - self.start
+        self.start = self.scan = upto
+        self.soi = self.length = -1
+
+    def _frames(self):
+        buf = self.buf
+        while True:
+            if self.soi < 0:
+                soi = buf.find(SOI, self.scan, self.end)
+                if soi < 0:
+                    # 마지막 1바이트는 다음 조각과 이어서 SOI 가 될 수 있다
+                    self.scan = max(self.start, self.end - 1)
+                    if self.scan - self.start > self.HEADER_LIMIT:
+                        self._drop(self.scan)
+                    return
+                self.soi = soi
+                self.length = self._content_length(soi)
+                self.scan = soi + 2
+
+            stop = -1
+            if self.length > 0:
+                stop = self.soi + self.length
+                if stop > self.end:
+                    if self.length > self.max_frame:
+                        self.oversize += 1
+                        self._drop(self.soi + 2)
+                        continue
+                    return
+                if buf[stop - 2] != 0xFF or buf[stop - 1] != 0xD9:
+                    self.length = stop = -1  # 길이가 안 맞으면 끝 표시로 찾는다
+            if stop < 0:
+                marker = self.boundary or EOI
+                pos = buf.find(marker, self.scan, self.end)
+                if pos < 0:
+                    self.scan = max(self.scan, self.end - len(marker) + 1)
+                    if self.end - self.soi > self.max_frame:
+                        self.oversize += 1
+                        self._drop(self.end)
+                    return
+                if self.boundary:
+                    stop = buf.rfind(EOI, self.soi, pos)
+                    if stop < 0:
+                        self._drop(pos)  # EOI 없이 잘린 프레임
+                        continue
+                    stop += 2
+                else:
+                    stop = pos + 2
+
+            frame = memoryview(buf)[self.soi:stop]
+            self.frames += 1
+            self.start = self.scan = stop
+            self.soi = self.length = -1
+            try:
+                yield frame
+            finally:
+                frame.release()
+
+
+# --- 벤치마크 ---
+def _old_style(stream):
+    """PyDroid3.py / 카메라 ex08.py 의 예전 방식 (1KB 씩 bytes += , 처음부터 find)."""
+    byte_data = b""
+    count = 0
+    while True:
+        chunk = stream.read(1024)
+        if not chunk:
+            return count
+        byte_data += chunk
+        a = byte_data.find(SOI)
+        b = byte_data.find(EOI)
+        if a != -1 and b != -1:
+            jpg = byte_data[a:b + 2]
+            byte_data = byte_data[b + 2:]
+            count += len(jpg) > 0
+
+
+def _synthetic_frames(count, size=(640, 480)):
+    """PIL 이 있으면 진짜 JPEG, 없으면 JPEG 처럼 생긴 바이트 (내부에 ff d9 없음)."""
+    import random
+    rng = random.Random(1)
+    try:
+        from io import BytesIO
+
+        from PIL import Image
+        frames = []
+        for i in range(count):
+            # 작은 무작위 그림을 키워서 카메라 영상처럼 부드러운 화면 (640x480 q80 ≈ 수십 KB)
+            small = Image.frombytes("RGB", (40, 30), bytes(rng.getrandbits(8) for _ in range(3600)))
+            img = small.resize(size, Image.BILINEAR)
+            out = BytesIO()
+            img.save(out, "JPEG", quality=80)
+            frames.append(out.getvalue())
+        return frames
+    except ImportError:
+        body = bytes(b if b != 0xFF else 0x00 for b in rng.randbytes(40000))
+        return [SOI + bytes([i % 256]) + body + EOI for i in range(count)]
+
+
+def _multipart(frames, content_length=True, boundary=b"123456789000000000000987654321"):
+    """ESP32-CAM app_httpd.cpp 와 같은 모양의 multipart 스트림."""
+    parts = []
+    for i, jpg in enumerate(frames):
+        header = b"Content-Type: image/jpeg\r\n"
+        if content_length:
+            header += b"Content-Length: %d\r\n" % len(jpg)
+        header += b"X-Timestamp: %d.000000\r\n\r\n" % i
+        parts.append(b"\r\n--" + boundary + b"\r\n" + header + jpg)
+    return b"".join(parts)
+
+
+def main():
+    import argparse
+    import io
+    import time
+
+    parser = argparse.ArgumentParser(description="MJPEG 파서 벤치마크")
+    parser.add_argument("recordings", nargs="*", help="녹화한 .mjpg (camera /stream 원본 바이트)")
+    parser.add_argument("--record", help="이 URL 의 스트림을 녹화")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--out", default="cam.mjpg")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.record:
+        import urllib.request
+        with urllib.request.urlopen(args.record, timeout=10) as stream, open(args.out, "wb") as f:
+            print(f"Content-Type: {stream.headers.get('Content-Type')}")
+            deadline = time.monotonic() + args.seconds
+            while time.monotonic() < deadline:
+                f.write(stream.read(65536))
+        print(f"✅ 녹화 저장: {args.out}")
+        return
+
+    inputs = []
+    for path in args.recordings:
+        with open(path, "rb") as f:
+            inputs.append((path, f.read(), None))
+    if not inputs:
+        frames = _synthetic_frames(200)
+        avg = sum(map(len, frames)) // len(frames)
+        inputs.append((f"합성 200프레임 (평균 {avg // 1024}KB, Content-Length)", _multipart(frames), None))
+        inputs.append(("합성 200프레임 (boundary 만)", _multipart(frames, content_length=False),
+                       "123456789000000000000987654321"))
+
+    def feed_1k(stream, boundary):
+        demuxer = MjpegDemuxer(boundary)
+        count = 0
+        for chunk in iter(lambda: stream.read(1024), b""):
+            for _ in demuxer.feed(chunk):
+                count += 1
+        return count
+
+    def run(label, fn, data):
+        best = float("inf")
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            count = fn(io.BytesIO(data))
+            best = min(best, time.perf_counter() - started)
+        print(f"  {label:28s} {count:5d} 프레임  {count / best:9,.0f} fps  {len(data) / best / 2**20:8.1f} MB/s")
+        return count
+
+    for name, data, boundary in inputs:
+        print(f"{name} ({len(data) / 2**20:.1f} MB)")
+        run("예전 방식 (1KB, bytes +=)", _old_style, data)
+        run("feed() 1KB 조각", lambda s: feed_1k(s, boundary), data)
+        run("read_from() 64KB readinto", lambda s: sum(1 for _ in MjpegDemuxer(boundary).read_from(s)), data)
+        if boundary:
+            run("read_from() boundary 모름 (EOI)", lambda s: sum(1 for _ in MjpegDemuxer().read_from(s)), data)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""패널들이 같이 쓰는 MQTT 클라이언트와 토픽 라우팅 표.
+
+    core = MqttCore()
+    core.on("arduino/input", on_sensor)           # 정확히 일치
+    core.on("arduino/+/input", on_device_sensor)  # + / # 와일드카드
+    core.start()
+
+핸들러는 handler(topic, payload) 로 불린다 (payload 는 bytes).
+정확히 일치하는 토픽은 dict 한 번, 와일드카드는 토픽 단계(level) 트리를
+한 번 따라가고, 결과는 토픽별로 캐시해서 다음부터는 dict 조회 한 번이다.
+
+연결은 start() 가 바로 돌아오고 감시 스레드가 맡는다: connect_async 로
+설정만 해 두고, 끊기면 jitter 를 섞은 지수 backoff 로 다시 붙은 뒤
+모든 토픽을 다시 구독한다. 브로커는 구독할 때 retained 메시지를 보내므로
+LED 처럼 retain 으로 발행한 상태는 재연결하면 자동으로 다시 맞춰진다.
+"""
+import random
+import threading
+
+import paho.mqtt.client as mqtt
+
+BROKER = "broker.emqx.io"
+PORT = 1883
+
+
+def backoff_delay(attempt, base=1.0, cap=60.0):
+    """attempt 번째 재시도 대기 시간: 지수 증가 상한 cap, 절반은 무작위 (여러 장치가 동시에 몰리지 않게)."""
+    delay = min(cap, base * 2 ** attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+# --- 토픽 라우팅 ---
+class TopicRouter:
+    CACHE_LIMIT = 4096
+
+    def __init__(self):
+        self._exact = {}
+        self._tree = {}  # level → {"handlers": [...], "children": {...}}
+        self._cache = {}
+
+    def add(self, pattern, handler):
+        if "+" not in pattern and "#" not in pattern:
+            self._exact.setdefault(pattern, []).append(handler)
+        else:
+            node = self._tree
+            for level in pattern.split("/"):
+                node = node.setdefault(level, {"handlers": [], "children": {}})
+                last = node
+                node = node["children"]
+            last["handlers"].append(handler)
+        self._cache.clear()
+
+    def remove(self, pattern, handler):
+        if pattern in self._exact:
+            self._exact[pattern].remove(handler)
+        else:
+            node = {"children": self._tree}
+            for level in pattern.split("/"):
+                node = node["children"][level]
+            node["handlers"].remove(handler)
+        self._cache.clear()
+
+    def match(self, topic):
+        handlers = self._cache.get(topic)
+        if handlers is not None:
+            return handlers
+        handlers = list(self._exact.get(topic, ()))
+        if self._tree:
+            self._walk(self._tree, topic.split("/"), 0, handlers)
+        if len(self._cache) >= self.CACHE_LIMIT:
+            self._cache.clear()
+        self._cache[topic] = handlers
+        return handlers
+
+    def _walk(self, children, levels, i, out):
+        if "#" in children:
+            out.extend(children["#"]["handlers"])
+        if i == len(levels):
+            return
+        for key in (levels[i], "+"):
+            node = children.get(key)
+            if node is None:
+                continue
+            if i + 1 == len(levels):
+                out.extend(node["handlers"])
+                # "a/#" 는 "a" 자체에도 일치한다
+                if "#" in node["children"]:
+                    out.extend(node["children"]["#"]["handlers"])
+            else:
+                self._walk(node["children"], levels, i + 1, out)
+
+
+# --- 클라이언트 ---
+class MqttCore:
+    def __init__(self, broker=BROKER, port=PORT, client_id="", keepalive=60):
+        self.broker = broker
+        self.port = port
+        self.keepalive = keepalive
+        self.router = TopicRouter()
+        self.subscriptions = {}  # pattern → qos
+        self.connected = False
+        self.reconnects = 0  # 재연결 시도 횟수
+        self.on_connected = None  # 연결될 때마다 부를 함수 (선택)
+        self.on_disconnected = None  # 연결이 끊길 때 on_disconnected(rc) (선택)
+        self._attempt = 0
+        self._stopping = threading.Event()
+        self._thread = None
+        self.client = mqtt.Client(client_id)
+        self.client.on_connect = self._on_connect
+        self.client.on_message = self._on_message
+        self.client.on_disconnect = self._on_disconnect
+
+    def on(self, pattern, handler, qos=0):
+        """pattern 에 handler 를 등록하고 (연결 중이면 바로) 구독한다."""
+        self.router.add(pattern, handler)
+        if pattern not in self.subscriptions:
+            self.subscriptions[pattern] = qos
+            if self.connected:
+                self.client.subscribe(pattern, qos)
+
+    def _on_connect(self, client, userdata, flags, rc):
+        if rc != 0:
+            print(f"❌ MQTT 연결 실패: {rc}")
+            return
+        self.connected = True
+        self._attempt = 0
+        print("✅ MQTT 연결 성공")
+        if self.subscriptions:
+            # 구독은 한 번의 SUBSCRIBE 패킷으로
+            client.subscribe(list(self.subscriptions.items()))
+        if self.on_connected:
+            self.on_connected()
+
+    def _on_disconnect(self, client, userdata, rc):
+        self.connected = False
+        if self.on_disconnected:
+            self.on_disconnected(rc)
+
+    def _on_message(self, client, userdata, msg):
+        for handler in self.router.match(msg.topic):
+            try:
+                handler(msg.topic, msg.payload)
+            except Exception as e:
+                print(f"❌ 메시지 처리 오류 ({msg.topic}): {e}")
+
+    def publish(self, topic, payload, qos=0, retain=False):
+        return self.client.publish(topic, payload, qos, retain)
+
+    def start(self):
+        """연결 감시 스레드를 띄우고 바로 돌아온다 (연결은 백그라운드에서)."""
+        self.client.connect_async(self.broker, self.port, self.keepalive)
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._supervise, name="mqtt-supervisor", daemon=True)
+        self._thread.start()
+        return self
+
+    def _supervise(self):
+        while not self._stopping.is_set():
+            try:
+                self.client.reconnect()  # connect_async 로 넣어 둔 주소로 연결
+            except OSError as e:
+                self._wait_retry(f"연결 실패: {e}")
+                continue
+            # 끊길 때까지 네트워크 처리 (콜백은 이 스레드에서 불린다)
+            while not self._stopping.is_set():
+                if self.client.loop(timeout=1.0) != mqtt.MQTT_ERR_SUCCESS:
+                    break
+            if not self._stopping.is_set():
+                self._wait_retry("연결 끊김")
+
+    def _wait_retry(self, reason):
+        delay = backoff_delay(self._attempt)
+        self._attempt += 1
+        self.reconnects += 1
+        print(f"🔄 MQTT {reason} → {delay:.1f}초 후 재연결")
+        self._stopping.wait(delay)
+
+    def stop(self):
+        self._stopping.set()
+        try:
+            self.client.disconnect()
+        except Exception:
+            pass
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(2.0)
+            self._thread = None
+
+
+if __name__ == "__main__":
+    # 메시지 한 개당 라우팅 비용: python mqtt_core.py
+    import timeit
+
+    def noop(topic, payload):
+        pass
+
+    router = TopicRouter()
+    router.add("arduino/input", noop)
+    router.add("arduino/output", noop)
+    for i in range(8):
+        router.add(f"arduino/led{i + 1}", noop)
+    router.add("arduino/+/input", noop)
+    router.add("arduino/+/led/#", noop)
+
+    def old_style(topic):
+        # Windows11-ex1-7.py 의 on_message 방식
+        if topic == "arduino/output":
+            pass
+        for i in range(8):
+            if topic == f"arduino/led{i+1}":
+                pass
+
+    n = 200000
+    topics = ["arduino/led7", "arduino/input", "arduino/esp32-01/input", "arduino/esp32-01/led/3"]
+    for topic in topics:
+        t = timeit.timeit(lambda: [h(topic, b"") for h in router.match(topic)], number=n)
+        print(f"router  {topic:26s} {t / n * 1e9:7.0f} ns/msg")
+    for topic in topics[:2]:
+        t = timeit.timeit(lambda: old_style(topic), number=n)
+        print(f"f-loop  {topic:26s} {t / n * 1e9:7.0f} ns/msg")
+    router._cache.clear()
+    t = timeit.timeit(lambda: (router._cache.clear(), router.match("arduino/esp32-01/led/3")), number=n)
+    print(f"router  (캐시 없음, 와일드카드)     {t / n * 1e9:7.0f} ns/msg")
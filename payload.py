@@ -0,0 +1,189 @@
+"""arduino/input 센서 메시지 스키마와 디코더.
+
+1-6dht9.ino 가 보내는 JSON:
+    {"temp": 23.5, "humi": 41.0, "pot": 1834, "relay": false}
+    temp 는 ℃, humi 는 %, pot 은 가변저항 ADC 값(0~4095, 예전 이름 "rotary").
+    seq / device_ms 는 선택 (부하 생성기 loadgen.py 처럼 순번과 시각을 찍어 보낼 때).
+
+    decoder = PayloadDecoder()        # msgspec > orjson > json 순서로 있는 것을 쓴다
+    record = decoder.decode(payload)  # SensorRecord 또는 None (잘못된 메시지)
+    decoder.malformed                 # 버린 메시지 수
+
+한 번에 타입 확인과 변환을 끝내고, 잘못된 메시지는 예외 대신 None 을 돌려준다.
+
+펌웨어에서 PAYLOAD_BINARY 를 켜면 같은 값을 22바이트 고정 레이아웃으로 보낸다
+(little-endian, 1-6dht9.ino 의 SensorPacket 과 같은 순서):
+    magic "SB" | version u8 | flags u8 (bit0 = relay) | seq u32 | device_ms i64 (epoch ms)
+    | temp i16 (℃ x10) | humi u16 (% x10) | pot u16
+decode() 는 메시지마다 앞 두 바이트로 바이너리/JSON 을 구분하고,
+녹화해 둔 바이너리 메시지 묶음은 decode_batch() 로 NumPy 배열로 한 번에 푼다.
+벤치마크: python payload.py
+"""
+import json
+import math
+import struct
+from typing import NamedTuple, Optional
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class SensorRecord(NamedTuple):
+    temp: float
+    humi: float
+    pot: int
+    relay: bool
+    seq: int = -1  # 전송 순번 (JSON 에 없으면 -1)
+    device_ms: int = 0  # 장치 시각 epoch ms (모르면 0)
+
+
+# --- 바이너리 레이아웃 ---
+BINARY_MAGIC = b"SB"
+BINARY_VERSION = 1
+BINARY_FORMAT = struct.Struct("<2sBBIqhHH")
+FLAG_RELAY = 0x01
+
+
+def is_binary(payload):
+    return payload[:2] == BINARY_MAGIC
+
+
+def encode_binary(record, seq=0, device_ms=0):
+    """SensorRecord → 펌웨어와 같은 22바이트 (테스트/부하 생성용)."""
+    return BINARY_FORMAT.pack(BINARY_MAGIC, BINARY_VERSION, FLAG_RELAY if record.relay else 0,
+                              seq, device_ms, round(record.temp * 10), round(record.humi * 10),
+                              record.pot)
+
+
+def _from_binary(payload):
+    if len(payload) != BINARY_FORMAT.size:
+        raise ValueError(f"바이너리 메시지 길이 {len(payload)} != {BINARY_FORMAT.size}")
+    _, version, flags, seq, device_ms, temp, humi, pot = BINARY_FORMAT.unpack(payload)
+    if version != BINARY_VERSION:
+        raise ValueError(f"지원하지 않는 바이너리 버전: {version}")
+    return SensorRecord(temp / 10, humi / 10, pot, bool(flags & FLAG_RELAY), seq, device_ms)
+
+
+def decode_batch(payloads):
+    """바이너리 메시지 목록 → 필드별 NumPy 배열 dict (형식이 안 맞는 메시지는 건너뜀)."""
+    import numpy as np
+
+    dtype = np.dtype([("magic", "S2"), ("version", "u1"), ("flags", "u1"), ("seq", "<u4"),
+                      ("device_ms", "<i8"), ("temp", "<i2"), ("humi", "<u2"), ("pot", "<u2")])
+    good = [p for p in payloads if len(p) == dtype.itemsize and p[:2] == BINARY_MAGIC]
+    raw = np.frombuffer(b"".join(good), dtype=dtype)
+    raw = raw[raw["version"] == BINARY_VERSION]
+    return {
+        "seq": raw["seq"],
+        "device_ms": raw["device_ms"],
+        "temp": raw["temp"] / np.float32(10),
+        "humi": raw["humi"] / np.float32(10),
+        "pot": raw["pot"],
+        "relay": (raw["flags"] & FLAG_RELAY).astype(bool),
+        "malformed": len(payloads) - len(raw),
+    }
+
+
+# --- 필드 변환 (json / orjson 공용) ---
+def _from_dict(data):
+    temp = data["temp"]
+    humi = data["humi"]
+    pot = data.get("pot", data.get("rotary", 0))
+    relay = data.get("relay", False)
+    seq = data.get("seq", -1)
+    device_ms = data.get("device_ms", 0)
+    # bool 은 int 의 하위 타입이라 따로 막는다
+    if type(temp) not in (int, float) or type(humi) not in (int, float):
+        raise TypeError("temp/humi 는 숫자여야 합니다")
+    if type(pot) is not int or type(relay) is not bool:
+        raise TypeError("pot 은 정수, relay 는 true/false 여야 합니다")
+    if type(seq) is not int or type(device_ms) is not int:
+        raise TypeError("seq/device_ms 는 정수여야 합니다")
+    if not (math.isfinite(temp) and math.isfinite(humi)):
+        raise ValueError("temp/humi 가 유한한 값이 아닙니다")
+    return SensorRecord(float(temp), float(humi), pot, relay, seq, device_ms)
+
+
+if msgspec is not None:
+    class _Payload(msgspec.Struct):
+        temp: float
+        humi: float
+        pot: Optional[int] = None
+        rotary: Optional[int] = None
+        relay: bool = False
+        seq: int = -1
+        device_ms: int = 0
+
+
+class PayloadDecoder:
+    BACKENDS = tuple(name for name, mod in (("msgspec", msgspec), ("orjson", orjson), ("json", json))
+                     if mod is not None)
+
+    def __init__(self, backend=None):
+        self.backend = backend or self.BACKENDS[0]
+        if self.backend not in self.BACKENDS:
+            raise ValueError(f"사용할 수 없는 디코더: {self.backend}")
+        self.decoded = 0
+        self.malformed = 0
+        self.last_error = None
+        if self.backend == "msgspec":
+            self._decode = self._decode_msgspec
+            self._decoder = msgspec.json.Decoder(_Payload)
+        elif self.backend == "orjson":
+            self._decode = lambda payload: _from_dict(orjson.loads(payload))
+        else:
+            self._decode = lambda payload: _from_dict(json.loads(payload))
+
+    def _decode_msgspec(self, payload):
+        p = self._decoder.decode(payload)
+        pot = p.pot if p.pot is not None else (p.rotary or 0)
+        if not (math.isfinite(p.temp) and math.isfinite(p.humi)):
+            raise ValueError("temp/humi 가 유한한 값이 아닙니다")
+        return SensorRecord(p.temp, p.humi, pot, p.relay, p.seq, p.device_ms)
+
+    def decode(self, payload):
+        """bytes/str → SensorRecord. 잘못된 메시지는 세기만 하고 None."""
+        try:
+            if payload[:2] == BINARY_MAGIC:
+                record = _from_binary(payload)
+            else:
+                record = self._decode(payload)
+        except Exception as e:
+            self.malformed += 1
+            self.last_error = e
+            return None
+        self.decoded += 1
+        return record
+
+
+if __name__ == "__main__":
+    import timeit
+
+    samples = [json.dumps({"temp": 20 + i % 15 + 0.5, "humi": 40.0 + i % 30, "pot": i % 4096,
+                           "relay": i % 4096 >= 3200}).encode() for i in range(1000)]
+    for backend in PayloadDecoder.BACKENDS:
+        decoder = PayloadDecoder(backend)
+        t = min(timeit.repeat(lambda: [decoder.decode(s) for s in samples], number=20, repeat=3))
+        print(f"{backend:8s} {len(samples) * 20 / t:>12,.0f} msgs/s")
+    decoder = PayloadDecoder()
+    binary = [encode_binary(decoder.decode(s), seq=i) for i, s in enumerate(samples)]
+    t = min(timeit.repeat(lambda: [decoder.decode(b) for b in binary], number=20, repeat=3))
+    print(f"{'binary':8s} {len(binary) * 20 / t:>12,.0f} msgs/s  "
+          f"({len(binary[0])} B, JSON 평균 {sum(map(len, samples)) / len(samples):.0f} B)")
+    try:
+        recorded = binary * 100
+        t = min(timeit.repeat(lambda: decode_batch(recorded), number=5, repeat=3))
+        print(f"{'numpy':8s} {len(recorded) * 5 / t:>12,.0f} msgs/s  (decode_batch)")
+    except ImportError:
+        pass
+    decoder = PayloadDecoder()
+    for bad in (b"", b"{", b'{"temp": null, "humi": 40}', b'{"humi": 40}', b'{"temp": "x", "humi": 1}'):
+        assert decoder.decode(bad) is None
+    print(f"잘못된 메시지 {decoder.malformed}개 ({decoder.last_error})")
@@ -0,0 +1,142 @@
+"""패널에서 보내는 명령(LED 등)을 한 스레드로 내보내는 발행 큐.
+
+    publisher = Publisher(client, rate=20, burst=10).start()
+    publisher.publish("arduino/leds", mask)   # Tk 스레드에서 바로 돌아온다
+    publisher.snapshot()                      # 큐 길이, 합쳐진 수, ack 지연 등
+
+토픽마다 보낼 값은 하나만 기다린다: 아직 안 보낸 토픽에 새 값이 오면
+예전 값을 버리고 최신 값으로 바꾼다 (순서는 처음 들어온 자리 그대로).
+브로커로는 token bucket 으로 초당 rate 개(순간 burst 개)까지만 보내고,
+연결이 끊겨 있으면 기다렸다가 다시 연결되면 최신 값만 보낸다.
+on_publish 로 ack(QoS 0 은 소켓에 쓴 시점)를 받아 지연 시간을 잰다.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class Publisher:
+    def __init__(self, core, rate=20.0, burst=10, qos=1):
+        self.core = core
+        self.rate = rate
+        self.burst = burst
+        self.qos = qos
+        self._pending = OrderedDict()  # topic → (payload, qos, retain, 넣은 시각)
+        self._cond = threading.Condition()
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._inflight = {}  # mid → (topic, 넣은 시각)
+        self._early = {}  # publish() 가 돌아오기 전에 온 ack: mid → 시각
+        self._ack_lock = threading.Lock()
+        self._thread = None
+        self._running = False
+        self.stats = {
+            "enqueued": 0,
+            "coalesced": 0,
+            "sent": 0,
+            "acked": 0,
+            "failed": 0,
+            "max_depth": 0,
+            "last_latency_ms": 0.0,
+            "max_latency_ms": 0.0,
+            "total_latency_ms": 0.0,
+        }
+        core.client.on_publish = self._on_publish
+
+    # --- 넣기 (아무 스레드) ---
+    def publish(self, topic, payload, qos=None, retain=False):
+        with self._cond:
+            if topic in self._pending:
+                self.stats["coalesced"] += 1
+                queued_at = self._pending[topic][3]  # 지연은 처음 요청한 시각부터
+            else:
+                queued_at = time.monotonic()
+            self._pending[topic] = (payload, self.qos if qos is None else qos, retain, queued_at)
+            self.stats["enqueued"] += 1
+            self.stats["max_depth"] = max(self.stats["max_depth"], len(self._pending))
+            self._cond.notify()
+
+    # --- 보내기 (발행 스레드) ---
+    def _take_token(self):
+        """token 이 생길 때까지 기다린다 (Condition 을 잡은 상태로 부른다)."""
+        while self._running:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+            self._last_refill = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            self._cond.wait((1 - self._tokens) / self.rate)
+        return False
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running and (not self._pending or not self.core.connected):
+                    # 연결이 끊겨 있으면 최신 값만 쌓아 두고 기다린다
+                    self._cond.wait(0.5)
+                if not self._pending or not self._take_token():
+                    if not self._running:
+                        return
+                    continue
+                topic, (payload, qos, retain, queued_at) = self._pending.popitem(last=False)
+            info = self.core.client.publish(topic, payload, qos, retain)
+            if info.rc != 0:
+                # 보내지 못하면 (그 사이 더 새 값이 없을 때만) 다시 넣는다
+                with self._cond:
+                    self.stats["failed"] += 1
+                    if topic not in self._pending:
+                        self._pending[topic] = (payload, qos, retain, queued_at)
+                        self._pending.move_to_end(topic, last=False)
+                continue
+            with self._ack_lock:
+                self.stats["sent"] += 1
+                acked_at = self._early.pop(info.mid, None)
+                if acked_at is None:
+                    self._inflight[info.mid] = (topic, queued_at)
+            if acked_at is not None:
+                self._record(queued_at, acked_at)
+
+    def _on_publish(self, client, userdata, mid):
+        now = time.monotonic()
+        with self._ack_lock:
+            entry = self._inflight.pop(mid, None)
+            if entry is None:
+                self._early[mid] = now
+                return
+        self._record(entry[1], now)
+
+    def _record(self, queued_at, acked_at):
+        latency = (acked_at - queued_at) * 1000
+        with self._ack_lock:
+            st = self.stats
+            st["acked"] += 1
+            st["last_latency_ms"] = latency
+            st["max_latency_ms"] = max(st["max_latency_ms"], latency)
+            st["total_latency_ms"] += latency
+
+    def snapshot(self):
+        with self._cond, self._ack_lock:
+            st = dict(self.stats)
+            st["depth"] = len(self._pending)
+            st["inflight"] = len(self._inflight)
+        st["avg_latency_ms"] = st["total_latency_ms"] / st["acked"] if st["acked"] else 0.0
+        return st
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="mqtt-publisher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=2.0):
+        """남은 명령을 timeout 초 동안 보내 보고 발행 스레드를 끝낸다."""
+        deadline = time.monotonic() + timeout
+        while self._pending and self.core.connected and time.monotonic() < deadline:
+            time.sleep(0.05)
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
@@ -1,38 +1,66 @@
 import tkinter as tk
 from tkinter import font
-import paho.mqtt.client as mqtt
 import threading
+import os
+import sys
+from functools import partial
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # 상위 폴더의 mqtt_core
+from mqtt_core import MqttCore
+from publisher import Publisher
+from device_registry import device_topic
+from led_mask import decode_mask, encode_mask
+from ui_state import UiRefresher, UiState
 
 
 MQTT_BROKER = "broker.emqx.io"
 MQTT_PORT = 1883
-MQTT_TOPICS = [
-    "arduino/led1",
-    "arduino/led2",
-    "arduino/led3",
-    "arduino/led4",
-    "arduino/led5",
-    "arduino/led6",
-    "arduino/led7",
-    "arduino/led8",
-]
+# 제어할 보드 (시리얼 모니터에 찍히는 "esp32-xxxxxx", "" 이면 예전 전역 토픽 arduino/leds, led1..8)
+DEVICE_ID = ""
+# 예전 펌웨어용으로 .../led1..8 에도 같이 보낸다 (모든 보드를 업데이트하면 False)
+LED_LEGACY_TOPICS = True
+
+led_states = [False] * 8
+# 화면 상태: MQTT 스레드는 값만 바꾸고 Tk 가 20Hz 로 바뀐 버튼만 다시 그린다
+ui = UiState(**{f"led{i}": False for i in range(8)})
+
+client = MqttCore(MQTT_BROKER, MQTT_PORT)
+publisher = Publisher(client, rate=20, burst=10)  # 버튼 명령은 이 큐로만 보낸다
 
 
-client = mqtt.Client()
+# 재연결하면 retain 된 LED 상태를 다시 받아 버튼에 맞춘다 (PyDroid3.py 와 같은 핸들러)
+def on_led(index, topic, payload):
+    led_states[index] = (payload == b"1")
+    ui.set(f"led{index}", led_states[index])
+
+def on_leds(topic, payload):
+    # .../leds: 8개 상태가 한 메시지로 온다
+    states, _ = decode_mask(payload)
+    for i, on in enumerate(states):
+        led_states[i] = on
+        ui.set(f"led{i}", on)
 
 def connect_mqtt():
+    for i in range(8):
+        client.on(device_topic(DEVICE_ID, f"led{i+1}"), partial(on_led, i))
+    client.on(device_topic(DEVICE_ID, "leds"), on_leds)
     try:
-        client.connect(MQTT_BROKER, MQTT_PORT, 60)
-        print("Connected to MQTT Broker!")
-        client.loop_start()  
+        client.start()  # 연결과 재연결은 mqtt_core 감시 스레드가 맡는다
+        print("Connecting to MQTT Broker...")
     except Exception as e:
         print(f"Failed to connect to MQTT Broker: {e}")
 
 
-def toggle_led(topic, state):
-    payload = "1" if state else "0"
-    client.publish(topic, payload)
-    print(f"Published to {topic}: {payload}")
+def toggle_led(index):
+    led_states[index] = not led_states[index]
+    # retain: 재연결한 보드가 마지막 상태를 받도록. 펌웨어는 leds 를 마지막에 적용하므로
+    # ex1-8.py/PyDroid3.py 처럼 마스크도 같이 보내야 예전 마스크가 이 토글을 되돌리지 않는다
+    publisher.publish(device_topic(DEVICE_ID, "leds"), encode_mask(led_states), retain=True)
+    if LED_LEGACY_TOPICS:
+        publisher.publish(device_topic(DEVICE_ID, f"led{index+1}"),
+                          "1" if led_states[index] else "0", retain=True)
+    ui.set(f"led{index}", led_states[index])
+    print(f"Published LED {index+1}: {'1' if led_states[index] else '0'}")
 
 
 def create_gui():
@@ -63,20 +91,10 @@ def create_gui():
     buttons = []
 
     
-    for i, label in enumerate(labels):
-        led_state = tk.BooleanVar(value=False)
+    def render_led(index, on):
+        buttons[index].configure(bg="light gray" if on else "white", fg="black")
 
-        
-        def toggle(index=i):
-            current_state = led_state.get()
-            toggle_led(MQTT_TOPICS[index], not current_state)
-            led_state.set(not current_state)
-            buttons[index].configure(
-                bg="light gray" if led_state.get() else "white", 
-                fg="black"
-            )
-
-        
+    for i, label in enumerate(labels):
         lbl = tk.Label(
             window,
             text=f"{label} (LED {i+1})",
@@ -97,19 +115,23 @@ def create_gui():
             fg="black",
             activebackground="light gray",
             activeforeground="black",
-            command=lambda idx=i: toggle(idx),  
+            command=lambda idx=i: toggle_led(idx),
             relief="raised",
             bd=6,
         )
         btn.pack(pady=5)
         buttons.append(btn)
 
-    
+    refresher = UiRefresher(window, ui, fps=20)
+    for i in range(8):
+        refresher.bind(f"led{i}", partial(render_led, i))
+    refresher.start()
     window.mainloop()
 
 
 if __name__ == "__main__":
     connect_mqtt()
+    publisher.start()
     
     gui_thread = threading.Thread(target=create_gui)
     gui_thread.start()
@@ -2,52 +2,69 @@ import tkinter as tk
 import random
 import time
 import threading
+import os
+import sys
 from datetime import datetime
-import paho.mqtt.client as mqtt
+from functools import partial
 import json
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # 상위 폴더의 mqtt_core
+from mqtt_core import MqttCore
+from publisher import Publisher
+from ui_state import UiRefresher, UiState
+from led_mask import decode_mask, encode_mask
+from device_registry import device_topic
+
 # 전역 변수
 relay_state = False
 led_states = [False] * 8
 current_values = {"temp": 0.0, "humi": 0.0, "pot": 0}
 
+# 화면 상태: MQTT 스레드는 값만 바꾸고 Tk 가 20Hz 로 바뀐 위젯만 다시 그린다
+ui = UiState(relay=False, **{f"led{i}": False for i in range(8)})
+
 # 핀 번호 (ESP32 기준)
 led_pins = [2, 4, 5, 18, 19, 25, 26, 27]
 
 # MQTT 브로커 설정
 MQTT_BROKER = "broker.emqx.io"
 MQTT_PORT = 1883
-client = mqtt.Client()
-
-def on_message(client, userdata, msg):
-    global relay_state, led_states
-    topic = msg.topic
-    payload = msg.payload.decode()
-
-    if topic == "arduino/output":
-        relay_state = (payload.lower() == "post 3200 on")
+# 이 패널이 보는 보드 (시리얼 모니터에 찍히는 "esp32-xxxxxx", "" 이면 예전 전역 토픽 arduino/...)
+DEVICE_ID = ""
+# 예전 펌웨어용으로 .../led1..8 에도 같이 보낸다 (모든 보드를 업데이트하면 False)
+LED_LEGACY_TOPICS = True
+client = MqttCore(MQTT_BROKER, MQTT_PORT)
+publisher = Publisher(client, rate=20, burst=10)  # 명령은 이 큐로만 보낸다
+
+def on_output(topic, payload):
+    global relay_state
+    relay_state = (payload.decode().lower() == "post 3200 on")
+    ui.set("relay", relay_state)
+
+def on_led(index, topic, payload):
+    led_states[index] = (payload == b"1")
+    ui.set(f"led{index}", led_states[index])
+
+def on_leds(topic, payload):
+    # .../leds: 8개 상태가 한 메시지로 온다
+    states, _ = decode_mask(payload)
+    for i, on in enumerate(states):
+        led_states[i] = on
+        ui.set(f"led{i}", on)
 
+def connect_mqtt():
+    client.on(device_topic(DEVICE_ID, "output"), on_output)
     for i in range(8):
-        if topic == f"arduino/led{i+1}":
-            led_states[i] = (payload == "1")
+        client.on(device_topic(DEVICE_ID, f"led{i+1}"), partial(on_led, i))
+    client.on(device_topic(DEVICE_ID, "leds"), on_leds)
+    client.start()
+    publisher.start()
 
-    update_ui()
+def render_relay(on):
+    relay_label.config(text=f"릴레이: {'ON' if on else 'OFF'}", fg="green" if on else "red")
 
-def connect_mqtt():
-    client.on_message = on_message
-    client.connect(MQTT_BROKER, MQTT_PORT, 60)
-    client.subscribe("arduino/output")
-    for i in range(1, 9):
-        client.subscribe(f"arduino/led{i}")
-    client.loop_start()
-
-def update_ui():
-    temp_label.config(text=f"온도: {current_values['temp']:.1f} °C")
-    humi_label.config(text=f"습도: {current_values['humi']:.1f} %")
-    pot_label.config(text=f"가변저항: {current_values['pot']}")
-    relay_label.config(text=f"릴레이: {'ON' if relay_state else 'OFF'}", fg="green" if relay_state else "red")
-    for i in range(8):
-        led_buttons[i].config(bg="green" if led_states[i] else "gray")
+def render_led(index, on):
+    led_buttons[index].config(bg="green" if on else "gray")
 
 def update_datetime():
     now = datetime.now()
@@ -59,9 +76,13 @@ def update_datetime():
 
 def toggle_led(index):
     led_states[index] = not led_states[index]
-    led_buttons[index].config(bg="green" if led_states[index] else "gray")
-    payload = "1" if led_states[index] else "0"
-    client.publish(f"arduino/led{index+1}", payload)
+    ui.set(f"led{index}", led_states[index])
+    render_led(index, led_states[index])
+    # retain: 재연결하거나 새로 켜진 패널/보드가 마지막 LED 상태를 바로 받는다
+    publisher.publish(device_topic(DEVICE_ID, "leds"), encode_mask(led_states), retain=True)
+    if LED_LEGACY_TOPICS:
+        publisher.publish(device_topic(DEVICE_ID, f"led{index+1}"),
+                          "1" if led_states[index] else "0", retain=True)
 
 # Tkinter GUI 설정
 window = tk.Tk()
@@ -99,6 +120,13 @@ for i in range(8):
     btn.grid(row=row, column=col, padx=5, pady=5)
     led_buttons.append(btn)
 
+# 화면 갱신 tick
+refresher = UiRefresher(window, ui, fps=20)
+refresher.bind("relay", render_relay)
+for i in range(8):
+    refresher.bind(f"led{i}", partial(render_led, i))
+refresher.start()
+
 # MQTT 연결 및 UI 시작
 connect_mqtt()
 update_datetime()
@@ -0,0 +1,261 @@
+"""final_data 의 분/시간 단위 집계(rollup) 테이블 관리.
+
+수신한 행을 메모리에서 (장치, 분/시간 버킷)별 min/max/sum/count 로 모아 두었다가
+주기적으로 final_data_1m / final_data_1h 에 upsert 한다.
+대시보드나 리포트는 원본 대신 이 작은 테이블을 조회하면 된다.
+
+기존 이력 채우기 (RollupEngine 이 이미 만든 분 버킷은 건드리지 않는다):
+    python rollup.py backfill --start 2025-01-01 --chunk-hours 24
+"""
+import argparse
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sensor_db import ROW_COLUMNS, TABLE, ConnectionPool, add_db_args, db_config_from_args
+
+FIELDS = ("temp", "humi", "rotary")
+# 기간 이름 → (테이블, 버킷 문자열 자르는 길이, 채울 접미사, DATE_FORMAT 형식)
+PERIODS = {
+    "1m": (f"{TABLE}_1m", 16, ":00", "%Y-%m-%d %H:%i:00"),
+    "1h": (f"{TABLE}_1h", 13, ":00:00", "%Y-%m-%d %H:00:00"),
+}
+
+_FIELD_INDEX = [ROW_COLUMNS.index(f) for f in FIELDS]
+_DATA_INDEX = ROW_COLUMNS.index("data")
+_DEVICE_INDEX = ROW_COLUMNS.index("device_id")
+
+# 집계 컬럼 순서: cnt, (필드별) min, max, sum
+AGG_COLUMNS = ["cnt"] + [f"{f}_{a}" for f in FIELDS for a in ("min", "max", "sum")]
+
+
+def create_tables(conn):
+    cols = ",\n  ".join(
+        f"{f}_{a} DOUBLE NOT NULL" for f in FIELDS for a in ("min", "max", "sum"))
+    with conn.cursor() as cursor:
+        for table, *_ in PERIODS.values():
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} (\n"
+                f"  device_id VARCHAR(32) NOT NULL DEFAULT '',\n"
+                f"  bucket DATETIME NOT NULL,\n"
+                f"  cnt INT NOT NULL,\n  {cols},\n"
+                f"  PRIMARY KEY (device_id, bucket)\n)")
+            # 장치 구분 전에 만든 테이블: 기존 버킷은 device_id '' 로 남는다
+            cursor.execute(
+                "SELECT COUNT(*) FROM information_schema.COLUMNS "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s "
+                "AND COLUMN_NAME = 'device_id'", (table,))
+            if cursor.fetchone()[0] == 0:
+                cursor.execute(
+                    f"ALTER TABLE {table} "
+                    f"ADD COLUMN device_id VARCHAR(32) NOT NULL DEFAULT '' FIRST, "
+                    f"DROP PRIMARY KEY, ADD PRIMARY KEY (device_id, bucket)")
+    conn.commit()
+
+
+def _merge_sql(table):
+    """이미 있는 버킷이면 min/max/sum/count 를 합치는 upsert."""
+    names = ["device_id", "bucket"] + AGG_COLUMNS
+    updates = ["cnt = cnt + VALUES(cnt)"]
+    for f in FIELDS:
+        updates += [f"{f}_min = LEAST({f}_min, VALUES({f}_min))",
+                    f"{f}_max = GREATEST({f}_max, VALUES({f}_max))",
+                    f"{f}_sum = {f}_sum + VALUES({f}_sum)"]
+    return (f"INSERT INTO {table} ({', '.join(names)}) "
+            f"VALUES ({', '.join(['%s'] * len(names))}) "
+            f"ON DUPLICATE KEY UPDATE {', '.join(updates)}")
+
+
+def query_rollup(conn, period, start, end, device_id=None):
+    """[start, end) 구간의 버킷별 (bucket, cnt, temp_avg/min/max, ...) 행 목록.
+
+    device_id 를 주면 그 장치만, 아니면 모든 장치를 버킷별로 합친다.
+    """
+    table = PERIODS[period][0]
+    if device_id is not None:
+        cols = ["bucket", "cnt"]
+        for f in FIELDS:
+            cols += [f"{f}_sum / cnt AS {f}_avg", f"{f}_min", f"{f}_max"]
+        sql = (f"SELECT {', '.join(cols)} FROM {table} "
+               f"WHERE device_id = %s AND bucket >= %s AND bucket < %s ORDER BY bucket")
+        args = (device_id, start, end)
+    else:
+        cols = ["bucket", "SUM(cnt)"]
+        for f in FIELDS:
+            cols += [f"SUM({f}_sum) / SUM(cnt) AS {f}_avg", f"MIN({f}_min)", f"MAX({f}_max)"]
+        sql = (f"SELECT {', '.join(cols)} FROM {table} "
+               f"WHERE bucket >= %s AND bucket < %s GROUP BY bucket ORDER BY bucket")
+        args = (start, end)
+    with conn.cursor() as cursor:
+        cursor.execute(sql, args)
+        return cursor.fetchall()
+
+
+# --- 실시간 집계 ---
+class RollupEngine:
+    def __init__(self, pool, flush_interval=30.0):
+        self.pool = pool
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._buckets = {period: {} for period in PERIODS}
+        self._stop = threading.Event()
+        self._thread = None
+        self.flushed_buckets = 0
+
+    def add(self, row):
+        """ROW_COLUMNS 순서의 행 하나를 분/시간 버킷에 반영한다."""
+        values = [row[i] for i in _FIELD_INDEX]
+        data = row[_DATA_INDEX]
+        device = row[_DEVICE_INDEX]
+        with self._lock:
+            for period, (_, cut, suffix, _) in PERIODS.items():
+                # "YYYY-MM-DD HH:MM:SS.fff" 문자열을 잘라서 버킷 키로 사용
+                key = (device, data[:cut] + suffix)
+                agg = self._buckets[period].get(key)
+                if agg is None:
+                    agg = [0]
+                    for v in values:
+                        agg += [v, v, 0.0]
+                    self._buckets[period][key] = agg
+                agg[0] += 1
+                for j, v in enumerate(values):
+                    base = 1 + j * 3
+                    if v < agg[base]:
+                        agg[base] = v
+                    if v > agg[base + 1]:
+                        agg[base + 1] = v
+                    agg[base + 2] += v
+
+    def flush(self):
+        with self._lock:
+            pending, self._buckets = self._buckets, {period: {} for period in PERIODS}
+        if not any(pending.values()):
+            return
+        try:
+            with self.pool.connection() as conn:
+                with conn.cursor() as cursor:
+                    for period, buckets in pending.items():
+                        if buckets:
+                            cursor.executemany(
+                                _merge_sql(PERIODS[period][0]),
+                                [(*key, *agg) for key, agg in buckets.items()])
+                conn.commit()
+            self.flushed_buckets += sum(len(b) for b in pending.values())
+        except Exception as e:
+            print(f"❌ rollup 저장 오류 (다음 주기에 다시 시도): {e}")
+            self._merge_back(pending)
+
+    def _merge_back(self, pending):
+        with self._lock:
+            for period, buckets in pending.items():
+                current = self._buckets[period]
+                for key, agg in buckets.items():
+                    cur = current.get(key)
+                    if cur is None:
+                        current[key] = agg
+                        continue
+                    cur[0] += agg[0]
+                    for j in range(len(FIELDS)):
+                        base = 1 + j * 3
+                        cur[base] = min(cur[base], agg[base])
+                        cur[base + 1] = max(cur[base + 1], agg[base + 1])
+                        cur[base + 2] += agg[base + 2]
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def start(self):
+        try:
+            with self.pool.connection() as conn:
+                create_tables(conn)
+        except Exception as e:
+            print(f"❌ rollup 테이블 확인 실패: {e}")
+        self._thread = threading.Thread(target=self._run, name="rollup", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+
+# --- 기존 이력 backfill ---
+def backfill(pool, start=None, end=None, chunk_hours=24):
+    """원본 테이블을 chunk_hours 단위로 잘라 서버에서 집계해 rollup 을 채운다.
+
+    end 기본값은 현재 시각의 정시라서 아직 쌓이는 중인 시간대는 건드리지 않는다.
+    final_data 에는 압축(deadband/swinging door) 뒤 샘플만 남으므로, RollupEngine 이 원본
+    샘플로 만든 분 버킷을 덮어쓰면 count/sum/min/max 가 작아진다. 그래서 분 버킷은
+    없는 것만 넣고 (INSERT IGNORE), 시간 버킷은 분 버킷을 합쳐서 다시 만든다.
+    """
+    minute_table, _, _, minute_fmt = PERIODS["1m"]
+    hour_table, _, _, hour_fmt = PERIODS["1h"]
+    with pool.connection() as conn:
+        create_tables(conn)
+        if start is None:
+            with conn.cursor() as cursor:
+                cursor.execute(f"SELECT MIN(data) FROM {TABLE}")
+                first = cursor.fetchone()[0]
+            if first is None:
+                print("원본 데이터가 없습니다")
+                return
+            start = first if isinstance(first, datetime) else datetime.fromisoformat(str(first))
+        if end is None:
+            end = datetime.now().replace(minute=0, second=0, microsecond=0)
+    start = start.replace(minute=0, second=0, microsecond=0)
+
+    aggs = ", ".join(f"MIN({f}), MAX({f}), SUM({f})" for f in FIELDS)
+    minute_sql = (
+        f"INSERT IGNORE INTO {minute_table} (device_id, bucket, {', '.join(AGG_COLUMNS)}) "
+        f"SELECT device_id, DATE_FORMAT(data, '{minute_fmt.replace('%', '%%')}') AS b, "
+        f"COUNT(*), {aggs} "
+        f"FROM {TABLE} WHERE data >= %s AND data < %s GROUP BY device_id, b")
+    # 시간 rollup 은 분 rollup 에서 합친다 (원본을 다시 읽지 않음, 실시간 분 버킷도 그대로 반영)
+    hour_aggs = ", ".join(f"MIN({f}_min), MAX({f}_max), SUM({f}_sum)" for f in FIELDS)
+    hour_sql = (
+        f"INSERT INTO {hour_table} (device_id, bucket, {', '.join(AGG_COLUMNS)}) "
+        f"SELECT device_id, DATE_FORMAT(bucket, '{hour_fmt.replace('%', '%%')}') AS b, "
+        f"SUM(cnt), {hour_aggs} "
+        f"FROM {minute_table} WHERE bucket >= %s AND bucket < %s GROUP BY device_id, b "
+        f"ON DUPLICATE KEY UPDATE "
+        + ", ".join(f"{c} = VALUES({c})" for c in AGG_COLUMNS))
+
+    step = timedelta(hours=chunk_hours)
+    chunk_start = start
+    while chunk_start < end:
+        chunk_end = min(chunk_start + step, end)
+        args = (chunk_start.strftime("%Y-%m-%d %H:%M:%S"), chunk_end.strftime("%Y-%m-%d %H:%M:%S"))
+        t0 = time.perf_counter()
+        with pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(minute_sql, args)
+                cursor.execute(hour_sql, args)
+            conn.commit()
+        print(f"✅ {args[0]} ~ {args[1]} 집계 완료 ({time.perf_counter() - t0:.2f}s)")
+        chunk_start = chunk_end
+
+
+def main():
+    parser = argparse.ArgumentParser(description="final_data rollup 도구")
+    sub = parser.add_subparsers(dest="command", required=True)
+    bf = sub.add_parser("backfill", help="기존 이력으로 rollup 테이블 채우기 "
+                                         "(이미 있는 분 버킷은 그대로 두고 없는 것만 채움)")
+    bf.add_argument("--start", type=datetime.fromisoformat)
+    bf.add_argument("--end", type=datetime.fromisoformat)
+    bf.add_argument("--chunk-hours", type=int, default=24)
+    add_db_args(bf)
+    args = parser.parse_args()
+
+    pool = ConnectionPool(db_config_from_args(args), size=1)
+    try:
+        backfill(pool, args.start, args.end, args.chunk_hours)
+    finally:
+        pool.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""final_data 스키마 관리: DATETIME(3) 시간 컬럼, (device_id, data) 인덱스, 월별 파티션.
+
+    python schema.py create                 # 새 테이블 생성 (없을 때만)
+    python schema.py migrate --chunk 5000   # 기존 테이블을 새 스키마로 옮기기 (중단 후 재실행 가능)
+    python schema.py partitions --ahead 3   # 앞으로 3개월 파티션 미리 만들기
+    python schema.py drop-before 2025-01    # 2025-01 이전 파티션 통째로 삭제
+
+오래된 데이터는 DELETE 대신 drop-before 로 파티션을 지우면 즉시 끝난다.
+"""
+import argparse
+import time
+from datetime import date, datetime
+
+from sensor_db import TABLE, ConnectionPool, add_db_args, db_config_from_args
+
+NEW_TABLE = f"{TABLE}_new"
+OLD_TABLE = f"{TABLE}_old"
+PROGRESS_TABLE = "schema_migration"
+COPY_COLUMNS = ("rotary", "temp", "humi", "data", "sample_key", "device_id")
+
+
+# --- 파티션 이름/경계 ---
+def _month_start(d):
+    return date(d.year, d.month, 1)
+
+
+def _next_month(d):
+    return date(d.year + d.month // 12, d.month % 12 + 1, 1)
+
+
+def _partition_def(month):
+    return (f"PARTITION p{month:%Y%m} VALUES LESS THAN "
+            f"('{_next_month(month):%Y-%m-%d}')")
+
+
+def _months(first, last):
+    month = _month_start(first)
+    while month <= last:
+        yield month
+        month = _next_month(month)
+
+
+def create_table(conn, table=TABLE, first_month=None, months_ahead=3):
+    first_month = _month_start(first_month or date.today())
+    last = date.today()
+    for _ in range(months_ahead):
+        last = _next_month(last)
+    parts = ",\n  ".join(_partition_def(m) for m in _months(first_month, last))
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} (\n"
+            f"  id BIGINT NOT NULL AUTO_INCREMENT,\n"
+            f"  device_id VARCHAR(32) NOT NULL DEFAULT '',\n"
+            f"  rotary INT NOT NULL,\n"
+            f"  temp FLOAT NOT NULL,\n"
+            f"  humi FLOAT NOT NULL,\n"
+            f"  data DATETIME(3) NOT NULL,\n"
+            f"  sample_key CHAR(32) NULL,\n"
+            # 파티션 테이블은 모든 UNIQUE 키에 파티션 컬럼(data)이 들어가야 한다
+            f"  PRIMARY KEY (id, data),\n"
+            f"  UNIQUE KEY uq_sample_key (sample_key, data),\n"
+            f"  KEY idx_device_time (device_id, data)\n"
+            f") PARTITION BY RANGE COLUMNS(data) (\n"
+            f"  {parts},\n"
+            f"  PARTITION pmax VALUES LESS THAN (MAXVALUE)\n"
+            f")")
+    conn.commit()
+
+
+def list_partitions(conn, table=TABLE):
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s "
+            "AND PARTITION_NAME IS NOT NULL ORDER BY PARTITION_ORDINAL_POSITION", (table,))
+        return [row[0] for row in cursor.fetchall()]
+
+
+def ensure_partitions(conn, table=TABLE, months_ahead=3):
+    """pmax 를 쪼개서 이번 달부터 months_ahead 개월 뒤까지 월 파티션을 만든다."""
+    existing = set(list_partitions(conn, table))
+    last = date.today()
+    for _ in range(months_ahead):
+        last = _next_month(last)
+    missing = [m for m in _months(date.today(), last) if f"p{m:%Y%m}" not in existing]
+    if not missing:
+        return []
+    parts = ", ".join(_partition_def(m) for m in missing)
+    with conn.cursor() as cursor:
+        # pmax 는 평소 비어 있어서 REORGANIZE 가 바로 끝난다
+        cursor.execute(
+            f"ALTER TABLE {table} REORGANIZE PARTITION pmax INTO "
+            f"({parts}, PARTITION pmax VALUES LESS THAN (MAXVALUE))")
+    conn.commit()
+    return [f"p{m:%Y%m}" for m in missing]
+
+
+def drop_partitions_before(conn, month, table=TABLE):
+    """month(YYYY-MM 의 1일) 이전 월 파티션을 DROP 한다 (행 단위 DELETE 없음)."""
+    cutoff = f"p{_month_start(month):%Y%m}"
+    old = [p for p in list_partitions(conn, table) if p != "pmax" and p < cutoff]
+    if old:
+        with conn.cursor() as cursor:
+            cursor.execute(f"ALTER TABLE {table} DROP PARTITION {', '.join(old)}")
+        conn.commit()
+    return old
+
+
+def query_range(conn, start, end, device_id=None, columns=("data", "rotary", "temp", "humi")):
+    """[start, end) 구간 행을 시간순으로 가져온다 (파티션 pruning + 인덱스 사용)."""
+    sql = f"SELECT {', '.join(columns)} FROM {TABLE} WHERE data >= %s AND data < %s"
+    args = [start, end]
+    if device_id is not None:
+        sql += " AND device_id = %s"
+        args.append(device_id)
+    sql += " ORDER BY data"
+    with conn.cursor() as cursor:
+        cursor.execute(sql, args)
+        return cursor.fetchall()
+
+
+# --- 기존 테이블 이전 ---
+def _columns(conn, table):
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT COLUMN_NAME, COLUMN_KEY, EXTRA FROM information_schema.COLUMNS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s", (table,))
+        return cursor.fetchall()
+
+
+def _progress(conn, name):
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {PROGRESS_TABLE} ("
+            f"name VARCHAR(64) NOT NULL PRIMARY KEY, last_key BIGINT NOT NULL, "
+            f"updated_at DATETIME NOT NULL)")
+        cursor.execute(f"SELECT last_key FROM {PROGRESS_TABLE} WHERE name = %s", (name,))
+        row = cursor.fetchone()
+    conn.commit()
+    return row[0] if row else 0
+
+
+def _copy_chunks(pool, source, target, pk, columns, chunk, progress_name):
+    """source 의 pk 순서대로 chunk 행씩 읽어 target 에 넣는다.
+
+    읽기는 일반 SELECT(잠금 없는 consistent read)이고, 진행 위치는
+    INSERT 와 같은 트랜잭션에 기록해서 중간에 멈춰도 이어서 할 수 있다.
+    """
+    insert_sql = (
+        f"INSERT INTO {target} ({', '.join(columns)}) "
+        f"VALUES ({', '.join(['%s'] * len(columns))}) "
+        f"ON DUPLICATE KEY UPDATE sample_key = VALUES(sample_key)")
+    select_sql = (
+        f"SELECT {pk}, {', '.join(columns)} FROM {source} "
+        f"WHERE {pk} > %s AND data IS NOT NULL ORDER BY {pk} LIMIT %s")
+    copied = 0
+    with pool.connection() as conn:
+        last_key = _progress(conn, progress_name)
+        while True:
+            t0 = time.perf_counter()
+            with conn.cursor() as cursor:
+                cursor.execute(select_sql, (last_key, chunk))
+                rows = cursor.fetchall()
+                if not rows:
+                    conn.commit()
+                    break
+                cursor.executemany(insert_sql, [row[1:] for row in rows])
+                last_key = rows[-1][0]
+                cursor.execute(
+                    f"REPLACE INTO {PROGRESS_TABLE} (name, last_key, updated_at) "
+                    f"VALUES (%s, %s, NOW())", (progress_name, last_key))
+            conn.commit()
+            copied += len(rows)
+            print(f"  {progress_name}: {copied}행 복사 (마지막 {pk}={last_key}, "
+                  f"{time.perf_counter() - t0:.2f}s)")
+            if len(rows) < chunk:
+                break
+    return copied
+
+
+def migrate(pool, chunk=5000, months_ahead=3):
+    """기존 final_data 를 파티션 테이블로 옮긴 뒤 RENAME 으로 바꿔 끼운다."""
+    with pool.connection() as conn:
+        if list_partitions(conn, TABLE):
+            # 이미 바꿔 끼웠다면 RENAME 직후 멈춘 경우만 따라잡기를 마저 한다
+            old_cols = _columns(conn, OLD_TABLE)
+            if not old_cols:
+                print(f"✅ {TABLE} 은 이미 파티션 테이블입니다")
+                return
+            renamed = True
+            cols = old_cols
+        else:
+            renamed = False
+            cols = _columns(conn, TABLE)
+        names = {c[0] for c in cols}
+        pk = [c[0] for c in cols if c[1] == "PRI"]
+        if len(pk) != 1:
+            raise SystemExit("❌ 원본 테이블에 단일 컬럼 PRIMARY KEY 가 없어 chunk 이전을 할 수 없습니다")
+        pk = pk[0]
+        if not renamed:
+            with conn.cursor() as cursor:
+                cursor.execute(f"SELECT MIN(data) FROM {TABLE}")
+                first = cursor.fetchone()[0]
+            if isinstance(first, str):
+                first = datetime.fromisoformat(first)
+            create_table(conn, NEW_TABLE, first or date.today(), months_ahead)
+
+    columns = [c for c in COPY_COLUMNS if c in names]
+    if not renamed:
+        print(f"▶ {TABLE} → {NEW_TABLE} 복사 시작 (pk={pk}, chunk={chunk})")
+        _copy_chunks(pool, TABLE, NEW_TABLE, pk, columns, chunk, "copy")
+        # 복사하는 동안 들어온 행까지 따라잡은 뒤 원자적으로 이름을 바꾼다
+        with pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(f"RENAME TABLE {TABLE} TO {OLD_TABLE}, {NEW_TABLE} TO {TABLE}")
+            conn.commit()
+        print("▶ RENAME 완료, 그 사이 들어온 행 정리")
+    _copy_chunks(pool, OLD_TABLE, TABLE, pk, columns, chunk, "copy")
+    print(f"✅ 이전 완료. 확인 후 'DROP TABLE {OLD_TABLE}' 하세요")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="final_data 스키마 관리")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("create")
+    mg = sub.add_parser("migrate")
+    mg.add_argument("--chunk", type=int, default=5000)
+    pt = sub.add_parser("partitions")
+    pt.add_argument("--ahead", type=int, default=3)
+    dp = sub.add_parser("drop-before")
+    dp.add_argument("month", type=lambda s: datetime.strptime(s, "%Y-%m").date())
+    for p in sub.choices.values():
+        add_db_args(p)
+    args = parser.parse_args()
+
+    pool = ConnectionPool(db_config_from_args(args), size=1)
+    try:
+        if args.command == "migrate":
+            migrate(pool, args.chunk)
+            return
+        with pool.connection() as conn:
+            if args.command == "create":
+                create_table(conn)
+                print(f"✅ {TABLE} 준비 완료")
+            elif args.command == "partitions":
+                print("✅ 추가된 파티션:", ensure_partitions(conn, months_ahead=args.ahead) or "없음")
+            elif args.command == "drop-before":
+                print("✅ 삭제된 파티션:", drop_partitions_before(conn, args.month) or "없음")
+    finally:
+        pool.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+"""final_data 저장용 DB 커넥션 풀과 백그라운드 writer.
+
+MQTT 콜백은 submit() 으로 큐에 넣고 바로 돌아가고,
+실제 INSERT 는 소수의 writer 스레드가 저장소(storage.py)에 batch 로 처리한다.
+"""
+import queue
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+import pymysql
+
+# --- 기본 DB 설정 (ex1-8.py 와 같은 값, CLI 도구용) ---
+DB_CONFIG = {
+    "host": "localhost",
+    "user": "arduino",
+    "password": "123f5678",
+    "database": "python1"
+}
+
+
+def add_db_args(parser):
+    """argparse 에 --host/--user/--password/--database 옵션을 추가한다."""
+    for key, value in DB_CONFIG.items():
+        parser.add_argument(f"--{key}", default=value)
+
+
+def db_config_from_args(args):
+    return {key: getattr(args, key) for key in DB_CONFIG}
+
+
+# --- 테이블 설정 ---
+TABLE = "final_data"
+# device_id 는 맨 뒤: 그 전에 spool 에 쌓인 5개짜리 행도 "" 를 붙여서 그대로 넣을 수 있다
+ROW_COLUMNS = ("rotary", "temp", "humi", "data", "sample_key", "device_id")
+# sample_key 가 UNIQUE 라서 같은 샘플을 다시 넣어도 중복 행이 생기지 않는다
+INSERT_SQL = (
+    "INSERT INTO {table} ({cols}) VALUES ({marks}) "
+    "ON DUPLICATE KEY UPDATE sample_key = sample_key"
+).format(
+    table=TABLE,
+    cols=", ".join(ROW_COLUMNS),
+    marks=", ".join(["%s"] * len(ROW_COLUMNS)),
+)
+
+
+def make_row(rotary, temp, humi, when=None, device_id=""):
+    """ROW_COLUMNS 순서의 행 튜플 (수신 시각 + 고유 sample_key + 장치 id)."""
+    when = when or datetime.now()
+    return (rotary, temp, humi,
+            when.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3],
+            uuid.uuid4().hex, device_id)
+
+
+def pad_row(row):
+    """예전 형식(컬럼이 모자란) 행에 기본값을 채운다 (device_id 없음 → "")."""
+    row = tuple(row)
+    return row + ("",) * (len(ROW_COLUMNS) - len(row))
+
+
+def ensure_schema(pool):
+    """기존 final_data 에 sample_key(UNIQUE)/device_id 컬럼이 없으면 추가한다."""
+    with pool.connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT COLUMN_NAME FROM information_schema.COLUMNS "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s", (TABLE,))
+            existing = {name for (name,) in cursor.fetchall()}
+            if "sample_key" not in existing:
+                cursor.execute(
+                    f"ALTER TABLE {TABLE} ADD COLUMN sample_key CHAR(32) NULL, "
+                    "ADD UNIQUE KEY uq_sample_key (sample_key)")
+            if "device_id" not in existing:
+                cursor.execute(
+                    f"ALTER TABLE {TABLE} ADD COLUMN device_id VARCHAR(32) NOT NULL DEFAULT '', "
+                    "ADD KEY idx_device_time (device_id, data)")
+        conn.commit()
+
+
+# --- 커넥션 풀 ---
+class ConnectionPool:
+    """pymysql 커넥션을 최대 size 개까지 만들어 재사용한다."""
+
+    def __init__(self, db_config, size=2, ping_interval=30.0):
+        self.db_config = db_config
+        self.size = size
+        self.ping_interval = ping_interval
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._closed = False
+
+    def _connect(self):
+        return pymysql.connect(**self.db_config)
+
+    def acquire(self, timeout=None):
+        while True:
+            try:
+                conn, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._create_or_wait(timeout)
+                if conn is not None:
+                    return conn
+                conn, last_used = self._idle.get(timeout=timeout)
+
+            # 오래 놀던 커넥션은 ping 으로 확인 (끊겼으면 재연결)
+            if time.monotonic() - last_used < self.ping_interval:
+                return conn
+            try:
+                conn.ping(reconnect=True)
+                return conn
+            except Exception:
+                self._discard(conn)
+
+    def _create_or_wait(self, timeout):
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("커넥션 풀이 닫혔습니다")
+            if self._created >= self.size:
+                return None
+            self._created += 1
+        try:
+            return self._connect()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    def release(self, conn, broken=False):
+        if broken or self._closed:
+            self._discard(conn)
+        else:
+            self._idle.put((conn, time.monotonic()))
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._created -= 1
+
+    @contextmanager
+    def connection(self, timeout=None):
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        except pymysql.err.OperationalError:
+            self.release(conn, broken=True)
+            raise
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                self.release(conn, broken=True)
+                raise
+            self.release(conn)
+            raise
+        else:
+            self.release(conn)
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+
+# --- 백그라운드 writer ---
+class DBWriter:
+    """제한된 크기의 큐에서 행을 모아 여러 행 INSERT 로 저장하는 writer.
+
+    batch_size 행이 모이거나 첫 행이 들어온 뒤 flush_interval 초가 지나면
+    (먼저 오는 쪽) 한 트랜잭션으로 flush 한다.
+    storage 는 write_batch(rows)/ensure_schema() 를 가진 저장소 (storage.py 의 MariaDB/SQLite).
+    ensure_schema 는 첫 저장 전과 연결 오류/스키마 오류 뒤에, 그리고 schema_interval 초마다
+    writer 가 다시 돌린다 (오래 켜 둔 게이트웨이도 다음 달 파티션을 미리 만들도록).
+    spool 을 주면 DB 가 죽었을 때 행을 로컬 spool 에 쌓고,
+    replay 스레드가 DB 가 돌아온 뒤 순서대로 다시 넣는다.
+    큐가 가득 차면 submit 은 (호출한 스레드에서 디스크를 건드리지 않게) 행을 버리고 센다.
+    """
+
+    def __init__(self, storage, workers=1, maxsize=1000, batch_size=200,
+                 flush_interval=0.5, retries=1, spool=None,
+                 replay_batch=500, replay_max_rate=2000, schema_interval=86400.0):
+        self.storage = storage
+        self.spool = spool
+        self.replay_batch = replay_batch
+        self.replay_max_rate = replay_max_rate
+        self.workers = workers
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retries = retries
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.dropped = 0
+        self.written = 0
+        self.errors = 0
+        self.stats = {
+            "batches": 0,
+            "last_batch_size": 0,
+            "max_batch_size": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+            "total_flush_ms": 0.0,
+        }
+        self._stats_lock = threading.Lock()
+        self._schema_lock = threading.Lock()
+        self.schema_interval = schema_interval
+        self._schema_checked = None  # 마지막 ensure_schema 시각 (None 이면 다음 저장 전에 확인)
+        self._threads = []
+        self._replayer = None
+        self._stopping = threading.Event()
+
+    def start(self):
+        for i in range(self.workers):
+            t = threading.Thread(target=self._run, name=f"db-writer-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        if self.spool is not None:
+            self._replayer = threading.Thread(target=self._replay, name="db-replay", daemon=True)
+            self._replayer.start()
+        return self
+
+    def submit(self, row):
+        """행을 큐에 넣는다. 큐가 가득 차면 버리고 False.
+
+        spool 은 writer 스레드만 쓴다: 여기서 spool 에 넣으면 큐에 남은 (더 오래된) 행보다
+        먼저 들어가 순서가 깨지고, 호출한 스레드(MQTT 콜백)가 디스크 쓰기를 기다린다.
+        """
+        try:
+            self.queue.put_nowait(row)
+            return True
+        except queue.Full:
+            with self._stats_lock:
+                self.dropped += 1
+            return False
+
+    def _run(self):
+        batch = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                row = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                row = False  # 시간 초과 → flush
+
+            if row is None:
+                # 종료 신호: 남은 행을 마지막으로 flush
+                if batch:
+                    self._flush(batch)
+                break
+            if row is not False:
+                if not batch:
+                    deadline = time.monotonic() + self.flush_interval
+                batch.append(row)
+                if len(batch) < self.batch_size:
+                    continue
+            if batch:
+                self._flush(batch)
+            batch = []
+            deadline = None
+
+    def _ensure_schema(self):
+        if self._schema_fresh():
+            return
+        with self._schema_lock:
+            if not self._schema_fresh():
+                self.storage.ensure_schema()
+                self._schema_checked = time.monotonic()
+
+    def _schema_fresh(self):
+        checked = self._schema_checked
+        return checked is not None and time.monotonic() - checked < self.schema_interval
+
+    def _flush(self, batch):
+        # spool 에 밀린 행이 있으면 순서를 지키려고 새 행도 뒤에 붙인다
+        if self.spool is not None and self.spool.pending:
+            self.spool.append(batch)
+            return
+        started = time.perf_counter()
+        for attempt in range(self.retries + 1):
+            try:
+                self._ensure_schema()
+                self.storage.write_batch(batch)
+                break
+            except Exception as e:
+                schema_error = self.storage.is_schema_error(e)
+                transient = isinstance(e, self.storage.transient_errors) and not schema_error
+                if transient or schema_error:
+                    # 끊긴 커넥션은 풀에서 버려졌으니 새 커넥션으로 스키마부터 다시 확인하고 한 번 더
+                    self._schema_checked = None
+                    if attempt < self.retries:
+                        continue
+                print(f"❌ DB 저장 오류: {e}")
+                # 스키마 오류는 다시 넣어도 실패하므로 spool 에 쌓지 않는다
+                if transient and self.spool is not None:
+                    self.spool.append(batch)
+                else:
+                    self.errors += len(batch)
+                return
+        self._record(len(batch), (time.perf_counter() - started) * 1000)
+
+    def _replay(self):
+        """spool 에 쌓인 행을 오래된 것부터 묶어서 다시 INSERT 한다."""
+        backoff = 1.0
+        while not self._stopping.is_set():
+            entries = self.spool.peek(self.replay_batch)
+            if not entries:
+                self._stopping.wait(1.0)
+                continue
+            started = time.perf_counter()
+            try:
+                self._ensure_schema()
+                self.storage.write_batch([pad_row(row) for _, row in entries])
+            except Exception as e:
+                if self.storage.is_schema_error(e) or isinstance(e, self.storage.transient_errors):
+                    self._schema_checked = None
+                print(f"❌ spool 재전송 실패 ({backoff:.0f}초 후 재시도): {e}")
+                self._stopping.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+                continue
+            backoff = 1.0
+            self.spool.ack(entries[-1][0])
+            elapsed = time.perf_counter() - started
+            self.spool.record_replay(len(entries), elapsed)
+            # 재전송 속도 제한 (실시간 INSERT 와 DB 를 나눠 쓰도록)
+            min_time = len(entries) / self.replay_max_rate
+            if elapsed < min_time:
+                self._stopping.wait(min_time - elapsed)
+
+    def _record(self, size, elapsed_ms):
+        with self._stats_lock:
+            self.written += size
+            st = self.stats
+            st["batches"] += 1
+            st["last_batch_size"] = size
+            st["max_batch_size"] = max(st["max_batch_size"], size)
+            st["last_flush_ms"] = elapsed_ms
+            st["max_flush_ms"] = max(st["max_flush_ms"], elapsed_ms)
+            st["total_flush_ms"] += elapsed_ms
+
+    def snapshot(self):
+        """카운터 사본 (평균 batch 크기/flush 시간 포함)."""
+        with self._stats_lock:
+            st = dict(self.stats)
+            st["rows"] = self.written
+        batches = st["batches"] or 1
+        st["avg_batch_size"] = st["rows"] / batches
+        st["avg_flush_ms"] = st["total_flush_ms"] / batches
+        st["queued"] = self.queue.qsize()
+        st["dropped"] = self.dropped
+        st["errors"] = self.errors
+        if self.spool is not None:
+            st["spool"] = self.spool.snapshot()
+        return st
+
+    def stop(self, timeout=5.0):
+        """남은 큐를 flush 한 뒤 writer 스레드를 종료한다."""
+        for _ in self._threads:
+            self.queue.put(None)
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+        self._stopping.set()
+        if self._replayer is not None:
+            self._replayer.join(timeout)
+            self._replayer = None
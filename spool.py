@@ -0,0 +1,101 @@
+"""DB 가 죽었을 때 센서 행을 잠시 쌓아두는 로컬 SQLite spool.
+
+행은 들어온 순서대로 seq 가 붙고, replay 쪽에서 peek() 로 꺼내
+DB 에 넣은 뒤 ack() 로 지운다. 한 번의 append 가 한 트랜잭션이라
+fsync 는 batch 단위로만 일어난다 (WAL + synchronous=NORMAL).
+"""
+import json
+import sqlite3
+import threading
+import time
+
+
+class Spool:
+    def __init__(self, path="sensor_spool.db", max_rows=500000):
+        self.path = path
+        self.max_rows = max_rows
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS spool ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, row TEXT NOT NULL)")
+        self.pending = self._conn.execute("SELECT COUNT(*) FROM spool").fetchone()[0]
+        self.spooled = 0
+        self.replayed = 0
+        self.dropped = 0
+        self._replay_time = 0.0
+
+    def append(self, rows):
+        """행 여러 개를 한 트랜잭션으로 추가한다. 한도를 넘으면 가장 오래된 행을 버린다."""
+        data = [(json.dumps(list(row)),) for row in rows]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany("INSERT INTO spool (row) VALUES (?)", data)
+            self.pending += len(data)
+            overflow = self.pending - self.max_rows
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM spool WHERE seq IN "
+                    "(SELECT seq FROM spool ORDER BY seq LIMIT ?)", (overflow,))
+                self.pending -= overflow
+                self.dropped += overflow
+            self._conn.execute("COMMIT")
+            self.spooled += len(data)
+        if overflow > 0:
+            print(f"❌ spool 한도 초과: 오래된 행 {overflow}개를 버렸습니다")
+
+    def peek(self, limit):
+        """가장 오래된 행부터 (seq, row) 목록을 돌려준다 (지우지 않음)."""
+        with self._lock:
+            cur = self._conn.execute(
+                "SELECT seq, row FROM spool ORDER BY seq LIMIT ?", (limit,))
+            return [(seq, tuple(json.loads(row))) for seq, row in cur]
+
+    def ack(self, last_seq):
+        """last_seq 까지의 행을 DB 에 넣었으니 지운다."""
+        with self._lock:
+            cur = self._conn.execute("DELETE FROM spool WHERE seq <= ?", (last_seq,))
+            self.pending -= cur.rowcount
+
+    def record_replay(self, rows, elapsed):
+        with self._lock:
+            self.replayed += rows
+            self._replay_time += elapsed
+
+    def snapshot(self):
+        with self._lock:
+            rate = self.replayed / self._replay_time if self._replay_time else 0.0
+            return {
+                "pending": self.pending,
+                "spooled": self.spooled,
+                "replayed": self.replayed,
+                "dropped": self.dropped,
+                "replay_rows_per_sec": rate,
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+if __name__ == "__main__":
+    # 간단한 처리량 확인: python spool.py
+    import os
+    import tempfile
+
+    path = os.path.join(tempfile.mkdtemp(), "bench_spool.db")
+    spool = Spool(path, max_rows=100000)
+    rows = [(i, 24.0, 40.0, "2025-01-01 00:00:00.000", f"{i:032x}") for i in range(200)]
+    started = time.perf_counter()
+    for _ in range(250):
+        spool.append(rows)
+    elapsed = time.perf_counter() - started
+    print(f"append: {spool.spooled / elapsed:,.0f} rows/s")
+    started = time.perf_counter()
+    while spool.pending:
+        batch = spool.peek(500)
+        spool.ack(batch[-1][0])
+    print(f"peek+ack: {spool.spooled / (time.perf_counter() - started):,.0f} rows/s")
+    spool.close()
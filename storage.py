@@ -0,0 +1,249 @@
+"""final_data 저장소 백엔드: MariaDB(pymysql) 또는 내장 SQLite(WAL).
+
+DBWriter 는 write_batch() 만 부르므로 설정으로 백엔드를 고를 수 있다.
+
+    storage = open_storage({"backend": "mariadb", **DB_CONFIG})
+    storage = open_storage({"backend": "sqlite", "path": "final_data.db"})
+
+벤치마크 (초당 INSERT 수와 RSS 비교):
+    python storage.py --rows 50000 --batch 200 [--mariadb]
+"""
+import sqlite3
+import threading
+import time
+
+import pymysql
+
+from schema import ensure_partitions, list_partitions
+from sensor_db import INSERT_SQL, ROW_COLUMNS, TABLE, ConnectionPool, ensure_schema
+
+
+# --- MariaDB ---
+class MariaDBStorage:
+    name = "mariadb"
+    transient_errors = (pymysql.err.OperationalError,)
+
+    def __init__(self, db_config, pool_size=2):
+        self.pool = ConnectionPool(db_config, size=pool_size)
+
+    def ensure_schema(self):
+        ensure_schema(self.pool)
+        # schema.py 의 월 파티션 테이블이면 앞으로 쓸 달의 파티션을 미리 만든다
+        # (없으면 새 행이 전부 pmax 에 쌓여서 drop-before 로 지울 수 없게 된다)
+        try:
+            with self.pool.connection() as conn:
+                if list_partitions(conn):
+                    added = ensure_partitions(conn)
+                    if added:
+                        print(f"✅ 파티션 추가: {', '.join(added)}")
+        except pymysql.err.MySQLError as e:
+            # ALTER 권한이 없어도 저장은 계속한다 (python schema.py partitions 로 직접)
+            print(f"❌ 파티션 확인 실패: {e}")
+
+    @staticmethod
+    def is_schema_error(e):
+        # 1054 Unknown column: pymysql 은 OperationalError 로 내지만 다시 해도 안 되는 오류
+        return isinstance(e, pymysql.err.MySQLError) and bool(e.args) and e.args[0] == 1054
+
+    def write_batch(self, rows):
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                # pymysql 은 INSERT ... VALUES 를 여러 행 VALUES 하나로 묶어 보낸다
+                cursor.executemany(INSERT_SQL, rows)
+            conn.commit()
+
+    def query_range(self, start, end, device_id=None):
+        sql = (f"SELECT data, rotary, temp, humi FROM {TABLE} "
+               f"WHERE data >= %s AND data < %s")
+        args = [start, end]
+        if device_id is not None:
+            sql += " AND device_id = %s"
+            args.append(device_id)
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(sql + " ORDER BY data", args)
+                return cursor.fetchall()
+
+    def close(self):
+        self.pool.close()
+
+
+# --- SQLite (WAL) ---
+class SQLiteStorage:
+    """라즈베리파이 단독 로깅용 내장 저장소.
+
+    WAL + synchronous=NORMAL 이라 batch 트랜잭션마다 fsync 하지 않고,
+    같은 SQL 문자열을 계속 쓰므로 sqlite3 의 prepared statement 캐시를 재사용한다.
+    WAL 파일이 커지지 않도록 checkpoint_interval 초마다 PASSIVE checkpoint 를 한다.
+    """
+    name = "sqlite"
+    transient_errors = (sqlite3.OperationalError,)  # database is locked 등
+
+    INSERT = "INSERT OR IGNORE INTO {table} ({cols}) VALUES ({marks})".format(
+        table=TABLE,
+        cols=", ".join(ROW_COLUMNS),
+        marks=", ".join(["?"] * len(ROW_COLUMNS)),
+    )
+
+    def __init__(self, path="final_data.db", checkpoint_interval=60.0):
+        self.path = path
+        self.checkpoint_interval = checkpoint_interval
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False,
+                                     isolation_level=None, cached_statements=64)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA wal_autocheckpoint=0")  # checkpoint 는 직접
+        self._last_checkpoint = time.monotonic()
+
+    def ensure_schema(self):
+        # schema.py 의 MariaDB 테이블과 같은 컬럼 (파티션 대신 시간 인덱스)
+        with self._lock:
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {TABLE} ("
+                f"id INTEGER PRIMARY KEY, "
+                f"device_id TEXT NOT NULL DEFAULT '', "
+                f"rotary INTEGER NOT NULL, temp REAL NOT NULL, humi REAL NOT NULL, "
+                f"data TEXT NOT NULL, sample_key TEXT UNIQUE)")
+            self._conn.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_device_time ON {TABLE} (device_id, data)")
+
+    @staticmethod
+    def is_schema_error(e):
+        # no such table / has no column named ...: database is locked 와 같은 OperationalError 라서 메시지로 구분
+        return isinstance(e, sqlite3.OperationalError) and ("no such" in str(e) or "has no column" in str(e))
+
+    def write_batch(self, rows):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(self.INSERT, rows)
+                self._conn.execute("COMMIT")
+            except Exception:
+                # COMMIT 이 실패해도 (database is locked) 트랜잭션을 닫아야 재시도의 BEGIN 이 된다
+                if self._conn.in_transaction:
+                    try:
+                        self._conn.execute("ROLLBACK")
+                    except sqlite3.Error:
+                        pass
+                raise
+            if time.monotonic() - self._last_checkpoint >= self.checkpoint_interval:
+                self._conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+                self._last_checkpoint = time.monotonic()
+
+    def query_range(self, start, end, device_id=None):
+        sql = (f"SELECT data, rotary, temp, humi FROM {TABLE} "
+               f"WHERE data >= ? AND data < ?")
+        args = [str(start), str(end)]
+        if device_id is not None:
+            sql += " AND device_id = ?"
+            args.append(device_id)
+        with self._lock:
+            return self._conn.execute(sql + " ORDER BY data", args).fetchall()
+
+    def close(self):
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self._conn.close()
+
+
+def open_storage(config):
+    """config["backend"] 에 따라 저장소를 만든다. 나머지 키는 백엔드 옵션."""
+    options = dict(config)
+    backend = options.pop("backend", "mariadb")
+    if backend == "mariadb":
+        pool_size = int(options.pop("pool_size", 2))
+        return MariaDBStorage(options, pool_size=pool_size)
+    if backend == "sqlite":
+        return SQLiteStorage(options.get("path", "final_data.db"),
+                             float(options.get("checkpoint_interval", 60.0)))
+    raise ValueError(f"알 수 없는 저장소: {backend}")
+
+
+# --- 벤치마크 ---
+def _rss_kb(pid="self"):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def _server_rss_kb():
+    """로컬 MariaDB 서버 프로세스 RSS (찾지 못하면 0)."""
+    import os
+    for pid in os.listdir("/proc"):
+        if not pid.isdigit():
+            continue
+        try:
+            with open(f"/proc/{pid}/comm") as f:
+                if f.read().strip() in ("mariadbd", "mysqld"):
+                    return _rss_kb(pid)
+        except OSError:
+            continue
+    return 0
+
+
+def _bench_one(config, rows, batch):
+    import json
+    import resource
+
+    from sensor_db import make_row
+
+    storage = open_storage(config)
+    storage.ensure_schema()
+    data = [make_row(i % 4096, 20.0 + i % 10, 40.0 + i % 7) for i in range(rows)]
+    started = time.perf_counter()
+    for k in range(0, rows, batch):
+        storage.write_batch(data[k:k + batch])
+    elapsed = time.perf_counter() - started
+    storage.close()
+    print(json.dumps({
+        "backend": config["backend"],
+        "rows_per_sec": rows / elapsed,
+        "client_max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "server_rss_kb": _server_rss_kb() if config["backend"] == "mariadb" else 0,
+    }))
+
+
+def main():
+    import argparse
+    import json
+    import os
+    import subprocess
+    import sys
+    import tempfile
+
+    from sensor_db import DB_CONFIG
+
+    parser = argparse.ArgumentParser(description="저장소 백엔드 벤치마크")
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--batch", type=int, default=200)
+    parser.add_argument("--mariadb", action="store_true", help="로컬 MariaDB 도 측정")
+    parser.add_argument("--run", help=argparse.SUPPRESS)  # 자식 프로세스용 JSON 설정
+    args = parser.parse_args()
+
+    if args.run:
+        _bench_one(json.loads(args.run), args.rows, args.batch)
+        return
+
+    configs = [{"backend": "sqlite", "path": os.path.join(tempfile.mkdtemp(), "bench.db")}]
+    if args.mariadb:
+        configs.append({"backend": "mariadb", **DB_CONFIG})
+    # 백엔드마다 새 프로세스에서 돌려야 RSS 를 따로 잴 수 있다
+    for config in configs:
+        out = subprocess.run(
+            [sys.executable, __file__, "--rows", str(args.rows), "--batch", str(args.batch),
+             "--run", json.dumps(config)],
+            capture_output=True, text=True, check=True).stdout
+        r = json.loads(out.strip().splitlines()[-1])
+        print(f"{r['backend']:8s} {r['rows_per_sec']:>10,.0f} rows/s  "
+              f"client RSS {r['client_max_rss_kb'] / 1024:.1f} MB  "
+              f"server RSS {r['server_rss_kb'] / 1024:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
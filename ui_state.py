@@ -0,0 +1,83 @@
+"""Tk 대시보드용 상태 저장소와 고정 주기 화면 갱신.
+
+MQTT 스레드는 state.set()/update() 로 값만 바꾸고 (Tk 호출 없음),
+Tk 스레드의 UiRefresher 가 fps 주기로 바뀐 키만 다시 그린다.
+메시지가 아무리 빨리 와도 한 tick 에 키마다 최신 값 한 번만 그리므로
+중간 상태는 자연스럽게 버려지고 화면 갱신 비용은 일정하다.
+
+    ui = UiState(temp=0.0, relay=False)
+    refresher = UiRefresher(root, ui, fps=20)
+    refresher.bind("temp", lambda v: temp_label.config(text=f"{v:.1f} ℃"))
+    refresher.start()
+"""
+import threading
+
+
+class UiState:
+    def __init__(self, **initial):
+        self._lock = threading.Lock()
+        self._values = dict(initial)
+        self._dirty = set(initial)  # 처음 tick 에 한 번은 모두 그린다
+
+    def set(self, key, value):
+        with self._lock:
+            if key in self._values and self._values[key] == value:
+                return
+            self._values[key] = value
+            self._dirty.add(key)
+
+    def update(self, **values):
+        with self._lock:
+            for key, value in values.items():
+                if key in self._values and self._values[key] == value:
+                    continue
+                self._values[key] = value
+                self._dirty.add(key)
+
+    def get(self, key, default=None):
+        with self._lock:
+            return self._values.get(key, default)
+
+    def take_dirty(self):
+        """지난 tick 이후 바뀐 키의 최신 값만 돌려주고 dirty 표시를 지운다."""
+        with self._lock:
+            if not self._dirty:
+                return {}
+            changed = {key: self._values[key] for key in self._dirty}
+            self._dirty.clear()
+            return changed
+
+
+class UiRefresher:
+    def __init__(self, root, state, fps=20):
+        self.root = root
+        self.state = state
+        self.interval = max(1, int(1000 / fps))
+        self._renders = {}
+        self._hooks = []
+        self._job = None
+
+    def bind(self, key, render):
+        """key 값이 바뀐 tick 에 render(value) 를 부른다."""
+        self._renders.setdefault(key, []).append(render)
+
+    def every_tick(self, hook):
+        """매 tick 마다 부를 함수 (모아둔 로그를 한 번에 넣는 등)."""
+        self._hooks.append(hook)
+
+    def _tick(self):
+        for key, value in self.state.take_dirty().items():
+            for render in self._renders.get(key, ()):
+                render(value)
+        for hook in self._hooks:
+            hook()
+        self._job = self.root.after(self.interval, self._tick)
+
+    def start(self):
+        self._job = self.root.after(self.interval, self._tick)
+        return self
+
+    def stop(self):
+        if self._job is not None:
+            self.root.after_cancel(self._job)
+            self._job = None
@@ -0,0 +1,261 @@
+"""카메라 → 디코드 → YOLO → 화면을 단계별 스레드로 나눈 파이프라인.
+
+    camera = CameraStream(url).start()
+    pipeline = VisionPipeline(camera.slot, decode, infer).start()
+    while True:
+        item = pipeline.get(timeout=1.0)     # 가장 최신 추론 결과 (없으면 None)
+        if item is None:
+            continue
+        ... item.image 위에 item.result 를 그린다 ...
+        cv2.imshow("RGB", item.image)
+        pipeline.displayed(item)             # 받은 시각 → 화면 지연 기록
+
+capture(CameraStream 리더) → decode → infer → render(호출한 스레드, imshow 는 메인 스레드)
+단계 사이는 LatestSlot (값 하나짜리 칸) 이라서 각 단계는 항상 가장 최신 입력을 가져가고
+다음 단계가 아직 못 가져간 값은 새 값으로 덮어서 버린다. 그래서 추론이 카메라보다
+느려도 큐가 쌓이지 않고 지연은 (디코드 + 추론 + 그리기) 정도로 묶인다.
+decode 단계는 infer 가 다음 프레임을 기다릴 때에만 가장 최신 JPEG 를 꺼내 디코드한다
+(버려질 프레임은 디코드하지 않음, frame_decode.py). 나머지 시간에 capture 와 infer 는 겹쳐서 돈다
+(cv2.imdecode 와 YOLO(torch) 는 GIL 을 놓고 돈다).
+
+snapshot(): 단계별 처리 수/버린 수/평균 시간(ms), 받은 시각 → 화면 지연 p50/p95/max.
+벤치마크 (카메라/YOLO 없이 sleep 으로 흉내): python vision_pipeline.py
+"""
+import threading
+import time
+from collections import deque
+
+from camera_stream import LatestSlot
+
+
+class Frame:
+    __slots__ = ("seq", "captured", "image", "result")
+
+    def __init__(self, seq, captured, image, result=None):
+        self.seq = seq
+        self.captured = captured  # time.monotonic(), 카메라 프레임을 다 받은 시각
+        self.image = image
+        self.result = result
+
+
+class _Stage:
+    def __init__(self, name, fn, source, sink, on_demand=False):
+        self.name = name
+        self.fn = fn
+        self.source = source
+        self.sink = sink
+        self.on_demand = on_demand  # 다음 단계가 기다릴 때만 입력을 꺼낸다
+        self.processed = 0
+        self.failed = 0
+        self.busy = 0.0  # fn 에 쓴 시간 (초)
+        self.thread = None
+
+    def run(self, stopping):
+        while not stopping.is_set():
+            if self.on_demand and not self.sink.wait_for_taker(timeout=0.5):
+                continue
+            item = self.source.get(timeout=0.5)
+            if item is None:
+                continue
+            started = time.perf_counter()
+            try:
+                out = self.fn(item)
+            except Exception as e:
+                self.failed += 1
+                if self.failed <= 10:
+                    print(f"❌ {self.name} 단계 오류: {e}")
+                continue
+            finally:
+                self.busy += time.perf_counter() - started
+            if out is not None:
+                self.processed += 1
+                self.sink.put(out)
+
+
+class VisionPipeline:
+    LATENCY_WINDOW = 1000  # 지연 통계는 최근 이만큼의 프레임으로
+
+    def __init__(self, source, decode, infer, decode_on_demand=True):
+        """source 는 (받은 시각, jpg) 를 내는 LatestSlot (CameraStream.slot).
+        decode(jpg) → 이미지 (None 이면 버림), infer(이미지) → 결과.
+        decode_on_demand=False 면 들어오는 프레임마다 미리 디코드한다 (디코드가 추론만큼 느릴 때).
+        이때 decode 는 부를 때마다 새 이미지를 돌려줘야 한다: 출력 버퍼를 돌려 쓰는
+        FrameDecoder.decode 는 추론/그리는 중인 프레임을 덮어쓰므로 .copy() 해서 돌려준다."""
+        self.source = source
+        self._seq = 0
+        self.decoded = LatestSlot()
+        self.inferred = LatestSlot()
+        self._stages = [
+            _Stage("decode", self._decode_fn(decode), source, self.decoded, decode_on_demand),
+            _Stage("infer", self._infer_fn(infer), self.decoded, self.inferred),
+        ]
+        self._stopping = threading.Event()
+        self._latency = deque(maxlen=self.LATENCY_WINDOW)
+        self.rendered = 0
+
+    def _decode_fn(self, decode):
+        def run(item):
+            captured, jpg = item
+            image = decode(jpg)
+            if image is None:
+                return None
+            self._seq += 1
+            return Frame(self._seq, captured, image)
+        return run
+
+    @staticmethod
+    def _infer_fn(infer):
+        def run(frame):
+            frame.result = infer(frame.image)
+            return frame
+        return run
+
+    # --- 그리기 (호출한 스레드) ---
+    def get(self, timeout=None):
+        """추론이 끝난 가장 최신 Frame (timeout 안에 없으면 None)."""
+        return self.inferred.get(timeout)
+
+    def displayed(self, frame):
+        """frame 을 화면에 띄웠음 (받은 시각 → 지금 지연을 기록)."""
+        self.rendered += 1
+        self._latency.append(time.monotonic() - frame.captured)
+
+    # --- 통계 ---
+    def snapshot(self):
+        slots = {"capture": self.source, "decode": self.decoded, "infer": self.inferred}
+        st = {}
+        for stage in self._stages:
+            st[stage.name] = {
+                "processed": stage.processed,
+                "failed": stage.failed,
+                "avg_ms": stage.busy / max(1, stage.processed + stage.failed) * 1000,
+            }
+        st["render"] = {"processed": self.rendered}
+        # X 단계 dropped = X 가 내놓았지만 다음 단계가 가져가기 전에 더 새 값으로 덮인 수
+        for name, slot in slots.items():
+            st.setdefault(name, {})["dropped"] = slot.dropped
+        st["capture"]["frames"] = self.source.puts
+        latencies = sorted(self._latency)
+        if latencies:
+            st["latency_ms"] = {
+                "p50": latencies[len(latencies) // 2] * 1000,
+                "p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000,
+                "max": latencies[-1] * 1000,
+            }
+        return st
+
+    def report(self):
+        st = self.snapshot()
+        parts = [f"capture {st['capture']['frames']}(버림 {st['capture']['dropped']})"]
+        parts += [f"{name} {st[name]['processed']}(버림 {st[name]['dropped']})" for name in ("decode", "infer")]
+        parts.append(f"render {st['render']['processed']}")
+        line = "📦 " + " → ".join(parts)
+        if "latency_ms" in st:
+            lat = st["latency_ms"]
+            line += f"  지연 p50 {lat['p50']:.0f}ms p95 {lat['p95']:.0f}ms max {lat['max']:.0f}ms"
+        return line
+
+    def start(self):
+        for stage in self._stages:
+            stage.thread = threading.Thread(target=stage.run, args=(self._stopping,),
+                                            name=f"vision-{stage.name}", daemon=True)
+            stage.thread.start()
+        return self
+
+    def stop(self, timeout=2.0):
+        self._stopping.set()
+        self.decoded.close()
+        self.inferred.close()
+        for stage in self._stages:
+            if stage.thread is not None:
+                stage.thread.join(timeout)
+                stage.thread = None
+
+
+# --- 벤치마크 ---
+def _fake_camera(slot, fps, stopping, backlog=None):
+    """fps 로 프레임을 내는 가짜 카메라 (backlog 가 있으면 예전처럼 순서대로 쌓는 큐에도 넣는다)."""
+    interval = 1.0 / fps
+    next_at = time.monotonic()
+    while not stopping.is_set():
+        item = (time.monotonic(), b"jpg")
+        slot.put(item)
+        if backlog is not None:
+            backlog.append(item)
+        next_at += interval
+        time.sleep(max(0.0, next_at - time.monotonic()))
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="파이프라인 vs 한 스레드 루프 지연 비교")
+    parser.add_argument("--fps", type=float, default=20.0, help="카메라 fps")
+    parser.add_argument("--decode-ms", type=float, default=8.0)
+    parser.add_argument("--infer-ms", type=float, default=250.0, help="YOLO 한 번 시간 (Pi 는 수백 ms)")
+    parser.add_argument("--render-ms", type=float, default=5.0)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    args = parser.parse_args()
+
+    def decode(jpg):
+        time.sleep(args.decode_ms / 1000)
+        return jpg
+
+    def infer(image):
+        time.sleep(args.infer_ms / 1000)
+        return []
+
+    def percentiles(latencies):
+        latencies = sorted(latencies)
+        return (latencies[len(latencies) // 2] * 1000, latencies[int(len(latencies) * 0.95)] * 1000,
+                latencies[-1] * 1000)
+
+    print(f"카메라 {args.fps:.0f}fps, 디코드 {args.decode_ms:.0f}ms + 추론 {args.infer_ms:.0f}ms "
+          f"+ 그리기 {args.render_ms:.0f}ms, {args.seconds:.0f}초")
+
+    # 예전 방식: 연결 하나에서 순서대로 읽고 한 스레드에서 전부 (count % 3 으로 3장 중 1장만)
+    stopping = threading.Event()
+    backlog = deque()
+    threading.Thread(target=_fake_camera, args=(LatestSlot(), args.fps, stopping, backlog),
+                     daemon=True).start()
+    latencies, count, shown = [], 0, 0
+    deadline = time.monotonic() + args.seconds
+    while time.monotonic() < deadline:
+        if not backlog:
+            time.sleep(0.001)
+            continue
+        captured, jpg = backlog.popleft()
+        count += 1
+        if count % 3 != 0:
+            continue
+        infer(decode(jpg))
+        time.sleep(args.render_ms / 1000)
+        latencies.append(time.monotonic() - captured)
+        shown += 1
+    stopping.set()
+    p50, p95, worst = percentiles(latencies)
+    print(f"  한 스레드 (count % 3)  화면 {shown / args.seconds:5.1f}fps  지연 p50 {p50:6.0f}ms  "
+          f"p95 {p95:6.0f}ms  max {worst:6.0f}ms  (밀린 프레임 {len(backlog)})")
+
+    # 파이프라인 (프레임마다 미리 디코드 / infer 가 기다릴 때만 디코드)
+    for label, on_demand in (("파이프라인 (미리 디코드)", False), ("파이프라인 (필요할 때 디코드)", True)):
+        stopping = threading.Event()
+        slot = LatestSlot()
+        threading.Thread(target=_fake_camera, args=(slot, args.fps, stopping), daemon=True).start()
+        pipeline = VisionPipeline(slot, decode, infer, decode_on_demand=on_demand).start()
+        deadline = time.monotonic() + args.seconds
+        while time.monotonic() < deadline:
+            item = pipeline.get(timeout=0.5)
+            if item is None:
+                continue
+            time.sleep(args.render_ms / 1000)
+            pipeline.displayed(item)
+        stopping.set()
+        pipeline.stop()
+        p50, p95, worst = percentiles(pipeline._latency)
+        print(f"  {label:20s} 화면 {pipeline.rendered / args.seconds:5.1f}fps  지연 p50 {p50:6.0f}ms  "
+              f"p95 {p95:6.0f}ms  max {worst:6.0f}ms  디코드 {pipeline.snapshot()['decode']['processed']}장")
+        print("    " + pipeline.report())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,417 @@
+"""YOLO 추론을 워커 프로세스 N 개로 나눠 돌리는 풀.
+
+    pool = YoloPool("yolo11s.pt", workers=4, size=(640, 480)).start()   # 워커마다 모델 로드
+    seq = pool.submit(frame, camera="cam0")       # frame: 640x480 BGR uint8 (슬롯이 없으면 기다림)
+    det = pool.result("cam0", timeout=1.0)        # cam0 의 다음 결과 (submit 순서대로)
+    det.boxes                                     # (n, 7) float32: x1 y1 x2 y2 conf class track_id
+    det = pool.infer(frame, "cam0")               # submit + 그 결과를 기다림 (vision_pipeline 의 infer 용)
+    pool.close()
+
+- 프레임은 pickle 하지 않고 multiprocessing.shared_memory 의 슬롯(ring)에 한 번 복사해서 넘긴다.
+  작업 큐로는 (seq, camera, 슬롯 번호) 만 가고 결과도 (n, 7) 배열 하나라서 작다.
+  슬롯은 결과가 돌아오면 다시 쓴다 (다 차 있으면 submit 이 기다리거나 block=False 면 None).
+- track=True (model.track persist): 추적 상태가 카메라마다 이어져야 하므로 카메라는 처음 본
+  때 카메라가 가장 적은 워커에 붙고 그 뒤로 항상 같은 워커로 간다. 워커 안에서도 카메라마다
+  모델(추적기)을 따로 둔다.
+  track=False (predict): 가장 한가한 워커로 보내서 카메라 한 대도 여러 코어를 쓴다.
+- 결과는 워커가 끝낸 순서와 상관없이 카메라별 submit 순서로 돌려준다.
+- 워커 프로세스가 죽으면 (모델 로드 중이든 추론 중이든) start/submit/result/infer 가
+  RuntimeError 를 낸다 (죽은 워커에 간 프레임의 결과는 영영 안 오므로 기다리지 않는다).
+- 워커마다 torch 스레드를 (코어 수 / 워커 수) 로 묶어서 서로 코어를 뺏지 않게 한다.
+
+워커는 spawn 으로 띄우므로 이 모듈을 쓰는 스크립트는 if __name__ == "__main__": 안에서 시작해야 한다.
+벤치마크 (코어 수에 따른 fps): python yolo_pool.py --workers 1,2,4 --cameras 4
+"""
+import os
+import queue
+import threading
+import time
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+from typing import NamedTuple
+
+import numpy as np
+
+BOX = slice(0, 4)  # boxes 열: x1 y1 x2 y2
+CONF = 4
+CLASS = 5
+TRACK = 6  # 추적 id (추적 전이거나 track=False 면 -1)
+
+
+class Detections(NamedTuple):
+    camera: str
+    seq: int
+    boxes: np.ndarray  # (n, 7) float32
+    infer_ms: float
+    worker: int
+    error: str = ""
+
+
+# --- 워커 프로세스 ---
+def _to_array(result):
+    boxes = result.boxes
+    out = np.full((len(boxes), 7), -1, np.float32)
+    if len(boxes):
+        out[:, BOX] = boxes.xyxy.cpu().numpy()
+        out[:, CONF] = boxes.conf.cpu().numpy()
+        out[:, CLASS] = boxes.cls.cpu().numpy()
+        if boxes.id is not None:
+            out[:, TRACK] = boxes.id.cpu().numpy()
+    return out
+
+
+def _fake_infer(image, work):
+    """--fake-ms 벤치마크용: ultralytics 없이 정해진 양(work 번)의 계산을 한다 (시간이 아니라 일의 양)."""
+    for _ in range(work):
+        image[::8, ::8].sum()
+    return np.array([[10, 20, 110, 220, 0.9, 0, -1]], np.float32)
+
+
+def _worker(index, model_path, shm_name, shape, tasks, results, track, conf, threads, fake_work):
+    shm = SharedMemory(name=shm_name)
+    frames = np.ndarray(shape, np.uint8, buffer=shm.buf)
+    models = {}
+    if not fake_work:
+        import torch
+        from ultralytics import YOLO
+        torch.set_num_threads(threads)
+        models[None] = YOLO(model_path)
+    results.put(("ready", index))
+
+    def model_for(camera):
+        # 추적기는 모델 안에 있으므로 track 이면 카메라마다 모델 하나
+        key = camera if track else None
+        if key not in models:
+            models[key] = YOLO(model_path) if models.get(None) is None else models.pop(None)
+        return models[key]
+
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            seq, camera, slot = task
+            started = time.perf_counter()
+            error = ""
+            try:
+                if fake_work:
+                    boxes = _fake_infer(frames[slot], fake_work)
+                elif track:
+                    boxes = _to_array(model_for(camera).track(frames[slot], persist=True,
+                                                              conf=conf, verbose=False)[0])
+                else:
+                    boxes = _to_array(model_for(camera).predict(frames[slot], conf=conf, verbose=False)[0])
+            except Exception as e:
+                boxes = np.empty((0, 7), np.float32)
+                error = str(e)
+            results.put((seq, camera, slot, boxes, (time.perf_counter() - started) * 1000, index, error))
+    finally:
+        del frames
+        shm.close()
+
+
+# --- 풀 (부모 프로세스) ---
+class YoloPool:
+    def __init__(self, model_path="yolo11s.pt", workers=2, size=(640, 480), slots=None,
+                 track=True, conf=0.25, threads=None, fake_work=0):
+        self.model_path = model_path
+        self.workers = workers
+        self.size = size
+        self.slots = slots or workers * 2
+        self.track = track
+        self.conf = conf
+        self.threads = threads or max(1, (os.cpu_count() or 1) // workers)
+        self.fake_work = fake_work
+        self._ctx = get_context("spawn")  # fork 는 torch 스레드와 같이 쓰면 멈출 수 있다
+        self._shm = None
+        self._frames = None
+        self._free = queue.Queue()
+        self._tasks = []
+        self._results = None
+        self._procs = []
+        self._collector = None
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._seq = {}  # camera → 다음 submit seq
+        self._next = {}  # camera → 다음에 돌려줄 seq
+        self._done = {}  # camera → {seq: Detections} (순서를 기다리는 결과)
+        self._inflight = [0] * workers
+        self._affinity = {}  # camera → 워커 (track)
+        self._closing = False
+        self.failed = ""  # 죽은 워커 (비어 있으면 모두 살아 있음)
+        self.stats = {"submitted": 0, "completed": 0, "dropped": 0, "errors": 0,
+                      "total_infer_ms": 0.0, "per_worker": [0] * workers}
+
+    def _worker_of(self, camera):
+        if self.track:
+            worker = self._affinity.get(camera)
+            if worker is None:
+                counts = [0] * self.workers
+                for w in self._affinity.values():
+                    counts[w] += 1
+                worker = self._affinity[camera] = counts.index(min(counts))
+            return worker
+        return min(range(self.workers), key=self._inflight.__getitem__)
+
+    # --- 워커 감시 ---
+    def _dead_workers(self):
+        return ", ".join(f"{p.name} (exit {p.exitcode})" for p in self._procs if not p.is_alive())
+
+    def _check_workers(self):
+        dead = self._dead_workers()
+        if dead and not self._closing and not self.failed:
+            with self._cond:
+                self.failed = dead
+                self._cond.notify_all()
+            print(f"❌ YOLO 워커가 죽었습니다: {dead}")
+
+    def _raise_if_failed(self):
+        if self.failed:
+            raise RuntimeError(f"YOLO 워커가 죽었습니다: {self.failed}")
+
+    # --- 넣기 ---
+    def submit(self, frame, camera="cam0", block=True, timeout=None):
+        """frame 을 빈 슬롯에 복사해 워커에 넘긴다. 슬롯이 없어서 못 넣으면 None."""
+        if frame.shape != self._frames.shape[1:]:
+            raise ValueError(f"프레임 크기 {frame.shape} != {self._frames.shape[1:]}")
+        deadline = None if timeout is None else time.monotonic() + timeout
+        slot = None
+        while slot is None:
+            self._raise_if_failed()
+            # 워커가 죽어서 슬롯이 안 돌아오는 경우를 알아채도록 1초씩 나눠 기다린다
+            wait = 1.0 if deadline is None else min(1.0, deadline - time.monotonic())
+            try:
+                slot = self._free.get(block and wait > 0, max(0.0, wait))
+            except queue.Empty:
+                if not block or (deadline is not None and time.monotonic() >= deadline):
+                    with self._lock:
+                        self.stats["dropped"] += 1
+                    return None
+        np.copyto(self._frames[slot], frame)
+        with self._lock:
+            seq = self._seq.get(camera, 0)
+            self._seq[camera] = seq + 1
+            self._next.setdefault(camera, 0)
+            worker = self._worker_of(camera)
+            self._inflight[worker] += 1
+            self.stats["submitted"] += 1
+            # 같은 카메라의 seq 순서와 큐에 넣는 순서가 같도록 잠금 안에서 넣는다
+            self._tasks[worker].put((seq, camera, slot))
+        return seq
+
+    # --- 결과 ---
+    def _collect(self):
+        next_check = time.monotonic() + 1.0
+        while True:
+            if time.monotonic() >= next_check:
+                self._check_workers()
+                next_check = time.monotonic() + 1.0
+            try:
+                item = self._results.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            if item is None:
+                return
+            seq, camera, slot, boxes, infer_ms, worker, error = item
+            self._free.put(slot)
+            with self._cond:
+                self._inflight[worker] -= 1
+                st = self.stats
+                st["completed"] += 1
+                st["total_infer_ms"] += infer_ms
+                st["per_worker"][worker] += 1
+                if error:
+                    st["errors"] += 1
+                    if st["errors"] <= 10:
+                        print(f"❌ YOLO 워커 {worker} 오류 ({camera}): {error}")
+                self._done.setdefault(camera, {})[seq] = Detections(camera, seq, boxes, infer_ms, worker, error)
+                self._cond.notify_all()
+
+    def result(self, camera="cam0", timeout=None):
+        """camera 의 다음 결과 (submit 순서). timeout 안에 없으면 None, 워커가 죽었으면 RuntimeError."""
+        def ready():
+            return self._next.get(camera, 0) in self._done.get(camera, ())
+
+        with self._cond:
+            if not self._cond.wait_for(lambda: ready() or self.failed, timeout):
+                return None
+            if not ready():
+                self._raise_if_failed()
+            seq = self._next[camera]
+            self._next[camera] = seq + 1
+            return self._done[camera].pop(seq)
+
+    def infer(self, frame, camera="cam0", timeout=None):
+        """submit 하고 그 프레임의 결과를 기다린다 (앞서 넣은 결과는 건너뛴다).
+        timeout 은 슬롯 + 결과를 합친 시간이고 그 안에 못 받으면 None."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        seq = self.submit(frame, camera, timeout=timeout)
+        if seq is None:
+            return None
+        while True:
+            det = self.result(camera, None if deadline is None else max(0.0, deadline - time.monotonic()))
+            if det is None or det.seq >= seq:
+                return det
+
+    def snapshot(self):
+        with self._lock:
+            st = dict(self.stats, per_worker=list(self.stats["per_worker"]))
+            st["inflight"] = sum(self._inflight)
+        st["avg_infer_ms"] = st["total_infer_ms"] / st["completed"] if st["completed"] else 0.0
+        return st
+
+    # --- 시작/종료 ---
+    def start(self, timeout=120.0):
+        """워커를 띄우고 모두 모델을 읽을 때까지 기다린다."""
+        w, h = self.size
+        shape = (self.slots, h, w, 3)
+        self._shm = SharedMemory(create=True, size=int(np.prod(shape)))
+        self._frames = np.ndarray(shape, np.uint8, buffer=self._shm.buf)
+        for slot in range(self.slots):
+            self._free.put(slot)
+        self._results = self._ctx.Queue()
+        for index in range(self.workers):
+            tasks = self._ctx.Queue()
+            proc = self._ctx.Process(target=_worker, name=f"yolo-{index}", daemon=True,
+                                     args=(index, self.model_path, self._shm.name, shape, tasks,
+                                           self._results, self.track, self.conf, self.threads,
+                                           self.fake_work))
+            proc.start()
+            self._tasks.append(tasks)
+            self._procs.append(proc)
+        deadline = time.monotonic() + timeout
+        ready = 0
+        while ready < self.workers:
+            try:
+                self._results.get(timeout=0.5)
+                ready += 1
+            except queue.Empty:
+                # import/모델 로드에서 죽은 워커는 ready 를 영영 안 보내므로 timeout 까지 기다리지 않는다
+                dead = self._dead_workers()
+                if dead:
+                    self.close()
+                    raise RuntimeError(f"YOLO 워커가 모델을 읽다가 죽었습니다: {dead}") from None
+                if time.monotonic() > deadline:
+                    self.close()
+                    raise RuntimeError("YOLO 워커가 모델을 읽지 못했습니다") from None
+        self._collector = threading.Thread(target=self._collect, name="yolo-results", daemon=True)
+        self._collector.start()
+        return self
+
+    def close(self, timeout=5.0):
+        self._closing = True
+        for tasks in self._tasks:
+            tasks.put(None)
+        for proc in self._procs:
+            proc.join(timeout)
+            if proc.is_alive():
+                proc.terminate()
+        self._procs.clear()
+        self._tasks.clear()
+        if self._collector is not None:
+            self._results.put(None)
+            self._collector.join(timeout)
+            self._collector = None
+        if self._shm is not None:
+            self._frames = None
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+
+# --- 벤치마크 ---
+def _in_process(model_path, frames, cameras, track, conf, fake_work):
+    """워커 없이 한 프로세스에서 (예전 ex08.py 처럼)."""
+    def run(model, frame):
+        if fake_work:
+            _fake_infer(frame, fake_work)
+        elif track:
+            model.track(frame, persist=True, conf=conf, verbose=False)
+        else:
+            model.predict(frame, conf=conf, verbose=False)
+
+    models = {}
+    for c in range(cameras):
+        if not fake_work:
+            from ultralytics import YOLO
+            models[f"cam{c}"] = YOLO(model_path)
+        run(models.get(f"cam{c}"), frames[0])  # 첫 호출(준비 시간)은 빼고 잰다
+    started = time.perf_counter()
+    for i, frame in enumerate(frames):
+        run(models.get(f"cam{i % cameras}"), frame)
+    return len(frames) / (time.perf_counter() - started)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="YOLO 워커 풀 CPU 확장성 벤치마크")
+    parser.add_argument("--model", default="yolo11s.pt")
+    parser.add_argument("--workers", default="1,2,4", help="쉼표로 여러 개")
+    parser.add_argument("--cameras", type=int, default=4)
+    parser.add_argument("--frames", type=int, default=120)
+    parser.add_argument("--detect", action="store_true", help="track 대신 predict (카메라 한 대도 여러 워커)")
+    parser.add_argument("--fake-ms", type=float, default=0,
+                        help="ultralytics 없이 (혼자 돌 때) 프레임당 ms 만큼 CPU 를 쓰는 가짜 모델")
+    parser.add_argument("--images", nargs="*", help="시험 이미지 (없으면 무작위 640x480)")
+    args = parser.parse_args()
+
+    track = not args.detect
+    fake_work = 0
+    if args.fake_ms:
+        # 혼자 돌 때 fake_ms 가 걸리는 계산 횟수 (워커끼리 코어를 나누면 그만큼 느려진다)
+        image = np.zeros((480, 640, 3), np.uint8)
+        started = time.perf_counter()
+        _fake_infer(image, 2000)
+        fake_work = max(1, int(2000 * args.fake_ms / 1000 / (time.perf_counter() - started)))
+    rng = np.random.default_rng(1)
+    if args.images:
+        import cv2
+        base = [cv2.resize(cv2.imread(p), (640, 480)) for p in args.images]
+    else:
+        base = [rng.integers(0, 255, (480, 640, 3), np.uint8) for _ in range(8)]
+    frames = [base[i % len(base)] for i in range(args.frames)]
+    print(f"코어 {os.cpu_count()}개, 카메라 {args.cameras}대, {args.frames}프레임, "
+          f"{'track' if track else 'predict'}{f', 가짜 모델 {args.fake_ms:.0f}ms' if fake_work else ''}")
+
+    baseline = _in_process(args.model, frames[:max(args.cameras * 4, 20)], args.cameras, track, 0.25,
+                           fake_work)
+    print(f"  한 프로세스          {baseline:7.1f} fps")
+    for workers in map(int, args.workers.split(",")):
+        pool = YoloPool(args.model, workers=workers, track=track, fake_work=fake_work)
+        started = time.perf_counter()
+        pool.start()
+        load = time.perf_counter() - started
+        got = {f"cam{c}": [] for c in range(args.cameras)}
+        for camera in got:
+            pool.infer(frames[0], camera)  # 워커마다 첫 호출(준비 시간)은 빼고 잰다
+        collected = 0
+
+        def drain():
+            nonlocal collected
+            for camera, seqs in got.items():
+                det = pool.result(camera, timeout=0)
+                while det is not None:
+                    seqs.append(det.seq)
+                    collected += 1
+                    det = pool.result(camera, timeout=0)
+
+        started = time.perf_counter()
+        for i, frame in enumerate(frames):
+            pool.submit(frame, f"cam{i % args.cameras}")  # 슬롯이 다 차 있으면 여기서 기다린다
+            drain()
+        while collected < len(frames):
+            drain()
+            time.sleep(0.001)
+        elapsed = time.perf_counter() - started
+        ordered = all(seqs == list(range(1, len(seqs) + 1)) for seqs in got.values())
+        st = pool.snapshot()
+        pool.close()
+        fps = len(frames) / elapsed
+        print(f"  워커 {workers}개 (torch 스레드 {pool.threads}) {fps:7.1f} fps  x{fps / baseline:.2f}  "
+              f"추론 평균 {st['avg_infer_ms']:.0f}ms  워커별 {st['per_worker']}  "
+              f"순서 {'OK' if ordered else '틀림'}  (모델 로드 {load:.1f}초)")
+
+
+if __name__ == "__main__":
+    main()
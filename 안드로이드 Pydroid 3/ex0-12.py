@@ -2,7 +2,25 @@ import tkinter as tk
 
 from tkinter import font
 
-import paho.mqtt.client as mqtt
+import os
+
+import sys
+
+from functools import partial
+
+
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # 상위 폴더의 mqtt_core
+
+from mqtt_core import MqttCore
+
+from publisher import Publisher
+
+from device_registry import device_topic
+
+from led_mask import decode_mask, encode_mask
+
+from ui_state import UiRefresher, UiState
 
 
 
@@ -12,19 +30,65 @@ MQTT_BROKER = "broker.emqx.io"
 
 MQTT_PORT = 1883
 
-MQTT_TOPICS = [
+# 제어할 보드 (시리얼 모니터에 찍히는 "esp32-xxxxxx", "" 이면 예전 전역 토픽)
+
+DEVICE_ID = ""
+
+# 예전 펌웨어용으로 .../led1..8 에도 같이 보낸다 (모든 보드를 업데이트하면 False)
+
+LED_LEGACY_TOPICS = True
+
 
-    "arduino/led1", "arduino/led2", "arduino/led3", "arduino/led4",
 
-    "arduino/led5", "arduino/led6", "arduino/led7", "arduino/led8",
+# 상태 변수 (MQTT 스레드는 값만 바꾸고 Tk 가 20Hz 로 바뀐 위젯만 다시 그린다)
 
-]
+relay_state = False
+
+led_states = [False] * 8
+
+ui = UiState(relay=False, **{f"led{i}": False for i in range(8)})
 
 
 
 # MQTT 클라이언트 초기화
 
-client = mqtt.Client()
+client = MqttCore(MQTT_BROKER, MQTT_PORT)
+
+publisher = Publisher(client, rate=20, burst=10)  # 버튼 명령은 이 큐로만 보낸다
+
+
+
+# MQTT 핸들러: 재연결하면 retain 된 릴레이/LED 상태를 다시 받아 화면에 맞춘다 (PyDroid3.py 와 같음)
+
+def on_output(topic, payload):
+
+    global relay_state
+
+    relay_state = ("on" in payload.decode().lower())
+
+    ui.set("relay", relay_state)
+
+
+
+def on_led(index, topic, payload):
+
+    led_states[index] = (payload == b"1")
+
+    ui.set(f"led{index}", led_states[index])
+
+
+
+def on_leds(topic, payload):
+
+    # .../leds: 8개 상태가 한 메시지로 온다
+
+    states, _ = decode_mask(payload)
+
+    for i, on in enumerate(states):
+
+        led_states[i] = on
+
+        ui.set(f"led{i}", on)
 
 
 
@@ -32,13 +96,19 @@ client = mqtt.Client()
 
 def connect_mqtt():
 
-    try:
+    client.on(device_topic(DEVICE_ID, "output"), on_output)
 
-        client.connect(MQTT_BROKER, MQTT_PORT, 60)
+    for i in range(8):
 
-        print("Connected to MQTT Broker!")
+        client.on(device_topic(DEVICE_ID, f"led{i+1}"), partial(on_led, i))
 
-        client.loop_start()
+    client.on(device_topic(DEVICE_ID, "leds"), on_leds)
+
+    try:
+
+        client.start()  # 연결과 재연결은 mqtt_core 감시 스레드가 맡는다
+
+        print("Connecting to MQTT Broker...")
 
     except Exception as e:
 
@@ -46,17 +116,15 @@ def connect_mqtt():
 
 
 
-# 연결 재시도 함수
+# 연결 끊김 알림 (재연결은 backoff 를 두고 mqtt_core 가 다시 시도한다)
 
-def on_disconnect(client, userdata, rc):
+def on_disconnect(rc):
 
-    print("Disconnected from MQTT Broker")
-
-    connect_mqtt()
+    print(f"Disconnected from MQTT Broker (rc={rc})")
 
 
 
-client.on_disconnect = on_disconnect
+client.on_disconnected = on_disconnect
 
 
 
@@ -64,23 +132,39 @@ client.on_disconnect = on_disconnect
 
 def toggle_led(index):
 
-    current_state = led_states[index].get()
+    led_states[index] = not led_states[index]
 
-    new_state = not current_state
+    # retain: 펌웨어는 재연결할 때 leds 마스크를 마지막에 적용하므로 led{n} 만 보내면
 
-    toggle_led_text = "켜짐" if new_state else "꺼짐"
+    # 다른 패널(ex1-8.py/PyDroid3.py)이 남긴 예전 마스크가 이 토글을 되돌린다
 
-    client.publish(MQTT_TOPICS[index], "1" if new_state else "0")
+    publisher.publish(device_topic(DEVICE_ID, "leds"), encode_mask(led_states), retain=True)
+
+    if LED_LEGACY_TOPICS:
+
+        publisher.publish(device_topic(DEVICE_ID, f"led{index+1}"),
+
+                          "1" if led_states[index] else "0", retain=True)
+
+    ui.set(f"led{index}", led_states[index])
+
+
+
+def render_led(index, on):
 
     buttons[index].configure(
 
-        text=f"버튼 {index+1} ({toggle_led_text})",
+        text=f"버튼 {index+1} ({'켜짐' if on else '꺼짐'})",
 
-        bg="#FF5252" if new_state else "#1976D2"
+        bg="#FF5252" if on else "#1976D2"
 
     )
 
-    led_states[index].set(new_state)
+
+
+def render_relay(on):
+
+    relay_label.configure(text=f"릴레이 {'ON' if on else 'OFF'}", fg="#66BB6A" if on else "#EF5350")
 
 
 
@@ -142,6 +226,20 @@ def create_gui():
 
 
 
+    global relay_label
+
+    relay_label = tk.Label(
+
+        scroll_frame, text="릴레이 OFF", font=label_font,
+
+        bg="#1E1E1E", fg="#EF5350"
+
+    )
+
+    relay_label.pack(pady=5)
+
+
+
     labels = [
 
         "1. Hatchery", "2. Hatchery", "3. Spawning Pool", "4. Hydralisk Den",
@@ -150,12 +248,10 @@ def create_gui():
 
     ]
 
-    global buttons, led_states
+    global buttons
 
     buttons = []
 
-    led_states = [tk.BooleanVar(value=False) for _ in labels]
-
 
 
     for i, label in enumerate(labels):
@@ -206,6 +302,16 @@ def create_gui():
 
 
 
+    refresher = UiRefresher(window, ui, fps=20)
+
+    refresher.bind("relay", render_relay)
+
+    for i in range(8):
+
+        refresher.bind(f"led{i}", partial(render_led, i))
+
+    refresher.start()
+
     window.mainloop()
 
 
@@ -214,5 +320,7 @@ if __name__ == "__main__":
 
     connect_mqtt()
 
+    publisher.start()
+
     create_gui()
 
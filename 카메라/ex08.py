@@ -1,17 +1,21 @@
 import cv2
-import urllib.request
 import time
 import numpy as np
-from ultralytics import YOLO
 import cvzone
 import pyttsx3
 import threading
+import os
+import sys
 
-# Initialize pyttsx3 for offline text-to-speech
-engine = pyttsx3.init()
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # 상위 폴더의 camera_stream, vision_pipeline, frame_decode, yolo_pool
+from camera_stream import CameraStream
+from vision_pipeline import VisionPipeline
+from frame_decode import FrameDecoder
+from yolo_pool import BOX, CLASS, CONF, TRACK, YoloPool
 
 # Create a lock for thread safety
 tts_lock = threading.Lock()
+engine = None  # main() 에서 만든다 (YOLO 워커 프로세스는 이 파일을 다시 import 한다)
 
 def play_sound(text):
     """ Function to convert text to speech using pyttsx3. """
@@ -29,16 +33,6 @@ def RGB(event, x, y, flags, param):
         point = [x, y]
         print(point)
 
-cv2.namedWindow('RGB')
-cv2.setMouseCallback('RGB', RGB)
-
-# Load COCO class names
-with open("coco.txt", "r") as f:
-    class_names = f.read().splitlines()
-
-# Load the YOLOv8 model
-model = YOLO("yolo11s.pt")
-
 def enhance_image(image):
     """ Enhance the image quality. """
     # Apply bilateral filter for smoothening
@@ -48,91 +42,111 @@ def enhance_image(image):
     image = cv2.filter2D(image, -1, kernel)
     return image
 
-# Function to get frames from MJPEG stream
-def cam():
-    mjpeg_url = 'http://172.30.1.49:81/stream'
-    
-    for _ in range(5):  # Retry up to 5 times
-        try:
-            stream = urllib.request.urlopen(mjpeg_url, timeout=20)
-            bytes_data = b''
-            while True:
-                bytes_data += stream.read(1024)
-                a = bytes_data.find(b'\xff\xd8')
-                b = bytes_data.find(b'\xff\xd9')
-                if a != -1 and b != -1:
-                    jpg = bytes_data[a:b+2]
-                    bytes_data = bytes_data[b+2:]
-                    imgNp = np.array(bytearray(jpg), dtype=np.uint8)
-                    image = cv2.imdecode(imgNp, cv2.IMREAD_COLOR)
-                    return image
-        except (URLError, HTTPError) as e:
-            print(f"Attempt failed: {e.reason}")
-            time.sleep(5)
-
-    raise URLError("All retry attempts failed.")
-
-# Open the video capture (use webcam)
-cap = cv2.VideoCapture('rtsp://172.30.1.49:8080/h264_aac.sdp')
-
-# Set to store already spoken track IDs to avoid repeating
-spoken_ids = set()
-count = 0
-
-while True:
-    frame = cam()
-    count += 1
-    if count % 3 != 0:
-        continue
-    
-    frame = cv2.resize(frame, (640, 480))  # 640x480 크기로 변경
-    
-    # Apply image enhancement
-    frame = enhance_image(frame)
-    
-    # Run YOLOv8 tracking on the frame, persisting tracks between frames
-    results = model.track(frame, persist=True)
-
-    # Check if there are any boxes in the results
-    if results[0].boxes is not None and results[0].boxes.id is not None:
-        # Get the boxes (x, y, w, h), class IDs, track IDs, and confidences
-        boxes = results[0].boxes.xyxy.int().cpu().tolist()  # Bounding boxes
-        class_ids = results[0].boxes.cls.int().cpu().tolist()  # Class IDs
-        track_ids = results[0].boxes.id.int().cpu().tolist()  # Track IDs
-        confidences = results[0].boxes.conf.cpu().tolist()  # Confidence score
-        
-        # Dictionary to count classes based on track IDs for the current frame
-        current_frame_counter = {}
-
-        # Iterate through detected objects
-        for box, class_id, track_id, conf in zip(boxes, class_ids, track_ids, confidences):
-            c = class_names[class_id]
-            x1, y1, x2, y2 = box
-            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-            cvzone.putTextRect(frame, f'{track_id}', (x1, y2), 1, 1)
-            cvzone.putTextRect(frame, f'{c}', (x1, y1), 1, 1)
+def main():
+    global engine
+    # Initialize pyttsx3 for offline text-to-speech
+    engine = pyttsx3.init()
+
+    cv2.namedWindow('RGB')
+    cv2.setMouseCallback('RGB', RGB)
+
+    # Load COCO class names
+    with open("coco.txt", "r") as f:
+        class_names = f.read().splitlines()
+
+    # Load the YOLO model in a worker process (frames go through shared memory, results come back as arrays)
+    # 카메라 한 대는 추적 상태 때문에 워커 하나, 카메라를 늘리면 workers 도 늘린다
+    pool = YoloPool("yolo11s.pt", workers=1, size=(640, 480)).start()
+
+    # MJPEG stream: one connection kept open by a background reader (reconnects with backoff)
+    camera = CameraStream('http://172.30.1.49:81/stream', stall=5.0).start()
+
+    # Open the video capture (use webcam)
+    cap = cv2.VideoCapture('rtsp://172.30.1.49:8080/h264_aac.sdp')
+
+    # 640x480 크기로 바로 디코드 (큰 프레임은 1/2, 1/4 로 줄여서 디코드, resize 버퍼 재사용)
+    decoder = FrameDecoder((640, 480))
+
+    def decode_frame(jpg):
+        """ decode 단계: JPEG → 640x480 → enhance (infer 가 기다릴 때만 불린다). """
+        frame = decoder.decode(jpg)
+        if frame is None:
+            return None
+        # Apply image enhancement
+        return enhance_image(frame)
+
+    def infer(frame):
+        """ infer 단계: YOLO 워커에서 tracking (persist), 결과는 (n, 7) 배열. """
+        det = pool.infer(frame, "cam0", timeout=30)
+        if det is None:
+            raise RuntimeError("YOLO 워커 응답 없음")
+        return det.boxes
+
+    # capture → decode → infer 는 각자 스레드, 단계 사이는 최신 값 하나만 (느리면 옛 프레임은 버림)
+    pipeline = VisionPipeline(camera.slot, decode_frame, infer).start()
+
+    # Set to store already spoken track IDs to avoid repeating
+    spoken_ids = set()
+    last_report = time.monotonic()
+
+    while True:
+        # 추론까지 끝난 가장 최신 프레임
+        item = pipeline.get(timeout=1.0)
+        if item is None:  # 카메라 재연결 중 (또는 YOLO 워커가 죽어서 추론 결과가 안 나옴)
+            if pool.failed or cv2.waitKey(1) & 0xFF == ord("q"):
+                break
+            continue
+        frame, detections = item.image, item.result
+
+        # (n, 7) 배열: x1 y1 x2 y2 conf class track_id (track_id -1 = 아직 추적 전)
+        tracked = detections[detections[:, TRACK] >= 0]
+        if len(tracked):
+            # Dictionary to count classes based on track IDs for the current frame
+            current_frame_counter = {}
+
+            # Iterate through detected objects
+            for row in tracked:
+                x1, y1, x2, y2 = (int(v) for v in row[BOX])
+                class_id, track_id, conf = int(row[CLASS]), int(row[TRACK]), float(row[CONF])
+                c = class_names[class_id]
+                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+                cvzone.putTextRect(frame, f'{track_id}', (x1, y2), 1, 1)
+                cvzone.putTextRect(frame, f'{c}', (x1, y1), 1, 1)
             
-            # Count the object only if it's a new detection
-            if track_id not in spoken_ids:
-                spoken_ids.add(track_id)
+                # Count the object only if it's a new detection
+                if track_id not in spoken_ids:
+                    spoken_ids.add(track_id)
                 
-                # Increment the count for the detected class
-                if c not in current_frame_counter:
-                    current_frame_counter[c] = 0
-                current_frame_counter[c] += 1
-
-        # Announce the current counts for each detected class
-        for class_name, count in current_frame_counter.items():
-            if count > 0:  # Only announce if there are detected objects
-                count_text = f"{count} {class_name}" if count > 1 else f"One {class_name}"
-                play_sound_async(count_text)  # Convert count to speech
-                current_frame_counter[class_name] = 0  # Reset count after announcement
-
-    cv2.imshow("RGB", frame)
+                    # Increment the count for the detected class
+                    if c not in current_frame_counter:
+                        current_frame_counter[c] = 0
+                    current_frame_counter[c] += 1
+
+            # Announce the current counts for each detected class
+            for class_name, count in current_frame_counter.items():
+                if count > 0:  # Only announce if there are detected objects
+                    count_text = f"{count} {class_name}" if count > 1 else f"One {class_name}"
+                    play_sound_async(count_text)  # Convert count to speech
+                    current_frame_counter[class_name] = 0  # Reset count after announcement
+
+        cv2.imshow("RGB", frame)
+        pipeline.displayed(item)
+        if time.monotonic() - last_report > 10:
+            print(pipeline.report())  # 단계별 처리/버린 수, 받은 시각 → 화면 지연
+            last_report = time.monotonic()
     
-    if cv2.waitKey(1) & 0xFF == ord("q"):
-        break
-
-# Release the video capture object and close the display window
-cap.release()
-cv2.destroyAllWindows()
+        if cv2.waitKey(1) & 0xFF == ord("q"):
+            break
+
+    # Release the video capture object and close the display window
+    pipeline.stop()
+    camera.close()
+    print(pipeline.report())
+    pool.close()
+    cap.release()
+    cv2.destroyAllWindows()
+    if pool.failed:
+        raise SystemExit(f"❌ YOLO 워커가 죽어서 종료합니다: {pool.failed}")
+
+if __name__ == "__main__":
+    main()